@@ -28,11 +28,16 @@ bl_info = {
 # Import the necessary modules
 import bpy
 import logging
+import sys
+import time
 
 # Import translation functions
 from bpy.app.translations import pgettext_iface as iface_
 from bpy.app.translations import pgettext_tip as tip_
 
+# Import the updates module for the property update callbacks
+from Depthify import updates
+
 # Define a custom property group for storing and accessing properties
 class DepthifyProperties(bpy.types.PropertyGroup):
     # Define an image property for selecting an image file
@@ -42,11 +47,16 @@ class DepthifyProperties(bpy.types.PropertyGroup):
         subtype='FILE_PATH'
     )
 
-    # Define a depth map property for storing the depth map values
-    depth_map: bpy.props.FloatVectorProperty(
+    # Define a depth map reference property for storing the key of the cached depth map
+    depth_map_ref: bpy.props.StringProperty(
         name=iface_("Depth Map"),
-        description=tip_("Store the depth map values"),
-        size=1
+        description=tip_("Store the key of the cached depth map values")
+    )
+
+    # Define a depth map hash property for storing the content hash of the cached depth map
+    depth_map_hash: bpy.props.StringProperty(
+        name=iface_("Depth Map Hash"),
+        description=tip_("Store the content hash of the cached depth map values")
     )
 
     # Define a surface property for storing the surface object
@@ -62,7 +72,8 @@ class DepthifyProperties(bpy.types.PropertyGroup):
         description=tip_("Adjust the number of subdivisions for the surface"),
         default=2,
         min=0,
-        max=6
+        max=6,
+        update=updates.update_subdivision
     )
 
     # Define a displacement strength property for adjusting the strength of the displacement modifier
@@ -71,7 +82,8 @@ class DepthifyProperties(bpy.types.PropertyGroup):
         description=tip_("Adjust the strength of the displacement modifier for the surface"),
         default=1.0,
         min=0.0,
-        max=10.0
+        max=10.0,
+        update=updates.update_displacement
     )
 
     # Define a scale property for adjusting the scale of the surface object
@@ -81,7 +93,326 @@ class DepthifyProperties(bpy.types.PropertyGroup):
         default=(1.0, 1.0, 1.0),
         min=0.0,
         max=10.0,
-        subtype='XYZ'
+        subtype='XYZ',
+        update=updates.update_scale
+    )
+
+    # Define a depth scale property for adjusting the height of the surface relative to the depth values
+    depth_scale: bpy.props.FloatProperty(
+        name=iface_("Depth Multiplier"),
+        description=tip_("Adjust the factor that converts depth values to surface heights"),
+        default=10.0,
+        min=0.0,
+        soft_max=100.0,
+        update=updates.update_depth_scale
+    )
+
+    # Define a downsample property for reducing the resolution of the surface
+    downsample: bpy.props.IntProperty(
+        name=iface_("Downsample"),
+        description=tip_("Reduce the resolution of the depth map by this factor before building the surface"),
+        default=1,
+        min=1,
+        max=64,
+        update=updates.schedule_rebuild
+    )
+
+    # Define a fill holes property for filling missing depth values before building the surface
+    fill_holes: bpy.props.BoolProperty(
+        name=iface_("Fill Holes"),
+        description=tip_("Fill missing and zero depth values from the values around them"),
+        default=False,
+        update=updates.schedule_rebuild
+    )
+
+    # Define a denoise property for choosing the filter that removes noise from the depth map
+    denoise: bpy.props.EnumProperty(
+        name=iface_("Denoise"),
+        description=tip_("Choose the filter that removes noise from the depth map"),
+        items=[
+            ('NONE', "No Denoising", "Use the depth values as they are"),
+            ('MEDIAN', "Median", "Replace every depth value by the median of its neighbourhood, removing spikes"),
+            ('BILATERAL', "Bilateral", "Smooth the depth values while keeping depth edges sharp")
+        ],
+        default='NONE',
+        update=updates.schedule_rebuild
+    )
+
+    # Define a denoise radius property for adjusting the neighbourhood of the denoise filter
+    denoise_radius: bpy.props.IntProperty(
+        name=iface_("Denoise Radius"),
+        description=tip_("Adjust the number of pixels on each side of the neighbourhood of the denoise filter"),
+        default=1,
+        min=1,
+        max=5,
+        update=updates.schedule_rebuild
+    )
+
+    # Define a denoise range property for adjusting which depths the bilateral filter averages together
+    denoise_range: bpy.props.FloatProperty(
+        name=iface_("Edge Threshold"),
+        description=tip_("Adjust the depth difference above which the bilateral filter keeps an edge"),
+        default=0.05,
+        min=0.001,
+        soft_max=0.5,
+        precision=3,
+        update=updates.schedule_rebuild
+    )
+
+    # Define a normalize property for stretching the depth values to the full range
+    normalize_depth: bpy.props.BoolProperty(
+        name=iface_("Normalize"),
+        description=tip_("Stretch the depth values to the 0-1 range"),
+        default=False,
+        update=updates.schedule_rebuild
+    )
+
+    # Define a normalize clip property for ignoring outliers when normalizing
+    normalize_clip: bpy.props.FloatProperty(
+        name=iface_("Clip Percent"),
+        description=tip_("Adjust the percentage of depth values at each end that are clipped when normalizing"),
+        default=0.0,
+        min=0.0,
+        max=10.0,
+        update=updates.schedule_rebuild
+    )
+
+    # Define a depth conversion property for choosing how depth values are converted
+    depth_conversion: bpy.props.EnumProperty(
+        name=iface_("Depth Conversion"),
+        description=tip_("Choose how the depth values are converted before building the surface"),
+        items=[
+            ('NONE', "No Conversion", "Use the depth values as they are"),
+            ('GAMMA', "Gamma", "Apply a gamma curve to the depth values"),
+            ('INVERSE', "Inverse Depth", "Convert inverse depth, or disparity, to depth")
+        ],
+        default='NONE',
+        update=updates.schedule_rebuild
+    )
+
+    # Define a depth gamma property for adjusting the gamma curve
+    depth_gamma: bpy.props.FloatProperty(
+        name=iface_("Gamma"),
+        description=tip_("Adjust the exponent of the gamma curve applied to the depth values"),
+        default=1.0,
+        min=0.1,
+        max=10.0,
+        update=updates.schedule_rebuild
+    )
+
+    # Define a depth encoding property for choosing how cached depth values are stored
+    depth_encoding: bpy.props.EnumProperty(
+        name=iface_("Depth Encoding"),
+        description=tip_("Choose how the cached depth values are stored in memory and on disk"),
+        items=[
+            ('FLOAT32', "Float32", "Keep the exact depth values"),
+            ('FLOAT16', "Float16", "Store the depth values as half floats, halving their memory"),
+            ('UINT16', "Quantized 16-bit", "Store the depth values as 16-bit steps of their range, halving their memory")
+        ],
+        default='FLOAT32',
+        update=updates.schedule_rebuild
+    )
+
+    # Define a compress depth property for compressing the cached depth values
+    compress_depth: bpy.props.BoolProperty(
+        name=iface_("Compress Depth"),
+        description=tip_("Compress the cached depth values band by band, decompressing each band when it is read"),
+        default=False,
+        update=updates.schedule_rebuild
+    )
+
+    # Define a geometry mode property for choosing how the surface mesh is built
+    geometry_mode: bpy.props.EnumProperty(
+        name=iface_("Geometry Mode"),
+        description=tip_("Choose how the surface mesh is built from the depth map"),
+        items=[
+            ('GRID', "Grid", "Use one vertex per pixel"),
+            ('ADAPTIVE', "Adaptive", "Use large faces in flat regions and full resolution at depth edges"),
+            ('DISPLACEMENT', "Displacement Only", "Use a coarse plane and render all relief with material displacement")
+        ],
+        default='GRID',
+        update=updates.schedule_rebuild
+    )
+
+    # Define an error tolerance property for bounding the error of the adaptive mesh
+    error_tolerance: bpy.props.FloatProperty(
+        name=iface_("Error Tolerance"),
+        description=tip_("Adjust the largest vertical error allowed in the adaptive mesh"),
+        default=0.01,
+        min=0.0,
+        soft_max=1.0,
+        precision=4,
+        update=updates.schedule_rebuild
+    )
+
+    # Define a triangle budget property for bounding the size of the adaptive mesh
+    triangle_budget: bpy.props.IntProperty(
+        name=iface_("Triangle Budget"),
+        description=tip_("Limit the number of triangles in the adaptive mesh, or 0 for no limit"),
+        default=0,
+        min=0,
+        update=updates.schedule_rebuild
+    )
+
+    # Define a tiling property for building large surfaces as one object per tile
+    use_tiles: bpy.props.BoolProperty(
+        name=iface_("Tiled"),
+        description=tip_("Build the surface as one object per tile, streaming the depth map tile by tile"),
+        default=False
+    )
+
+    # Define a tile size property for adjusting the size of the tiles
+    tile_size: bpy.props.IntProperty(
+        name=iface_("Tile Size"),
+        description=tip_("Adjust the number of vertex rows and columns of each tile"),
+        default=1024,
+        min=2,
+        soft_max=8192
+    )
+
+    # Define a resident tiles property for limiting the number of tiles held in memory
+    max_resident_tiles: bpy.props.IntProperty(
+        name=iface_("Resident Tiles"),
+        description=tip_("Limit the number of built tiles held in memory at once"),
+        default=2,
+        min=1,
+        max=64
+    )
+
+    # Define a workers property for adjusting the number of threads that build the surface
+    workers: bpy.props.IntProperty(
+        name=iface_("Workers"),
+        description=tip_("Adjust the number of threads that build the surface, or 0 for one per CPU core"),
+        default=0,
+        min=0,
+        max=256
+    )
+
+    # Define a progress property for showing the progress of a running build
+    progress: bpy.props.FloatProperty(
+        name=iface_("Progress"),
+        description=tip_("Show the progress of the running surface build"),
+        default=0.0,
+        min=0.0,
+        max=1.0,
+        subtype='FACTOR'
+    )
+
+    # Define a progress stage property for showing the stage of a running build
+    progress_stage: bpy.props.StringProperty(
+        name=iface_("Stage"),
+        description=tip_("Show the stage of the running surface build")
+    )
+
+    # Define a cache budget property for limiting the memory used by cached surfaces
+    cache_budget: bpy.props.IntProperty(
+        name=iface_("Cache Budget (MB)"),
+        description=tip_("Limit the memory used by cached surfaces"),
+        default=1024,
+        min=0
+    )
+
+    # Define a memory budget property for limiting the estimated memory of a surface build
+    memory_budget: bpy.props.IntProperty(
+        name=iface_("Memory Budget (MB)"),
+        description=tip_("Downsample the depth map or cap the subdivisions when a build would need more memory, or 0 for no limit"),
+        default=8192,
+        min=0
+    )
+
+    # Define a face budget property for limiting the faces of a surface after subdivision
+    face_budget: bpy.props.IntProperty(
+        name=iface_("Face Budget"),
+        description=tip_("Downsample the depth map or cap the subdivisions when a build would evaluate more faces, or 0 for no limit"),
+        default=0,
+        min=0
+    )
+
+    # Define a build plan property for showing the resolution and subdivisions chosen for the last build
+    build_plan: bpy.props.StringProperty(
+        name=iface_("Build Plan"),
+        description=tip_("Show the resolution and subdivisions chosen for the last build within the budgets")
+    )
+
+    # Define a share meshes property for letting surfaces of the same depth map share one mesh
+    share_meshes: bpy.props.BoolProperty(
+        name=iface_("Share Meshes"),
+        description=tip_("Let surfaces built from the same depth map and geometry settings share one mesh"),
+        default=True
+    )
+
+    # Define a sequence property for playing back a numbered image sequence
+    use_sequence: bpy.props.BoolProperty(
+        name=iface_("Image Sequence"),
+        description=tip_("Build one surface that plays back the numbered image sequence of the image file"),
+        default=False
+    )
+
+    # Define a prefetch property for limiting the number of sequence frames read ahead
+    prefetch_frames: bpy.props.IntProperty(
+        name=iface_("Prefetch Frames"),
+        description=tip_("Limit the number of upcoming sequence frames read ahead and held in memory"),
+        default=8,
+        min=1,
+        max=256
+    )
+
+    # Define a level of detail property for showing a coarse proxy in the viewport
+    use_lod: bpy.props.BoolProperty(
+        name=iface_("Levels of Detail"),
+        description=tip_("Build coarser copies of the surface and show them in the viewport until it comes close"),
+        default=False,
+        update=updates.schedule_rebuild
+    )
+
+    # Define a level of detail count property for adjusting the number of coarser levels
+    lod_levels: bpy.props.IntProperty(
+        name=iface_("LOD Levels"),
+        description=tip_("Adjust the number of coarser levels of detail, each at half the resolution of the previous one"),
+        default=3,
+        min=1,
+        max=8,
+        update=updates.schedule_rebuild
+    )
+
+    # Define a level of detail distance property for adjusting when the full surface is shown
+    lod_distance: bpy.props.FloatProperty(
+        name=iface_("LOD Distance"),
+        description=tip_("Adjust the viewport distance below which the full surface is shown, or 0 to always show it"),
+        default=50.0,
+        min=0.0,
+        subtype='DISTANCE',
+        update=updates.update_lod_distance
+    )
+
+    # Define an automatic rebuild property for rebuilding the surface when its geometry settings change
+    auto_rebuild: bpy.props.BoolProperty(
+        name=iface_("Auto Rebuild"),
+        description=tip_("Rebuild the surface shortly after its geometry settings stop changing"),
+        default=True
+    )
+
+    # Define a profile stage property for choosing the build stage to run under cProfile
+    profile_stage: bpy.props.EnumProperty(
+        name=iface_("Profile"),
+        description=tip_("Choose the build stage to run under cProfile"),
+        items=[
+            ('NONE', "No Profiling", "Only record the time and memory of every stage"),
+            ('ALL', "All Stages", "Profile every stage of the build"),
+            ('LOAD', "Load", "Profile loading the depth map"),
+            ('BUILD', "Build", "Profile building the geometry"),
+            ('UPLOAD', "Upload", "Profile uploading the mesh"),
+            ('SUBDIVISION', "Subdivision", "Profile adding the subdivision modifier"),
+            ('DISPLACEMENT', "Displacement", "Profile creating the displacement material")
+        ],
+        default='NONE'
+    )
+
+    # Define a trace memory property for recording the peak memory of every stage
+    trace_memory: bpy.props.BoolProperty(
+        name=iface_("Trace Memory"),
+        description=tip_("Record the peak memory allocated by every build stage, at some cost in speed"),
+        default=True
     )
 
     # Define a subdivision type property for choosing the type of subdivision method
@@ -92,7 +423,8 @@ class DepthifyProperties(bpy.types.PropertyGroup):
             ('SIMPLE', "Simple", "Use simple subdivision algorithm"),
             ('CATMULL_CLARK', "Catmull-Clark", "Use Catmull-Clark subdivision algorithm")
         ],
-        default='CATMULL_CLARK'
+        default='CATMULL_CLARK',
+        update=updates.update_subdivision
     )
 
     # Define a displacement type property for choosing the type of displacement method
@@ -103,11 +435,15 @@ class DepthifyProperties(bpy.types.PropertyGroup):
             ('BUMP', "Bump", "Use bump mapping to create an illusion of depth"),
             ('TRUE', "True", "Use true displacement to modify the geometry")
         ],
-        default='TRUE'
+        default='TRUE',
+        update=updates.update_displacement
     )
 
-# Import the depthify and operators modules using absolute imports
-from Depthify import depthify
+# Import the light handlers, instrument, lod and operators modules using absolute imports, leaving the
+# depthify module, NumPy and the image decoders to the first build
+from Depthify import handlers
+from Depthify import instrument
+from Depthify import lod
 from Depthify import operators
 
 # Define a custom panel class for the addon UI
@@ -133,9 +469,14 @@ class DepthifyPanel(bpy.types.Panel):
         # Use a file browser template to select an image file
         layout.template_ID(props, "image", open="image.open")
 
-        # Use a row to display a button to create a surface object from the image file
+        # Use a row to display buttons to create a surface object from the image file or from many image files
         row = layout.row()
         row.operator("object.depthify_create_surface")
+        row.operator("object.depthify_create_surfaces")
+
+        # Use a label to show the stage and progress of a running build
+        if props.progress_stage:
+            layout.label(text=f"{props.progress_stage}: {props.progress * 100:.0f}% (Esc to cancel)")
 
         # Use a column to display properties to adjust the surface object
         col = layout.column()
@@ -155,16 +496,159 @@ class DepthifyPanel(bpy.types.Panel):
         # Use a vector slider to adjust the scale of the surface object
         col.prop(props, "scale")
 
+        # Use sliders to adjust the depth multiplier and downsample factor of the surface geometry
+        col.prop(props, "depth_scale")
+        col.prop(props, "downsample")
+
+        # Use checkboxes and menus to set up the filters that clean the depth map before building the surface
+        col.prop(props, "fill_holes")
+        col.prop(props, "denoise", text="")
+        if props.denoise != 'NONE':
+            col.prop(props, "denoise_radius")
+        if props.denoise == 'BILATERAL':
+            col.prop(props, "denoise_range")
+        col.prop(props, "normalize_depth")
+        if props.normalize_depth:
+            col.prop(props, "normalize_clip")
+        col.prop(props, "depth_conversion", text="")
+        if props.depth_conversion == 'GAMMA':
+            col.prop(props, "depth_gamma")
+
+        # Use an enum menu and a checkbox to choose how the cached depth values are stored
+        col.prop(props, "depth_encoding", text="")
+        col.prop(props, "compress_depth")
+
+        # Use an enum menu to choose the geometry mode and fields to bound the adaptive mesh
+        col.prop(props, "geometry_mode", text="")
+        if props.geometry_mode == 'ADAPTIVE':
+            col.prop(props, "error_tolerance")
+            col.prop(props, "triangle_budget")
+
+            # Use a label to show the achieved error and reduction of the active surface
+            if obj is not None and "depthify_max_error" in obj:
+                col.label(text=f"Error {obj['depthify_max_error']:.4f}, {obj['depthify_reduction']:.1f}x fewer vertices")
+
+        # Use a checkbox to rebuild the surface automatically when its geometry settings change
+        col.prop(props, "auto_rebuild")
+
+        # Use a field to adjust the number of worker threads
+        col.prop(props, "workers")
+
+        # Use a checkbox to enable sequence playback and a field to adjust its read-ahead
+        col.prop(props, "use_sequence")
+        if props.use_sequence:
+            col.prop(props, "prefetch_frames")
+
+        # Use a checkbox to enable levels of detail and fields to adjust them
+        col.prop(props, "use_lod")
+        if props.use_lod:
+            col.prop(props, "lod_levels")
+            col.prop(props, "lod_distance")
+
+            # Use a label to show the level of detail shown on the active surface
+            if obj is not None and "depthify_lods" in obj:
+                col.label(text=f"Showing level {obj['depthify_lod']} of {len(obj['depthify_lods']) - 1}")
+
+        # Use a checkbox to enable tiling and fields to adjust the tiles
+        col.prop(props, "use_tiles")
+        if props.use_tiles:
+            col.prop(props, "tile_size")
+            col.prop(props, "max_resident_tiles")
+
+        # Use a button to regenerate the active tile
+        if obj is not None and "depthify_tile" in obj:
+            col.operator("object.depthify_rebuild_tile")
+
+        # Use a field to adjust the surface cache budget and a label to show its counters once a build has loaded the cache
+        col.prop(props, "cache_budget")
+        col.prop(props, "share_meshes")
+
+        # Use fields to adjust the build budgets and a label to show the plan of the last build
+        col.prop(props, "memory_budget")
+        col.prop(props, "face_budget")
+        if props.build_plan:
+            col.label(text=props.build_plan)
+        depthify = sys.modules.get("Depthify.depthify")
+        if depthify is not None:
+            stats = depthify.surface_cache.stats()
+            col.label(text=f"Cache: {stats['entries']} surfaces, {stats['hits']} hits, {stats['misses']} misses")
+
+        # Use an enum menu to choose the profiled stage and a checkbox to enable memory tracing
+        col.prop(props, "profile_stage", text="")
+        col.prop(props, "trace_memory")
+
+        # Use a box to show the time, memory and counts of every stage of the last build
+        recorder = instrument.latest
+        if recorder is not None:
+            box = layout.box()
+            box.label(text=f"Last build: {recorder.total_seconds():.2f} s ({recorder.status.lower()})")
+            for line in recorder.summary():
+                box.label(text=line)
+
 # Define a function to register translation dictionaries
 def register_translations():
     # Define an English translation dictionary
     en_dict = {
        ("*", "Select an image file"): "Select an image file",
-       ("*", "Store the depth map values"): "Store the depth map values",
+       ("*", "Store the key of the cached depth map values"): "Store the key of the cached depth map values",
+       ("*", "Store the content hash of the cached depth map values"): "Store the content hash of the cached depth map values",
        ("*", "Store the surface object"): "Store the surface object",
        ("*", "Adjust the number of subdivisions for the surface"): "Adjust the number of subdivisions for the surface",
        ("*", "Adjust the strength of the displacement modifier for the surface"): "Adjust the strength of the displacement modifier for the surface",
        ("*", "Adjust the scale of the surface object"): "Adjust the scale of the surface object",
+       ("*", "Adjust the factor that converts depth values to surface heights"): "Adjust the factor that converts depth values to surface heights",
+       ("*", "Reduce the resolution of the depth map by this factor before building the surface"): "Reduce the resolution of the depth map by this factor before building the surface",
+       ("*", "Limit the memory used by cached surfaces"): "Limit the memory used by cached surfaces",
+       ("*", "Let surfaces built from the same depth map and geometry settings share one mesh"): "Let surfaces built from the same depth map and geometry settings share one mesh",
+       ("*", "Downsample the depth map or cap the subdivisions when a build would need more memory, or 0 for no limit"): "Downsample the depth map or cap the subdivisions when a build would need more memory, or 0 for no limit",
+       ("*", "Downsample the depth map or cap the subdivisions when a build would evaluate more faces, or 0 for no limit"): "Downsample the depth map or cap the subdivisions when a build would evaluate more faces, or 0 for no limit",
+       ("*", "Show the resolution and subdivisions chosen for the last build within the budgets"): "Show the resolution and subdivisions chosen for the last build within the budgets",
+       ("*", "Show the progress of the running surface build"): "Show the progress of the running surface build",
+       ("*", "Show the stage of the running surface build"): "Show the stage of the running surface build",
+       ("*", "Build one surface that plays back the numbered image sequence of the image file"): "Build one surface that plays back the numbered image sequence of the image file",
+       ("*", "Limit the number of upcoming sequence frames read ahead and held in memory"): "Limit the number of upcoming sequence frames read ahead and held in memory",
+       ("*", "Build coarser copies of the surface and show them in the viewport until it comes close"): "Build coarser copies of the surface and show them in the viewport until it comes close",
+       ("*", "Adjust the number of coarser levels of detail, each at half the resolution of the previous one"): "Adjust the number of coarser levels of detail, each at half the resolution of the previous one",
+       ("*", "Adjust the viewport distance below which the full surface is shown, or 0 to always show it"): "Adjust the viewport distance below which the full surface is shown, or 0 to always show it",
+       ("*", "Rebuild the surface shortly after its geometry settings stop changing"): "Rebuild the surface shortly after its geometry settings stop changing",
+       ("*", "Choose the build stage to run under cProfile"): "Choose the build stage to run under cProfile",
+       ("*", "Only record the time and memory of every stage"): "Only record the time and memory of every stage",
+       ("*", "Profile every stage of the build"): "Profile every stage of the build",
+       ("*", "Profile loading the depth map"): "Profile loading the depth map",
+       ("*", "Profile building the geometry"): "Profile building the geometry",
+       ("*", "Profile uploading the mesh"): "Profile uploading the mesh",
+       ("*", "Profile adding the subdivision modifier"): "Profile adding the subdivision modifier",
+       ("*", "Profile creating the displacement material"): "Profile creating the displacement material",
+       ("*", "Record the peak memory allocated by every build stage, at some cost in speed"): "Record the peak memory allocated by every build stage, at some cost in speed",
+       ("*", "Adjust the number of threads that build the surface, or 0 for one per CPU core"): "Adjust the number of threads that build the surface, or 0 for one per CPU core",
+       ("*", "Build the surface as one object per tile, streaming the depth map tile by tile"): "Build the surface as one object per tile, streaming the depth map tile by tile",
+       ("*", "Adjust the number of vertex rows and columns of each tile"): "Adjust the number of vertex rows and columns of each tile",
+       ("*", "Adjust the number of neighbouring rows and columns read around each tile"): "Adjust the number of neighbouring rows and columns read around each tile",
+       ("*", "Limit the number of built tiles held in memory at once"): "Limit the number of built tiles held in memory at once",
+       ("*", "Fill missing and zero depth values from the values around them"): "Fill missing and zero depth values from the values around them",
+       ("*", "Choose the filter that removes noise from the depth map"): "Choose the filter that removes noise from the depth map",
+       ("*", "Use the depth values as they are"): "Use the depth values as they are",
+       ("*", "Replace every depth value by the median of its neighbourhood, removing spikes"): "Replace every depth value by the median of its neighbourhood, removing spikes",
+       ("*", "Smooth the depth values while keeping depth edges sharp"): "Smooth the depth values while keeping depth edges sharp",
+       ("*", "Adjust the number of pixels on each side of the neighbourhood of the denoise filter"): "Adjust the number of pixels on each side of the neighbourhood of the denoise filter",
+       ("*", "Adjust the depth difference above which the bilateral filter keeps an edge"): "Adjust the depth difference above which the bilateral filter keeps an edge",
+       ("*", "Stretch the depth values to the 0-1 range"): "Stretch the depth values to the 0-1 range",
+       ("*", "Adjust the percentage of depth values at each end that are clipped when normalizing"): "Adjust the percentage of depth values at each end that are clipped when normalizing",
+       ("*", "Choose how the depth values are converted before building the surface"): "Choose how the depth values are converted before building the surface",
+       ("*", "Apply a gamma curve to the depth values"): "Apply a gamma curve to the depth values",
+       ("*", "Convert inverse depth, or disparity, to depth"): "Convert inverse depth, or disparity, to depth",
+       ("*", "Adjust the exponent of the gamma curve applied to the depth values"): "Adjust the exponent of the gamma curve applied to the depth values",
+       ("*", "Choose how the cached depth values are stored in memory and on disk"): "Choose how the cached depth values are stored in memory and on disk",
+       ("*", "Keep the exact depth values"): "Keep the exact depth values",
+       ("*", "Store the depth values as half floats, halving their memory"): "Store the depth values as half floats, halving their memory",
+       ("*", "Store the depth values as 16-bit steps of their range, halving their memory"): "Store the depth values as 16-bit steps of their range, halving their memory",
+       ("*", "Compress the cached depth values band by band, decompressing each band when it is read"): "Compress the cached depth values band by band, decompressing each band when it is read",
+       ("*", "Choose how the surface mesh is built from the depth map"): "Choose how the surface mesh is built from the depth map",
+       ("*", "Use one vertex per pixel"): "Use one vertex per pixel",
+       ("*", "Use large faces in flat regions and full resolution at depth edges"): "Use large faces in flat regions and full resolution at depth edges",
+       ("*", "Use a coarse plane and render all relief with material displacement"): "Use a coarse plane and render all relief with material displacement",
+       ("*", "Adjust the largest vertical error allowed in the adaptive mesh"): "Adjust the largest vertical error allowed in the adaptive mesh",
+       ("*", "Limit the number of triangles in the adaptive mesh, or 0 for no limit"): "Limit the number of triangles in the adaptive mesh, or 0 for no limit",
        ("*", "Choose the type of subdivision method for the surface"): "Choose the type of subdivision method for the surface",
        ("*", "Use simple subdivision algorithm"): "Use simple subdivision algorithm",
        ("*", "Use Catmull-Clark subdivision algorithm"): "Use Catmull-Clark subdivision algorithm",
@@ -186,12 +670,16 @@ def unregister_translations():
 
 # Define a function to register the addon
 def register():
+    # Measure how long enabling the addon takes
+    start = time.perf_counter()
+
     # Register the custom property group
     bpy.utils.register_class(DepthifyProperties)
     bpy.types.Scene.depthify_properties = bpy.props.PointerProperty(type=DepthifyProperties)
 
-    # Register the depthify and operators modules
-    depthify.register()
+    # Register the handlers, lod and operators modules
+    handlers.register()
+    lod.register()
     operators.register()
 
     # Register the custom panel class
@@ -201,7 +689,7 @@ def register():
     register_translations()
 
     # Log a message to the console
-    logging.info("Depthify addon registered")
+    logging.info(f"Depthify addon registered in {(time.perf_counter() - start) * 1000:.1f} ms")
 
 # Define a function to unregister the addon
 def unregister():
@@ -211,9 +699,10 @@ def unregister():
     # Unregister the custom panel class
     bpy.utils.unregister_class(DepthifyPanel)
 
-    # Unregister the depthify and operators modules
+    # Unregister the handlers, lod and operators modules
     operators.unregister()
-    depthify.unregister()
+    lod.unregister()
+    handlers.unregister()
 
     # Unregister the custom property group
     del bpy.types.Scene.depthify_properties
@@ -0,0 +1,509 @@
+"""Convert folders of depth maps to meshes without the UI.
+
+Run it with Blender in background mode, passing the batch arguments after "--":
+
+    blender -b --factory-startup --python Depthify/batch.py -- \
+        --input depth_frames/ --output meshes/ --format glb --preset preset.json --workers 4
+
+The preset is a JSON or TOML file whose keys are DepthifyProperties names,
+such as subdivisions, depth_scale or displacement_strength. Finished files are
+recorded in a manifest in the output folder, so an interrupted batch resumes
+where it stopped when run again.
+
+With --direct the grid surface is written straight to PLY, STL, OBJ or GLB
+files by the export module, without Blender; only the depth_scale and
+downsample values of the preset apply:
+
+    python Depthify/batch.py --input depth_frames/ --output meshes/ --format ply --direct
+"""
+
+# Import the necessary modules
+import argparse
+import glob
+import importlib
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+
+# Define the image file extensions picked up from input folders
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".tif", ".tiff", ".exr", ".hdr", ".bmp", ".npy"}
+
+# Define the output formats and the file extension of each
+OUTPUT_FORMATS = {"blend": ".blend", "glb": ".glb", "obj": ".obj", "ply": ".ply", "stl": ".stl"}
+
+# Define the name of the manifest file that records finished files
+MANIFEST_NAME = "depthify_batch.jsonl"
+
+# Define a function to parse the batch arguments
+def parse_args(argv):
+    """Parse the batch arguments.
+
+    Args:
+        argv (list): The arguments, without the ones Blender consumes before "--".
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+
+    # Define the command line interface
+    parser = argparse.ArgumentParser(prog="depthify-batch", description="Convert depth maps to meshes.")
+    parser.add_argument("--input", required=True, help="A folder of depth maps or a glob pattern")
+    parser.add_argument("--output", required=True, help="The folder to write the meshes to")
+    parser.add_argument("--format", choices=sorted(OUTPUT_FORMATS), default="blend", help="The output file format")
+    parser.add_argument("--preset", help="A JSON or TOML file of DepthifyProperties values")
+    parser.add_argument("--workers", type=int, default=1, help="The number of Blender processes to run")
+    parser.add_argument("--blender", default=None, help="The Blender executable used for worker processes")
+    parser.add_argument("--direct", action="store_true", help="Write grid meshes without Blender")
+    parser.add_argument("--no-resume", action="store_true", help="Convert every file again, ignoring the manifest")
+    parser.add_argument("--file-list", help=argparse.SUPPRESS)
+
+    # Parse the arguments
+    return parser.parse_args(argv)
+
+# Define a function to find the depth maps to convert
+def find_inputs(pattern):
+    """Find the depth maps to convert.
+
+    Args:
+        pattern (str): A folder of depth maps or a glob pattern.
+
+    Returns:
+        list: The sorted absolute paths of the depth maps.
+    """
+
+    # Take every image in a folder, or every match of a glob pattern
+    if os.path.isdir(pattern):
+        paths = [os.path.join(pattern, name) for name in os.listdir(pattern)
+                 if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS]
+    else:
+        paths = glob.glob(pattern, recursive=True)
+
+    # Return the files in a stable order
+    return sorted(os.path.abspath(path) for path in paths if os.path.isfile(path))
+
+# Define a function to load a preset file
+def load_preset(path):
+    """Load a preset of DepthifyProperties values from a JSON or TOML file.
+
+    Args:
+        path (str): The path of the preset file, or None for no preset.
+
+    Returns:
+        dict: The property names and values.
+    """
+
+    # Return no values when there is no preset
+    if not path:
+        return {}
+
+    # Parse TOML presets with the standard library parser of Python 3.11 and later
+    if path.lower().endswith(".toml"):
+        import tomllib
+        with open(path, "rb") as file:
+            return tomllib.load(file)
+
+    # Parse everything else as JSON
+    with open(path) as file:
+        return json.load(file)
+
+# Define a function to get the output path of a depth map
+def output_path(input_path, output_dir, output_format):
+    """Get the output path of a depth map.
+
+    Args:
+        input_path (str): The path of the depth map.
+        output_dir (str): The folder to write the meshes to.
+        output_format (str): The output file format.
+
+    Returns:
+        str: The path of the mesh file.
+    """
+
+    # Keep the name of the depth map and change its extension
+    name = os.path.splitext(os.path.basename(input_path))[0]
+    return os.path.join(output_dir, name + OUTPUT_FORMATS[output_format])
+
+# Define a function to read the manifest of finished files
+def read_manifest(output_dir):
+    """Read the manifest of files converted by earlier runs.
+
+    Args:
+        output_dir (str): The folder the meshes are written to.
+
+    Returns:
+        dict: The latest manifest record of every input path.
+    """
+
+    # Return no records when there is no manifest yet
+    records = {}
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return records
+
+    # Keep the latest record of every input, skipping lines cut short by an interruption
+    with open(path) as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            records[record["input"]] = record
+    return records
+
+# Define a function to append a record to the manifest
+def write_manifest(output_dir, record):
+    """Append a record to the manifest of finished files.
+
+    Args:
+        output_dir (str): The folder the meshes are written to.
+        record (dict): The record of a converted file.
+
+    Returns:
+        None.
+    """
+
+    # Append one line per record, which worker processes can do concurrently
+    with open(os.path.join(output_dir, MANIFEST_NAME), "a") as file:
+        file.write(json.dumps(record) + "\n")
+
+# Define a function to pick the depth maps that still need converting
+def pending_inputs(inputs, output_dir, output_format):
+    """Pick the depth maps that have no up to date output from an earlier run.
+
+    Args:
+        inputs (list): The paths of the depth maps.
+        output_dir (str): The folder the meshes are written to.
+        output_format (str): The output file format.
+
+    Returns:
+        list: The paths of the depth maps to convert.
+    """
+
+    # Skip inputs whose output exists and was made from the current version of the input
+    records = read_manifest(output_dir)
+    pending = []
+    for path in inputs:
+        record = records.get(path)
+        if (record and record["status"] == "ok" and record["mtime"] == os.path.getmtime(path)
+                and os.path.exists(output_path(path, output_dir, output_format))):
+            continue
+        pending.append(path)
+    return pending
+
+# Define a function to import the add-on package
+def import_addon():
+    """Import the add-on package that contains this module.
+
+    Returns:
+        module: The add-on package.
+    """
+
+    # Import the package directly when this module is part of it
+    if __package__:
+        return importlib.import_module(__package__)
+
+    # Otherwise import the folder of this script as a package
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.dirname(package_dir))
+    return importlib.import_module(os.path.basename(package_dir))
+
+# Define a function to export the scene to a mesh file
+def export_scene(path, output_format):
+    """Export the scene to a mesh file with Blender's exporters.
+
+    Args:
+        path (str): The path of the mesh file.
+        output_format (str): The output file format.
+
+    Returns:
+        None.
+    """
+
+    # Import bpy, which is only available inside Blender
+    import bpy
+
+    # Export with the exporter of the format, preferring the newer built-in operators
+    if output_format == "blend":
+        bpy.ops.wm.save_as_mainfile(filepath=path, copy=True)
+    elif output_format == "glb":
+        bpy.ops.export_scene.gltf(filepath=path, export_format='GLB')
+    elif output_format == "obj":
+        if hasattr(bpy.ops.wm, "obj_export"):
+            bpy.ops.wm.obj_export(filepath=path)
+        else:
+            bpy.ops.export_scene.obj(filepath=path)
+    elif output_format == "ply":
+        if hasattr(bpy.ops.wm, "ply_export"):
+            bpy.ops.wm.ply_export(filepath=path)
+        else:
+            bpy.ops.export_mesh.ply(filepath=path)
+    elif output_format == "stl":
+        if hasattr(bpy.ops.wm, "stl_export"):
+            bpy.ops.wm.stl_export(filepath=path)
+        else:
+            bpy.ops.export_mesh.stl(filepath=path)
+
+# Define a function to convert depth maps in this Blender process
+def convert_files(inputs, output_dir, output_format, preset):
+    """Convert depth maps to mesh files in this Blender process.
+
+    Args:
+        inputs (list): The paths of the depth maps.
+        output_dir (str): The folder to write the meshes to.
+        output_format (str): The output file format.
+        preset (dict): The DepthifyProperties values to apply.
+
+    Returns:
+        list: The manifest record of every converted file.
+    """
+
+    # Import bpy and register the add-on unless it is already enabled
+    import bpy
+    addon = import_addon()
+    if not hasattr(bpy.types.Scene, "depthify_properties"):
+        addon.register()
+
+    # Convert the depth maps one after another
+    records = []
+    for path in inputs:
+        start = time.perf_counter()
+        target = output_path(path, output_dir, output_format)
+        try:
+            # Start from an empty scene and apply the preset
+            bpy.ops.wm.read_homefile(use_empty=True)
+            props = bpy.context.scene.depthify_properties
+            for name, value in preset.items():
+                if hasattr(props, name):
+                    setattr(props, name, value)
+                else:
+                    logging.warning(f"Ignoring unknown preset property: {name}")
+
+            # Build the surface with the operator and export it
+            props.image = path
+            result = bpy.ops.object.depthify_create_surface()
+            if 'FINISHED' not in result:
+                raise RuntimeError(f"Create Surface returned {result}")
+            export_scene(target, output_format)
+            status, error = "ok", None
+        except Exception as e:
+            # Record the failure and carry on with the next file
+            logging.error(f"Failed to convert {path}: {e}")
+            status, error = "failed", str(e)
+
+        # Record the result in the manifest as soon as the file is done
+        record = {"input": path, "output": target, "status": status, "error": error,
+                  "mtime": os.path.getmtime(path), "seconds": time.perf_counter() - start}
+        write_manifest(output_dir, record)
+        records.append(record)
+        logging.info(f"{status}: {path} in {record['seconds']:.2f}s")
+
+    # Return the records of this process
+    return records
+
+# Define a function to convert depth maps without Blender
+def convert_files_direct(inputs, output_dir, output_format, preset):
+    """Write the grid surfaces of depth maps straight to mesh files with the export module.
+
+    Args:
+        inputs (list): The paths of the depth maps.
+        output_dir (str): The folder to write the meshes to.
+        output_format (str): The output file format, which must not be blend.
+        preset (dict): The DepthifyProperties values, of which depth_scale and downsample apply.
+
+    Returns:
+        list: The manifest record of every converted file.
+    """
+
+    # Import the export and storage modules from the package or from the folder of this script
+    if __package__:
+        export = importlib.import_module(__package__ + ".export")
+        storage = importlib.import_module(__package__ + ".storage")
+    else:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import export
+        import storage
+
+    # Read the settings that shape the grid
+    depth_scale = preset.get("depth_scale", export.geometry.DEPTH_SCALE)
+    downsample = preset.get("downsample", 1)
+
+    # Convert the depth maps one after another
+    records = []
+    for path in inputs:
+        start = time.perf_counter()
+        target = output_path(path, output_dir, output_format)
+        try:
+            # Load the depth map through the sidecar cache and stream its surface to the file
+            depth, _ = storage.load_depth(path)
+            export.export_depth(target, depth, downsample, depth_scale)
+            status, error = "ok", None
+        except Exception as e:
+            # Record the failure and carry on with the next file
+            logging.error(f"Failed to convert {path}: {e}")
+            status, error = "failed", str(e)
+
+        # Record the result in the manifest as soon as the file is done
+        record = {"input": path, "output": target, "status": status, "error": error,
+                  "mtime": os.path.getmtime(path), "seconds": time.perf_counter() - start}
+        write_manifest(output_dir, record)
+        records.append(record)
+        logging.info(f"{status}: {path} in {record['seconds']:.2f}s")
+
+    # Return the records of this process
+    return records
+
+# Define a function to convert depth maps in parallel Blender processes
+def run_workers(inputs, args):
+    """Convert depth maps in parallel background Blender processes.
+
+    Args:
+        inputs (list): The paths of the depth maps.
+        args (argparse.Namespace): The parsed batch arguments.
+
+    Returns:
+        int: The number of worker processes that exited with an error, whose unconverted files count as missing.
+    """
+
+    # Find the Blender executable, which is the running one inside Blender
+    blender = args.blender
+    if blender is None:
+        try:
+            import bpy
+            blender = bpy.app.binary_path
+        except ImportError:
+            blender = "blender"
+
+    # Give every worker an interleaved share of the files
+    processes = []
+    for index in range(args.workers):
+        share = inputs[index::args.workers]
+        if not share:
+            continue
+        file_list = os.path.join(args.output, f".depthify_batch_{index}.json")
+        with open(file_list, "w") as file:
+            json.dump(share, file)
+
+        # Start a background Blender process that runs this script on its share
+        command = [blender, "-b", "--factory-startup", "--python", os.path.abspath(__file__), "--",
+                   "--input", args.input, "--output", args.output, "--format", args.format,
+                   "--file-list", file_list, "--workers", "1", "--no-resume"]
+        if args.preset:
+            command += ["--preset", args.preset]
+        processes.append((subprocess.Popen(command), file_list))
+
+    # Wait for the workers and remove their file lists, reporting the ones that crashed or had failed files
+    errors = 0
+    for index, (process, file_list) in enumerate(processes):
+        if process.wait() != 0:
+            logging.error(f"Worker process {index} exited with status {process.returncode}")
+            errors += 1
+        os.remove(file_list)
+    return errors
+
+# Define a function to count the files of the batch that were not converted
+def count_failures(inputs, output_dir):
+    """Count the depth maps that failed or have no manifest record, such as the files of a crashed worker.
+
+    Args:
+        inputs (list): The paths of the depth maps converted in this run.
+        output_dir (str): The folder the meshes are written to.
+
+    Returns:
+        int: The number of failed or missing files.
+    """
+
+    # Look up the latest record of every file
+    records = read_manifest(output_dir)
+    return sum(1 for path in inputs if records.get(path, {}).get("status") != "ok")
+
+# Define a function to print a summary of the batch
+def print_summary(inputs, output_dir, skipped):
+    """Print a summary of the batch with the timing of every file.
+
+    Args:
+        inputs (list): The paths of the depth maps converted in this run.
+        output_dir (str): The folder the meshes are written to.
+        skipped (int): The number of files skipped because they were already converted.
+
+    Returns:
+        None.
+    """
+
+    # Get the records of the files converted in this run
+    records = read_manifest(output_dir)
+    done = [records[path] for path in inputs if path in records]
+    failed = [record for record in done if record["status"] != "ok"]
+    total = sum(record["seconds"] for record in done)
+
+    # Print the timing of every file, slowest first, followed by the totals
+    for record in sorted(done, key=lambda record: -record["seconds"]):
+        print(f"{record['seconds']:8.2f}s  {record['status']:6}  {record['input']}")
+    print(f"Converted {len(done) - len(failed)} files, {len(failed)} failed, {skipped} skipped, "
+          f"{len(inputs) - len(done)} missing, {total:.1f}s of conversion time")
+
+# Define the entry point of the batch
+def main(argv=None):
+    """Run the batch.
+
+    Args:
+        argv (list): The arguments, or None to read the ones after "--" on the command line.
+
+    Returns:
+        int: The exit status, which is 1 when any file failed or was not converted, so that scripts can detect it.
+    """
+
+    # Read the arguments after "--", which Blender leaves to scripts
+    if argv is None:
+        argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+
+    # Check the output folder and read the preset
+    os.makedirs(args.output, exist_ok=True)
+    preset = load_preset(args.preset)
+
+    # Get the depth maps of this process, either from a worker file list or from the input
+    if args.file_list:
+        with open(args.file_list) as file:
+            inputs = json.load(file)
+    else:
+        inputs = find_inputs(args.input)
+    if not inputs:
+        logging.error(f"No depth maps found for: {args.input}")
+        return 1
+
+    # Skip the files converted by an earlier run
+    pending = inputs if args.no_resume else pending_inputs(inputs, args.output, args.format)
+    skipped = len(inputs) - len(pending)
+
+    # Write the meshes without Blender when asked to, which cannot produce .blend files
+    worker_errors = 0
+    if args.direct:
+        if args.format == "blend":
+            logging.error("The blend format needs Blender and cannot be used with --direct")
+            return 1
+        convert_files_direct(pending, args.output, args.format, preset)
+
+    # Convert the files in worker processes or in this process
+    elif args.workers > 1 and len(pending) > 1:
+        worker_errors = run_workers(pending, args)
+    else:
+        convert_files(pending, args.output, args.format, preset)
+
+    # Print the summary, except in worker processes whose coordinator prints it
+    if not args.file_list:
+        print_summary(pending, args.output, skipped)
+
+    # Fail when any file failed or is missing, or when a worker exited with an error
+    failures = count_failures(pending, args.output)
+    if failures or worker_errors:
+        logging.error(f"{failures} of {len(pending)} files failed or were not converted")
+        return 1
+    return 0
+
+# Run the batch when the script is executed
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,567 @@
+"""Benchmark the Depthify pipeline on synthetic depth maps.
+
+The NumPy stages run with plain Python:
+
+    python Depthify/benchmark.py --sizes 256 1024 4096 --output results.json
+
+The Blender stages are added when the script runs inside background Blender:
+
+    blender -b --factory-startup --python Depthify/benchmark.py -- --output results.json
+
+Add --render to also render every surface in the grid and displacement-only
+modes with Cycles, comparing render time, mesh size and geometric error:
+
+    blender -b --factory-startup --python Depthify/benchmark.py -- --render --render-size 512
+
+Inside Blender the benchmark also measures enabling the add-on and opening a
+.blend file with a surface, neither of which should import the pipeline or
+decode a depth map.
+
+Compare two result files, for example from two revisions:
+
+    python Depthify/benchmark.py --compare before.json after.json
+"""
+
+# Import the necessary modules
+import argparse
+import importlib
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+# Import bpy when running inside Blender
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+# Define the synthetic depth map patterns
+PATTERNS = ("gradient", "noise", "steps", "terrain")
+
+# Define the default depth map sizes
+SIZES = (256, 512, 1024, 2048, 4096, 8192)
+
+# Define a function to import the add-on modules
+def load_modules():
+    """Import the add-on modules used by the benchmark.
+
+    Inside Blender the add-on package is imported, so that its operators and
+    properties can be registered; outside Blender the pure NumPy modules are
+    imported directly from the folder of this script.
+
+    Returns:
+        dict: The imported modules by name.
+    """
+
+    # Import the folder of this script as a package inside Blender
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    if bpy is not None:
+        sys.path.insert(0, os.path.dirname(package_dir))
+        prefix = os.path.basename(package_dir) + "."
+    else:
+        sys.path.insert(0, package_dir)
+        prefix = ""
+
+    # Import the modules, adding the Blender modules only inside Blender
+    names = ["compact", "geometry", "ingest", "preprocess", "tiles"] + (["depthify", "lod"] if bpy is not None else [])
+    return {name: importlib.import_module(prefix + name) for name in names}
+
+# Define a function to generate a synthetic depth map
+def synthetic_depth(pattern, size, seed=0):
+    """Generate a synthetic depth map.
+
+    Args:
+        pattern (str): One of gradient, noise, steps or terrain.
+        size (int): The width and height of the depth map.
+        seed (int): The seed of the random patterns.
+
+    Returns:
+        numpy.ndarray: The float32 depth map of shape (size, size) with values in the 0-1 range.
+    """
+
+    # Create the random generator and the pixel coordinates
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0.0, 1.0, size, dtype=np.float32)
+
+    # Build the requested pattern
+    if pattern == "gradient":
+        # Use a smooth ramp that is flat enough to decimate well
+        depth = (x[None, :] * 0.7 + x[:, None] * 0.3).astype(np.float32)
+    elif pattern == "noise":
+        # Use uncorrelated noise, the worst case for every stage
+        depth = rng.random((size, size), dtype=np.float32)
+    elif pattern == "steps":
+        # Use flat terraces separated by sharp depth edges
+        depth = (np.floor(x * 8)[None, :] / 8 * 0.5 + np.floor(x * 5)[:, None] / 5 * 0.5).astype(np.float32)
+    elif pattern == "terrain":
+        # Shape white noise with a 1/f^2 spectrum to get fractal, terrain-like relief
+        frequency_y = np.fft.fftfreq(size).astype(np.float32)[:, None]
+        frequency_x = np.fft.rfftfreq(size).astype(np.float32)[None, :]
+        spectrum = np.fft.rfft2(rng.standard_normal((size, size), dtype=np.float32))
+        spectrum /= np.maximum(frequency_y ** 2 + frequency_x ** 2, 1.0 / size ** 2)
+        depth = np.fft.irfft2(spectrum, s=(size, size)).astype(np.float32)
+        depth -= depth.min()
+        depth /= max(float(depth.max()), 1e-12)
+    else:
+        raise ValueError(f"Unknown pattern: {pattern}")
+
+    # Return the depth map
+    return depth
+
+# Define a function to get the peak resident set size of the process
+def peak_rss():
+    """Get the peak resident set size of the process.
+
+    Returns:
+        int: The peak resident set size in bytes, or None where it is not available.
+    """
+
+    # Read the peak from the resource module, which is only available on Unix
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Convert kilobytes to bytes, except on macOS which reports bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+# Define a function to measure a stage
+def measure(function, *args, **kwargs):
+    """Run a stage and measure its wall time and memory.
+
+    Args:
+        function (callable): The stage to run.
+        *args: The positional arguments of the stage.
+        **kwargs: The keyword arguments of the stage.
+
+    Returns:
+        tuple: The result of the stage and a dictionary with its seconds, traced peak bytes and peak RSS.
+    """
+
+    # Trace the allocations of the stage
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = function(*args, **kwargs)
+    finally:
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    # Return the result with the measurements
+    return result, {"seconds": seconds, "peak_bytes": peak, "peak_rss": peak_rss()}
+
+# Define a function to run the NumPy stages on a depth map
+def run_numpy_stages(modules, depth, path, workers, adaptive_max_size, render_size=1024):
+    """Run the NumPy stages of the pipeline on a depth map.
+
+    Args:
+        modules (dict): The modules returned by load_modules.
+        depth (numpy.ndarray): The depth map.
+        path (str): The path of the depth map saved as a .npy file.
+        workers (int): The number of worker threads, or 0 for one per CPU core.
+        adaptive_max_size (int): The largest size for which the adaptive stage runs.
+        render_size (int): The render width at which the error of the displacement-only mode is estimated.
+
+    Returns:
+        list: The measurements of every stage.
+    """
+
+    # Get the modules and the size of the depth map
+    geometry, ingest, tiles = modules["geometry"], modules["ingest"], modules["tiles"]
+    height, width = depth.shape
+    results = []
+
+    # Measure the ingestion of the depth map file
+    (loaded, _), stats = measure(ingest.load_depth, path)
+    results.append(dict(stats, stage="ingest", pixels=depth.size))
+
+    # Measure a typical preprocessing chain, recording the time of every filter
+    preprocess = modules["preprocess"]
+    settings = {"fill_holes": True, "denoise": 'MEDIAN', "normalize": True}
+    (_, timings), stats = measure(preprocess.preprocess, loaded, settings)
+    results.append(dict(stats, stage="preprocess", pixels=depth.size, filters=timings))
+
+    # Measure the single-threaded and the parallel grid builders
+    (vertices, faces), stats = measure(geometry.build_grid, width, height, loaded)
+    results.append(dict(stats, stage="grid", pixels=depth.size, vertices=len(vertices), faces=len(faces)))
+    del vertices, faces
+    (vertices, faces), stats = measure(tiles.build_grid_parallel, loaded, 1, geometry.DEPTH_SCALE, workers)
+    results.append(dict(stats, stage="grid_parallel", pixels=depth.size, vertices=len(vertices), faces=len(faces),
+                        workers=tiles.worker_count(workers)))
+
+    # Measure the normals and UVs computed for the grid
+    heights = vertices[:, 2].reshape(height, width)
+    _, stats = measure(geometry.surface_attributes, vertices, faces, heights, depth.shape)
+    results.append(dict(stats, stage="surface_attributes", pixels=depth.size, vertices=len(vertices)))
+    del vertices, faces, heights
+
+    # Measure the quantized encoding with its accuracy against float32, and the grid builder dequantizing its bands
+    compact = modules["compact"]
+    encoded, stats = measure(compact.compact_depth, loaded, "uint16")
+    results.append(dict(stats, stage="compact", pixels=depth.size, bytes=encoded.encoded_bytes,
+                        accuracy=compact.accuracy_report(loaded)))
+    (vertices, faces), stats = measure(tiles.build_grid_parallel, encoded, 1, geometry.DEPTH_SCALE, workers)
+    results.append(dict(stats, stage="grid_compact", pixels=depth.size, vertices=len(vertices), faces=len(faces),
+                        workers=tiles.worker_count(workers)))
+    del encoded, vertices, faces
+
+    # Measure the adaptive builder on sizes where it finishes in reasonable time
+    if max(height, width) <= adaptive_max_size:
+        (vertices, faces, sizes, adaptive), stats = measure(geometry.build_adaptive, width, height, loaded, 0.01)
+        results.append(dict(stats, stage="adaptive", pixels=depth.size, vertices=len(vertices), faces=len(sizes),
+                            max_error=adaptive["max_error"]))
+
+    # Measure the displacement-only plane and estimate its error when diced at one micropolygon per render pixel
+    (vertices, faces, uvs), stats = measure(geometry.build_plane, width, height)
+    results.append(dict(stats, stage="displacement_plane", pixels=depth.size, vertices=len(vertices),
+                        faces=len(faces), max_error=dicing_error(geometry, depth, render_size)))
+
+    # Return the measurements
+    return results
+
+# Define a function to estimate the error of the displacement-only mode at a render size
+def dicing_error(geometry, depth, render_size, dicing_rate=1.0):
+    """Estimate the vertical error of the displacement-only mode against the grid mode.
+
+    The surface is assumed to fill the width of the frame, so each
+    micropolygon of dicing_rate render pixels spans this many depth pixels.
+
+    Args:
+        geometry (module): The geometry module.
+        depth (numpy.ndarray): The depth map.
+        render_size (int): The width of the render in pixels.
+        dicing_rate (float): The size of the micropolygons on screen, in pixels.
+
+    Returns:
+        float: The largest vertical error in surface units.
+    """
+
+    # Convert the micropolygon size from render pixels to depth map pixels
+    step = max(int(round(max(depth.shape) / render_size * dicing_rate)), 1)
+    return geometry.dicing_error(depth, step) * geometry.DEPTH_SCALE
+
+# Define a function to run the Blender stages on a depth map
+def run_blender_stages(modules, depth, path, workers):
+    """Run the Blender stages of the pipeline on a depth map.
+
+    Args:
+        modules (dict): The modules returned by load_modules.
+        depth (numpy.ndarray): The depth map.
+        path (str): The path of the depth map saved as a .npy file.
+        workers (int): The number of worker threads, or 0 for one per CPU core.
+
+    Returns:
+        list: The measurements of every stage.
+    """
+
+    # Get the modules and the size of the depth map
+    depthify, ingest = modules["depthify"], modules["ingest"]
+    height, width = depth.shape
+    results = []
+
+    # Save the depth map as a PNG so that Blender can load it
+    image = bpy.data.images.new("depthify_benchmark", width, height, float_buffer=True)
+    pixels = np.empty((height, width, 4), dtype=np.float32)
+    pixels[..., :3] = depth[..., None]
+    pixels[..., 3] = 1.0
+    image.pixels.foreach_set(pixels.ravel())
+    png_path = os.path.splitext(path)[0] + ".png"
+    image.filepath_raw = png_path
+    image.file_format = 'PNG'
+    image.save()
+    bpy.data.images.remove(image)
+
+    # Measure the ingestion of the PNG through Blender's image loader
+    _, stats = measure(ingest.load_depth, png_path)
+    results.append(dict(stats, stage="ingest_blender", pixels=depth.size))
+
+    # Measure the creation of the surface mesh, including the upload to Blender
+    surface, stats = measure(depthify.create_surface, width, height, depth, workers=workers)
+    results.append(dict(stats, stage="create_surface", pixels=depth.size,
+                        vertices=len(surface.data.vertices), faces=len(surface.data.polygons)))
+
+    # Measure the subdivision and displacement stages
+    bpy.context.scene.collection.objects.link(surface)
+    bpy.context.scene.depthify_properties.image = png_path
+    _, stats = measure(depthify.apply_adaptive_subdivision, surface, 2, 'CATMULL_CLARK')
+    results.append(dict(stats, stage="apply_adaptive_subdivision", pixels=depth.size))
+    _, stats = measure(depthify.apply_displacement, surface, 1.0, 'TRUE')
+    results.append(dict(stats, stage="apply_displacement", pixels=depth.size))
+
+    # Remove the surface and its data so that sizes do not add up
+    mesh = surface.data
+    bpy.data.objects.remove(surface)
+    bpy.data.meshes.remove(mesh)
+    bpy.ops.outliner.orphans_purge(do_recursive=True)
+
+    # Return the measurements
+    return results
+
+# Define a function to measure enabling the add-on and opening a file that uses it
+def run_startup_stages(directory):
+    """Measure enabling the add-on and opening a .blend file with a surface inside Blender.
+
+    Enabling is measured first, before anything else imports the add-on
+    modules, and records whether it loaded the depthify module.
+
+    Args:
+        directory (str): The directory to save the .blend file in.
+
+    Returns:
+        list: The measurements of both stages.
+    """
+
+    # Import and register the add-on package, as enabling it in the preferences does
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.dirname(package_dir))
+    package = os.path.basename(package_dir)
+    _, stats = measure(lambda: importlib.import_module(package).register())
+    results = [dict(stats, stage="enable_addon", pipeline_loaded=f"{package}.depthify" in sys.modules)]
+
+    # Save a file with a small surface
+    depthify = importlib.import_module(package + ".depthify")
+    surface = depthify.create_surface(256, 256, synthetic_depth("terrain", 256))
+    bpy.context.scene.collection.objects.link(surface)
+    path = os.path.join(directory, "startup.blend")
+    bpy.ops.wm.save_as_mainfile(filepath=path)
+
+    # Measure opening the file again, which runs the load handlers of the add-on
+    _, stats = measure(bpy.ops.wm.open_mainfile, filepath=path)
+    results.append(dict(stats, stage="open_file"))
+
+    # Return the measurements
+    return results
+
+# Define a function to render a depth map in the grid and displacement-only modes
+def run_render_comparison(modules, depth, png_path, render_size, samples=4):
+    """Build and render a depth map in the grid and displacement-only modes with Cycles.
+
+    A last render of the grid with levels of detail checks that the render
+    evaluates the full level rather than the proxy shown in the viewport.
+
+    Args:
+        modules (dict): The modules returned by load_modules.
+        depth (numpy.ndarray): The depth map.
+        png_path (str): The path of the depth map saved as a PNG by run_blender_stages.
+        render_size (int): The width and height of the render in pixels.
+        samples (int): The number of Cycles samples.
+
+    Returns:
+        list: The build and render measurements of both modes.
+    """
+
+    # Render a square frame with a few samples, since only the geometry cost is of interest
+    scene = bpy.context.scene
+    scene.render.engine = 'CYCLES'
+    scene.cycles.samples = samples
+    scene.render.resolution_x = scene.render.resolution_y = render_size
+    scene.render.resolution_percentage = 100
+
+    # Look straight down at the surface with an orthographic camera that frames it
+    size = max(depth.shape)
+    camera = bpy.data.objects.new("depthify_benchmark_camera", bpy.data.cameras.new("depthify_benchmark_camera"))
+    camera.data.type = 'ORTHO'
+    camera.data.ortho_scale = size
+    camera.data.clip_end = size * 4
+    camera.location = (0.0, 0.0, size * 2)
+    scene.collection.objects.link(camera)
+    scene.camera = camera
+
+    # Build the surface through the operator in each mode, without extra subdivision of the grid
+    props = scene.depthify_properties
+    props.image = png_path
+    props.subdivisions = 0
+    results = []
+    for mode in ('GRID', 'DISPLACEMENT'):
+        props.geometry_mode = mode
+        _, stats = measure(bpy.ops.object.depthify_create_surface)
+        surface = props.surface
+        mesh = surface.data
+        results.append(dict(stats, stage=f"build_{mode.lower()}", pixels=depth.size,
+                            vertices=len(mesh.vertices), faces=len(mesh.polygons)))
+
+        # Render the frame and record the error against the grid, which matches the depth map at every pixel
+        _, stats = measure(bpy.ops.render.render)
+        error = dicing_error(modules["geometry"], depth, render_size) if mode == 'DISPLACEMENT' else 0.0
+        results.append(dict(stats, stage=f"render_{mode.lower()}", pixels=depth.size, max_error=error))
+
+        # Remove the surface so that the next mode renders alone
+        bpy.data.objects.remove(surface)
+        if mesh.users == 0:
+            bpy.data.meshes.remove(mesh)
+
+    # Build the grid with levels of detail, so that the viewport shows the coarsest proxy
+    props.geometry_mode = 'GRID'
+    props.use_lod = True
+    props.lod_levels = 2
+    props.lod_distance = 0.001
+    _, stats = measure(bpy.ops.object.depthify_create_surface)
+    surface = props.surface
+    full_vertices = len(modules["lod"].lod_meshes(surface)[0].vertices)
+
+    # Record the vertex count the render evaluated, which must be the one of the full level
+    rendered = []
+    def record_vertices(scene, depsgraph=None):
+        evaluated = surface.evaluated_get(depsgraph) if depsgraph is not None else surface
+        rendered.append(len(evaluated.data.vertices))
+    bpy.app.handlers.render_post.append(record_vertices)
+    try:
+        _, stats = measure(bpy.ops.render.render)
+    finally:
+        bpy.app.handlers.render_post.remove(record_vertices)
+    results.append(dict(stats, stage="render_lod", pixels=depth.size, proxy_vertices=len(surface.data.vertices),
+                        rendered_full_level=rendered == [full_vertices]))
+    if rendered != [full_vertices]:
+        print(f"The render used {rendered} vertices instead of the {full_vertices} of the full level")
+
+    # Remove the surface with its levels of detail and restore the setting
+    modules["depthify"].remove_object(surface)
+    props.use_lod = False
+
+    # Remove the camera and the data left behind
+    bpy.data.objects.remove(camera)
+    bpy.ops.outliner.orphans_purge(do_recursive=True)
+    return results
+
+# Define a function to describe the environment of a run
+def environment():
+    """Describe the revision and environment of a benchmark run.
+
+    Returns:
+        dict: The git revision, versions and machine of the run.
+    """
+
+    # Get the git revision of the add-on, if it is in a git checkout
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                  cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        revision = None
+
+    # Collect the versions and the machine
+    return {
+        "revision": revision,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "blender": bpy.app.version_string if bpy is not None else None,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+# Define a function to compare two result files
+def compare(before_path, after_path, threshold=1.2, min_seconds=0.05):
+    """Print the change of every stage between two result files.
+
+    Args:
+        before_path (str): The path of the earlier result file.
+        after_path (str): The path of the later result file.
+        threshold (float): The time ratio above which a stage is flagged as a regression.
+        min_seconds (float): The time below which a stage is never flagged, since timer noise dominates.
+
+    Returns:
+        int: The number of regressions.
+    """
+
+    # Index the results of both files by pattern, size and stage
+    def index(path):
+        with open(path) as file:
+            data = json.load(file)
+        return {(r["pattern"], r["size"], r["stage"]): r for r in data["results"]}
+    before, after = index(before_path), index(after_path)
+
+    # Print the time and memory ratio of every stage present in both files
+    regressions = 0
+    print(f"{'pattern':10} {'size':>6} {'stage':28} {'before':>9} {'after':>9} {'ratio':>6} {'peak':>6}")
+    for key in sorted(before.keys() & after.keys()):
+        old, new = before[key], after[key]
+        ratio = new["seconds"] / max(old["seconds"], 1e-9)
+        peak = new["peak_bytes"] / max(old["peak_bytes"], 1)
+        flag = "  REGRESSION" if ratio > threshold and new["seconds"] >= min_seconds else ""
+        regressions += bool(flag)
+        print(f"{key[0]:10} {key[1]:6} {key[2]:28} {old['seconds']:8.3f}s {new['seconds']:8.3f}s "
+              f"{ratio:5.2f}x {peak:5.2f}x{flag}")
+    return regressions
+
+# Define the entry point of the benchmark
+def main(argv=None):
+    """Run the benchmark.
+
+    Args:
+        argv (list): The arguments, or None to read the ones after "--" on the command line.
+
+    Returns:
+        int: The exit status.
+    """
+
+    # Read the arguments after "--", which Blender leaves to scripts
+    if argv is None:
+        argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    parser = argparse.ArgumentParser(prog="depthify-benchmark", description="Benchmark the Depthify pipeline.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="The depth map sizes")
+    parser.add_argument("--patterns", nargs="+", choices=PATTERNS, default=list(PATTERNS), help="The patterns")
+    parser.add_argument("--workers", type=int, default=0, help="The number of worker threads, 0 for all cores")
+    parser.add_argument("--adaptive-max-size", type=int, default=2048, help="The largest size for the adaptive stage")
+    parser.add_argument("--render", action="store_true", help="Render the grid and displacement-only modes in Blender")
+    parser.add_argument("--render-size", type=int, default=1024, help="The render size used to compare the modes")
+    parser.add_argument("--output", default="depthify_benchmark.json", help="The result file to write")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two result files")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    # Compare result files instead of running when asked to
+    if args.compare:
+        return 1 if compare(*args.compare) else 0
+
+    # Run every stage on every pattern and size
+    results = []
+    with tempfile.TemporaryDirectory(prefix="depthify_benchmark_") as directory:
+        # Measure enabling the add-on inside Blender before the benchmark imports its modules
+        if bpy is not None and not hasattr(bpy.types.Scene, "depthify_properties"):
+            for result in run_startup_stages(directory):
+                result.update(pattern="startup", size=0)
+                print(f"{'startup':10} {0:6} {result['stage']:28} {result['seconds']:8.3f}s "
+                      f"{result['peak_bytes'] / 2**20:9.1f} MiB")
+                results.append(result)
+
+        # Import the modules
+        modules = load_modules()
+        for size in args.sizes:
+            for pattern in args.patterns:
+                # Generate the depth map and save it where the ingestion stage reads it
+                depth = synthetic_depth(pattern, size)
+                path = os.path.join(directory, f"{pattern}_{size}.npy")
+                np.save(path, depth)
+
+                # Run the stages and label their measurements
+                stages = run_numpy_stages(modules, depth, path, args.workers, args.adaptive_max_size, args.render_size)
+                if bpy is not None:
+                    stages += run_blender_stages(modules, depth, path, args.workers)
+                    if args.render:
+                        stages += run_render_comparison(modules, depth, os.path.splitext(path)[0] + ".png",
+                                                        args.render_size)
+                for result in stages:
+                    result.update(pattern=pattern, size=size)
+                    print(f"{pattern:10} {size:6} {result['stage']:28} {result['seconds']:8.3f}s "
+                          f"{result['peak_bytes'] / 2**20:9.1f} MiB")
+                results.extend(stages)
+
+    # Write the results with a description of the environment
+    with open(args.output, "w") as file:
+        json.dump({"environment": environment(), "results": results}, file, indent=1)
+    print(f"Wrote {len(results)} results to {args.output}")
+    return 0
+
+# Run the benchmark when the script is executed
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+# Import the necessary modules
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+
+# Import the geometry, preprocess and tiles modules both inside the add-on package and standalone
+try:
+    from . import geometry
+    from . import preprocess
+    from . import tiles
+except ImportError:
+    import geometry
+    import preprocess
+    import tiles
+
+# Define a function to add the normals and UVs of a surface on the pixel grid to its arrays
+def add_surface_attributes(arrays, heights, image_shape, spacing):
+    """Add the vertex normals and the per-loop UVs to the arrays of a grid or adaptive surface.
+
+    Args:
+        arrays (dict): The vertices and faces of the surface, to which "normals" and "uvs" are added.
+        heights (numpy.ndarray): The surface heights of the vertex grid of shape (rows, columns).
+        image_shape (tuple): The height and width of the full resolution depth map.
+        spacing (float): The distance between neighbouring vertices.
+
+    Returns:
+        dict: The same arrays.
+    """
+
+    # Compute both from the height grid in one pass
+    arrays["normals"], arrays["uvs"] = geometry.surface_attributes(arrays["vertices"], arrays["faces"], heights,
+                                                                   image_shape, spacing)
+    return arrays
+
+# Define a function to compute the mesh arrays of a surface
+def build_surface_arrays(depth_map, depth_scale=geometry.DEPTH_SCALE, downsample=1, geometry_mode='GRID',
+                         error_tolerance=0.01, triangle_budget=0, workers=0, lod_levels=0, progress=None):
+    """Compute the mesh arrays of a surface without touching Blender data.
+
+    This only uses NumPy, so it can run on a background thread while the
+    main thread keeps the UI responsive.
+
+    Args:
+        depth_map (numpy.ndarray): The depth map of shape (height, width).
+        depth_scale (float): The factor applied to the depth values.
+        downsample (int): The factor by which to reduce the resolution of the depth map.
+        geometry_mode (str): 'GRID' for one vertex per pixel, 'ADAPTIVE' for a quadtree-decimated mesh,
+            or 'DISPLACEMENT' for a flat plane that gets all of its relief from material displacement.
+        error_tolerance (float): The largest vertical error of the adaptive mesh, in surface units.
+        triangle_budget (int): The largest number of triangles of the adaptive mesh, or 0 for no limit.
+        workers (int): The number of threads building the grid, or 0 for one per CPU core.
+        lod_levels (int): The number of coarser levels of detail to build, each halving the resolution.
+        progress (callable): A function called with the number of finished and total steps.
+
+    Returns:
+        dict: The vertices, faces and face sizes, the statistics of adaptive meshes,
+            and the arrays of the coarser levels of detail under "lods".
+    """
+
+    # Build a flat plane and leave the relief to the material when the displacement-only mode is selected
+    if geometry_mode == 'DISPLACEMENT':
+        height, width = depth_map.shape
+        vertices, faces, uvs = geometry.build_plane(width, height)
+        if progress:
+            progress(1, 1)
+
+        # Return the plane with the subdivision levels that dice it down to the downsampled pixels
+        return {"vertices": vertices, "faces": faces, "face_sizes": None, "stats": None, "uvs": uvs,
+                "dicing_levels": geometry.dicing_levels(width, height, downsample=downsample), "lods": []}
+
+    # Keep the size of the full resolution depth map, which the UVs span
+    image_shape = depth_map.shape
+
+    # Check if the adaptive geometry mode is selected
+    if geometry_mode == 'ADAPTIVE':
+        # Decode a compact depth map once, since the quadtree reads every pixel, and reduce its resolution
+        depth_map = np.asarray(depth_map, dtype=np.float32)
+        if downsample > 1:
+            depth_map = geometry.downsample(depth_map, downsample)
+        height, width = depth_map.shape
+
+        # Compute a decimated mesh that stays within the error tolerance
+        vertices, faces, face_sizes, stats = geometry.build_adaptive(
+            width, height, depth_map, error_tolerance, triangle_budget, depth_scale, spacing=downsample)
+        if progress:
+            progress(1, 1)
+
+        # Keep the polygons with their corner counts, and shade them with normals taken from the depth map
+        arrays = {"vertices": vertices, "faces": faces, "face_sizes": face_sizes, "stats": stats}
+        add_surface_attributes(arrays, depth_map * depth_scale, image_shape, downsample)
+    else:
+        # Compute the vertex coordinates and quad indices as contiguous arrays, one band of rows per thread
+        vertices, faces = tiles.build_grid_parallel(depth_map, downsample, depth_scale, workers, progress=progress)
+
+        # Keep the quads, and shade them with normals taken from the vertex heights
+        arrays = {"vertices": vertices, "faces": faces, "face_sizes": None, "stats": None}
+        grid_height, grid_width = tiles.grid_shape(image_shape, downsample)
+        add_surface_attributes(arrays, vertices[:, 2].reshape(grid_height, grid_width), image_shape, downsample)
+
+    # Build the coarser levels of detail from a pyramid of the depth map
+    arrays["lods"] = []
+    if lod_levels > 0:
+        # Start from the depth map at the resolution of the full level, which the adaptive mode has already reduced
+        base = depth_map if geometry_mode == 'ADAPTIVE' else geometry.downsample(depth_map, downsample)
+
+        # Halve the resolution, and loosen the adaptive bounds to match, at every level
+        for level, depth in enumerate(geometry.depth_pyramid(base, lod_levels), 1):
+            budget = max(triangle_budget // 4**level, 2) if triangle_budget else 0
+            arrays["lods"].append(build_lod_arrays(depth, depth_scale, downsample * 2**level, geometry_mode,
+                                                   error_tolerance * 2**level, budget, image_shape))
+
+    # Return the arrays
+    return arrays
+
+# Define a function to compute the mesh arrays of a coarser level of detail
+def build_lod_arrays(depth, depth_scale, spacing, geometry_mode='GRID', error_tolerance=0.01, triangle_budget=0,
+                     image_shape=None):
+    """Compute the mesh arrays of a level of detail from an already reduced depth map.
+
+    Args:
+        depth (numpy.ndarray): The reduced depth map of shape (height, width).
+        depth_scale (float): The factor applied to the depth values.
+        spacing (float): The distance between neighbouring vertices, which keeps the size of the surface.
+        geometry_mode (str): 'GRID' for one vertex per pixel, or 'ADAPTIVE' for a quadtree-decimated mesh.
+        error_tolerance (float): The largest vertical error of the adaptive mesh, in surface units.
+        triangle_budget (int): The largest number of triangles of the adaptive mesh, or 0 for no limit.
+        image_shape (tuple): The height and width of the full resolution depth map, or None for no normals and UVs.
+
+    Returns:
+        dict: The vertices, faces and face sizes of the level, with normals and UVs when the image shape is given.
+    """
+
+    # Build the same kind of mesh as the full level at the reduced resolution
+    height, width = depth.shape
+    if geometry_mode == 'ADAPTIVE':
+        vertices, faces, face_sizes, _ = geometry.build_adaptive(
+            width, height, depth, error_tolerance, triangle_budget, depth_scale, spacing)
+        arrays = {"vertices": vertices, "faces": faces, "face_sizes": face_sizes}
+    else:
+        vertices, faces = geometry.build_grid(width, height, depth, depth_scale, spacing)
+        arrays = {"vertices": vertices, "faces": faces, "face_sizes": None}
+
+    # Add the normals and the UVs that line the level up with the same image
+    if image_shape is not None:
+        add_surface_attributes(arrays, depth * depth_scale, image_shape, spacing)
+    return arrays
+
+# Define a function to build the mesh arrays of many depth maps concurrently
+def iter_surface_arrays(paths, filters=None, settings=None, max_resident=4, workers=0, recorder=None,
+                        skip_duplicates=False):
+    """Load, filter and build the mesh arrays of many depth maps, never holding more than max_resident of them.
+
+    The images are handled on a pool of worker threads, one image per
+    thread, while the caller uploads the previous ones to Blender. Images
+    that only Blender can decode should be loaded on the main thread first,
+    so that the workers find their sidecar files.
+
+    With skip_duplicates, every depth map is built once, by whichever of its
+    images finishes loading first. The first of those images in order is
+    handed the arrays, and the others are only loaded, so the caller can
+    reuse the surface of the first one.
+
+    Args:
+        paths (list): The paths of the image files.
+        filters (dict): The preprocessing settings, or None for no filters.
+        settings (dict): The keyword arguments of build_surface_arrays.
+        max_resident (int): The largest number of built surfaces held in memory at once.
+        workers (int): The number of worker threads, or 0 for one per CPU core.
+        recorder (instrument.BuildRecorder): The recorder of the LOAD and BUILD stages, or None.
+        skip_duplicates (bool): Whether to skip building the depth maps of earlier images again.
+
+    Yields:
+        tuple: The index and path of the image, its depth map record, its mesh arrays, and the exception
+            that stopped it, with the record and arrays set to None in that case, and the arrays alone
+            set to None for a skipped duplicate.
+    """
+
+    # Build every surface on a single thread, since the images already run in parallel
+    settings = dict(settings or {}, workers=1)
+
+    # Define a function to run a stage, recording it when there is a recorder
+    def run(stage, function, *args, **kwargs):
+        return recorder.run(stage, function, *args, **kwargs) if recorder else function(*args, **kwargs)
+
+    # Claim every depth map for the first image that finishes loading it, with the future of its arrays,
+    # which is dropped once the arrays are handed out but leaves the claim in place
+    claims = {}
+    lock = threading.Lock()
+
+    # Define a function to load and build a single image, building a duplicate only when it claims the depth map
+    def build(index):
+        depth, record = run('LOAD', preprocess.load_depth, paths[index], filters)
+        if not skip_duplicates:
+            return record, run('BUILD', build_surface_arrays, depth, **settings)
+        with lock:
+            claim = None if record["hash"] in claims else Future()
+            if claim is not None:
+                claims[record["hash"]] = claim
+        if claim is not None:
+            try:
+                claim.set_result(run('BUILD', build_surface_arrays, depth, **settings))
+            except Exception as e:
+                claim.set_exception(e)
+        return record, None
+
+    # Define a function to get the arrays of a depth map for the first of its images in order, and None for the rest
+    def claimed_arrays(record):
+        with lock:
+            claim = claims[record["hash"]]
+            claims[record["hash"]] = None
+        return claim.result() if claim is not None else None
+
+    # Keep at most max_resident images submitted or held by the caller
+    with ThreadPoolExecutor(max_workers=min(tiles.worker_count(workers), max_resident)) as pool:
+        pending = deque(pool.submit(build, index) for index in range(min(max_resident, len(paths))))
+
+        # Hand the surfaces to the caller in order, submitting the next image once the caller is done with each
+        for index, path in enumerate(paths):
+            try:
+                (record, arrays), error = pending.popleft().result(), None
+                if skip_duplicates:
+                    arrays = claimed_arrays(record)
+            except Exception as e:
+                record, arrays, error = None, None, e
+            yield index, path, record, arrays, error
+            arrays = None
+            if index + max_resident < len(paths):
+                pending.append(pool.submit(build, index + max_resident))
@@ -0,0 +1,182 @@
+# Import the necessary modules
+import hashlib
+from collections import OrderedDict
+
+# Define a function to build the cache key of a surface
+def surface_key(content_hash, subdivisions, subdivision_type, depth_scale, downsample, *extra):
+    """Build the cache key of a surface from its depth map and geometry parameters.
+
+    The object scale is left out, since it is set per object and does not
+    change the mesh.
+
+    Args:
+        content_hash (str): The content hash of the depth map.
+        subdivisions (int): The number of subdivisions.
+        subdivision_type (str): The type of subdivision method.
+        depth_scale (float): The factor applied to the depth values.
+        downsample (int): The downsample factor of the depth map.
+        *extra: Any further parameters that affect the geometry, such as the geometry mode.
+
+    Returns:
+        str: A hexadecimal key that only changes when the surface geometry would change.
+    """
+
+    # Round the float parameters so that slider noise does not change the key
+    text = f"{content_hash}|{subdivisions}|{subdivision_type}|{round(float(depth_scale), 6)}|{downsample}"
+    for value in extra:
+        text += f"|{round(value, 6) if isinstance(value, float) else value}"
+
+    # Hash the parameters into a fixed length key
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+# Define a least recently used cache with an entry and byte budget
+class LRUCache:
+    """A least recently used cache bounded by entry count and total byte size."""
+
+    # Define a function to initialize the cache
+    def __init__(self, max_entries=16, max_bytes=1 << 30, on_evict=None):
+        """Initialize the cache.
+
+        Args:
+            max_entries (int): The largest number of entries to keep.
+            max_bytes (int): The largest total size of the entries to keep.
+            on_evict (callable): A function called with the key and value of every evicted entry.
+        """
+
+        # Store the budget and the eviction callback
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+
+        # Store the entries as (value, size) pairs from least to most recently used
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+
+        # Initialize the counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # Define a function to get the number of entries
+    def __len__(self):
+        return len(self.entries)
+
+    # Define a function to check whether a key is cached
+    def __contains__(self, key):
+        return key in self.entries
+
+    # Define a function to look up an entry
+    def get(self, key, default=None):
+        """Look up an entry and mark it as most recently used.
+
+        Args:
+            key: The key of the entry.
+            default: The value to return when the key is not cached.
+
+        Returns:
+            The cached value, or the default.
+        """
+
+        # Count a miss when the key is not cached
+        if key not in self.entries:
+            self.misses += 1
+            return default
+
+        # Count a hit and move the entry to the most recently used end
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return self.entries[key][0]
+
+    # Define a function to add an entry
+    def put(self, key, value, nbytes=0):
+        """Add an entry and evict the least recently used entries over budget.
+
+        Args:
+            key: The key of the entry.
+            value: The value to cache.
+            nbytes (int): The size of the value in bytes.
+
+        Returns:
+            None.
+        """
+
+        # Replace any previous entry with the same key
+        if key in self.entries:
+            self.discard(key)
+
+        # Add the entry at the most recently used end
+        self.entries[key] = (value, nbytes)
+        self.total_bytes += nbytes
+
+        # Evict the least recently used entries until the cache fits its budget
+        self.trim()
+
+    # Define a function to remove an entry
+    def discard(self, key):
+        """Remove an entry without calling the eviction callback.
+
+        Args:
+            key: The key of the entry.
+
+        Returns:
+            The removed value, or None if the key was not cached.
+        """
+
+        # Remove the entry and release its size
+        if key not in self.entries:
+            return None
+        value, nbytes = self.entries.pop(key)
+        self.total_bytes -= nbytes
+        return value
+
+    # Define a function to evict entries until the cache fits its budget
+    def trim(self):
+        """Evict the least recently used entries until the cache fits its budget.
+
+        The most recently used entry is always kept, even when it alone exceeds the byte budget.
+
+        Returns:
+            None.
+        """
+
+        # Evict from the least recently used end while over either budget
+        while len(self.entries) > 1 and (len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes):
+            key, (value, nbytes) = self.entries.popitem(last=False)
+            self.total_bytes -= nbytes
+            self.evictions += 1
+
+            # Let the owner release the evicted value
+            if self.on_evict:
+                self.on_evict(key, value)
+
+    # Define a function to remove every entry
+    def clear(self):
+        """Evict every entry.
+
+        Returns:
+            None.
+        """
+
+        # Evict all entries through the eviction callback
+        while self.entries:
+            key, (value, nbytes) = self.entries.popitem(last=False)
+            if self.on_evict:
+                self.on_evict(key, value)
+        self.total_bytes = 0
+
+    # Define a function to summarize the cache counters
+    def stats(self):
+        """Summarize the cache counters.
+
+        Returns:
+            dict: The number of entries, bytes, hits, misses and evictions.
+        """
+
+        # Collect the counters into a dictionary
+        return {
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,386 @@
+"""Hold depth maps as float16 or 16-bit quantized codes and dequantize them one band at a time.
+
+A compact depth map takes a half of the memory of the float32 map, or less
+when its bands are also compressed, and reads like a float32 array: slicing
+it decodes only the rows of the slice, so the vertex builder dequantizes
+each band on its own worker thread. Compare the encodings on an image with:
+
+    python Depthify/compact.py depth.png --compress
+"""
+
+# Import the necessary modules
+import argparse
+import sys
+import time
+import zlib
+
+import numpy as np
+
+# Import the ingest module both inside the add-on package and standalone
+try:
+    from . import ingest
+except ImportError:
+    import ingest
+
+# Define the encodings of depth maps, from exact to smallest
+ENCODINGS = ("float32", "float16", "uint16")
+
+# Define the number of rows in each band that is encoded, compressed and decoded at once
+BAND_ROWS = 256
+
+# Define the largest code of a depth value in the 16-bit quantized encoding
+MAX_CODE = 2**16 - 2
+
+# Define the code of the 16-bit quantized encoding that stands for values that are not finite
+NAN_CODE = 2**16 - 1
+
+# Define a function to compute the scale and offset of the quantized encoding
+def quantization(depth):
+    """Compute the scale and offset that map the finite range of a depth map onto the 16-bit codes.
+
+    Args:
+        depth (numpy.ndarray): The depth map of shape (height, width).
+
+    Returns:
+        tuple: The depth step of one code and the depth of code 0.
+    """
+
+    # Find the finite range of the depth map one band at a time, so memory maps are never copied whole
+    low, high = np.inf, -np.inf
+    for row in range(0, depth.shape[0], BAND_ROWS):
+        band = np.asarray(depth[row:row + BAND_ROWS], dtype=np.float32)
+        finite = band[np.isfinite(band)]
+        if finite.size:
+            low, high = min(low, float(finite.min())), max(high, float(finite.max()))
+
+    # Spread the range over every code but the one of the holes, keeping a step of 1 for flat or empty maps
+    if not np.isfinite(low):
+        return 1.0, 0.0
+    return ((high - low) / MAX_CODE or 1.0), low
+
+# Define a function to encode depth values
+def encode(depth, encoding, scale=1.0, offset=0.0):
+    """Encode depth values as float16 values or as 16-bit codes.
+
+    Args:
+        depth (numpy.ndarray): The depth values.
+        encoding (str): One of ENCODINGS.
+        scale (float): The depth step of one code, for the quantized encoding.
+        offset (float): The depth of code 0, for the quantized encoding.
+
+    Returns:
+        numpy.ndarray: The encoded values, with values that are not finite stored as NAN_CODE when quantized.
+    """
+
+    # Round the values to the nearest half float or keep them as they are
+    depth = np.asarray(depth, dtype=np.float32)
+    if encoding == "float16":
+        return depth.astype(np.float16)
+    if encoding == "float32":
+        return depth
+
+    # Round the values to the nearest code within the range, keeping the holes apart from the lowest depth
+    codes = np.clip(np.rint((depth - offset) / scale), 0, MAX_CODE)
+    codes[~np.isfinite(depth)] = NAN_CODE
+    return codes.astype(np.uint16)
+
+# Define a function to decode depth values
+def decode(codes, encoding, scale=1.0, offset=0.0):
+    """Decode float16 values or 16-bit codes back to float32 depth values.
+
+    Args:
+        codes (numpy.ndarray): The encoded values.
+        encoding (str): One of ENCODINGS.
+        scale (float): The depth step of one code, for the quantized encoding.
+        offset (float): The depth of code 0, for the quantized encoding.
+
+    Returns:
+        numpy.ndarray: The float32 depth values, with NaN for the holes of the quantized encoding.
+    """
+
+    # Widen the values, and map the codes onto the depth range in place, restoring the holes
+    depth = np.array(codes, dtype=np.float32)
+    if encoding == "uint16":
+        depth *= np.float32(scale)
+        depth += np.float32(offset)
+        depth[np.asarray(codes) == NAN_CODE] = np.nan
+    return depth
+
+# Define a depth map held in a compact encoding
+class CompactDepth:
+    """A depth map held as float16 or 16-bit codes, optionally compressed per band, that reads like a float32 array."""
+
+    # Define a function to initialize the depth map
+    def __init__(self, shape, encoding, scale=1.0, offset=0.0, codes=None, blob=None, offsets=None,
+                 band_rows=BAND_ROWS):
+        """Initialize the depth map from its codes, or from its compressed bands.
+
+        Args:
+            shape (tuple): The height and width of the depth map.
+            encoding (str): One of ENCODINGS.
+            scale (float): The depth step of one code, for the quantized encoding.
+            offset (float): The depth of code 0, for the quantized encoding.
+            codes (numpy.ndarray): The encoded values of shape (height, width), or None when compressed.
+            blob (numpy.ndarray): The uint8 bytes of the compressed bands, one after another.
+            offsets (list): The start of every band in the blob, followed by the end of the last band.
+            band_rows (int): The number of rows in each compressed band.
+        """
+
+        # Store the layout and the encoded data
+        self.shape = tuple(shape)
+        self.encoding = encoding
+        self.scale = scale
+        self.offset = offset
+        self.codes = codes
+        self.blob = blob
+        self.offsets = offsets
+        self.band_rows = band_rows
+
+        # Describe the values as the float32 array they decode to
+        self.dtype = np.dtype(np.float32)
+        self.ndim = 2
+        self.size = self.shape[0] * self.shape[1]
+
+    # Define a function to get the number of rows
+    def __len__(self):
+        return self.shape[0]
+
+    # Define a function to get the memory of the encoded data
+    @property
+    def encoded_bytes(self):
+        return self.codes.nbytes if self.codes is not None else int(self.offsets[-1])
+
+    # Define a function to get the type of the codes
+    @property
+    def code_type(self):
+        return np.dtype(np.float32 if self.encoding == "float32" else
+                        np.float16 if self.encoding == "float16" else np.uint16)
+
+    # Define a function to read the codes of a range of rows
+    def read_codes(self, start, stop):
+        """Read the codes of a range of rows, decompressing only the bands that hold them.
+
+        Args:
+            start (int): The first row.
+            stop (int): One past the last row.
+
+        Returns:
+            numpy.ndarray: The codes of shape (stop - start, width).
+        """
+
+        # Slice the codes when they are not compressed
+        if self.codes is not None:
+            return self.codes[start:stop]
+
+        # Return no rows for an empty range
+        if stop <= start:
+            return np.empty((0, self.shape[1]), dtype=self.code_type)
+
+        # Decompress the bands that overlap the rows and cut the rows out of them
+        first, last = start // self.band_rows, (stop - 1) // self.band_rows
+        bands = [np.frombuffer(zlib.decompress(self.blob[self.offsets[index]:self.offsets[index + 1]]),
+                               dtype=self.code_type).reshape(-1, self.shape[1])
+                 for index in range(first, last + 1)]
+        rows = np.concatenate(bands) if len(bands) > 1 else bands[0]
+        return rows[start - first * self.band_rows:stop - first * self.band_rows]
+
+    # Define a function to decode a slice of the depth map
+    def __getitem__(self, key):
+        """Decode the depth values of a slice, reading only the rows it covers.
+
+        Args:
+            key: Any NumPy index, whose first entry selects the rows.
+
+        Returns:
+            numpy.ndarray: The float32 depth values of the slice.
+        """
+
+        # Split the index into the rows and the rest
+        rows, rest = (key[0], key[1:]) if isinstance(key, tuple) else (key, ())
+
+        # Read the rows of integer and forward slice indices, and every row for any other index, then apply the rest
+        height = self.shape[0]
+        if isinstance(rows, (int, np.integer)):
+            row = rows + height if rows < 0 else rows
+            if not 0 <= row < height:
+                raise IndexError(f"Row {rows} is out of range for {height} rows")
+            codes = self.read_codes(row, row + 1)[(0,) + rest]
+        elif isinstance(rows, slice) and (rows.step or 1) > 0:
+            start, stop, step = rows.indices(height)
+            codes = self.read_codes(start, max(stop, start))[(slice(None, None, step),) + rest]
+        else:
+            codes = self.read_codes(0, height)[(rows,) + rest]
+
+        # Decode the selected values
+        return decode(codes, self.encoding, self.scale, self.offset)
+
+    # Define a function to decode the whole depth map for NumPy functions
+    def __array__(self, dtype=None, copy=None):
+        depth = self[:]
+        return depth if dtype is None else depth.astype(dtype, copy=False)
+
+# Define a function to encode a depth map into a compact depth map
+def compact_depth(depth, encoding="uint16", compress=False, band_rows=BAND_ROWS):
+    """Encode a depth map one band at a time.
+
+    Args:
+        depth (numpy.ndarray): The depth map of shape (height, width), which may be memory-mapped.
+        encoding (str): One of ENCODINGS.
+        compress (bool): Whether to compress every band of codes with zlib.
+        band_rows (int): The number of rows in each band.
+
+    Returns:
+        CompactDepth: The encoded depth map.
+    """
+
+    # Get the scale and offset of the quantized encoding
+    height, width = depth.shape
+    scale, offset = quantization(depth) if encoding == "uint16" else (1.0, 0.0)
+    compact = CompactDepth((height, width), encoding, scale, offset, band_rows=band_rows)
+
+    # Encode the bands into one array of codes, or into compressed bytes one after another
+    chunks, offsets = [], [0]
+    codes = None if compress else np.empty((height, width), dtype=compact.code_type)
+    for row in range(0, height, band_rows):
+        band = encode(depth[row:row + band_rows], encoding, scale, offset)
+        if compress:
+            chunks.append(zlib.compress(np.ascontiguousarray(band).data, 1))
+            offsets.append(offsets[-1] + len(chunks[-1]))
+        else:
+            codes[row:row + band_rows] = band
+
+    # Store the codes or the compressed bands and return the depth map
+    compact.codes = codes
+    if compress:
+        compact.blob = np.frombuffer(b"".join(chunks), dtype=np.uint8)
+        compact.offsets = offsets
+    return compact
+
+# Define a function to write a compact depth map to a file
+def write_compact(file, compact):
+    """Write the codes or the compressed bands of a compact depth map to an open .npy file.
+
+    Args:
+        file (file): The file opened for binary writing.
+        compact (CompactDepth): The depth map.
+
+    Returns:
+        dict: The encoding and layout that open_compact needs to read the file back.
+    """
+
+    # Save the array of codes, or the bytes of the bands, as one memory-mappable array
+    np.save(file, compact.codes if compact.codes is not None else compact.blob)
+    return {"encoding": compact.encoding, "scale": compact.scale, "offset": compact.offset,
+            "band_rows": compact.band_rows, "offsets": compact.offsets}
+
+# Define a function to read a compact depth map from a file
+def open_compact(path, layout, shape):
+    """Memory-map a compact depth map written by write_compact.
+
+    Args:
+        path (str): The path of the .npy file.
+        layout (dict): The encoding and layout returned by write_compact.
+        shape (tuple): The height and width of the depth map.
+
+    Returns:
+        CompactDepth: The depth map, which decodes only the rows that are read.
+    """
+
+    # Map the file and wrap it as the codes or as the compressed bands
+    data = np.load(path, mmap_mode="r")
+    offsets = layout.get("offsets")
+    return CompactDepth(shape, layout["encoding"], layout["scale"], layout["offset"],
+                        codes=None if offsets else data, blob=data if offsets else None, offsets=offsets,
+                        band_rows=layout["band_rows"])
+
+# Define a function to measure the accuracy of the encodings
+def accuracy_report(depth, encodings=ENCODINGS, compress=False):
+    """Measure the size and the error of every encoding of a depth map against float32.
+
+    Args:
+        depth (numpy.ndarray): The depth map of shape (height, width).
+        encodings (tuple): The encodings to measure.
+        compress (bool): Whether to compress the bands of codes.
+
+    Returns:
+        list: One dictionary per encoding with its bytes, its size relative to float32, the largest and
+            root mean square errors in depth units and relative to the depth range, and the encode and
+            decode seconds.
+    """
+
+    # Get the finite range of the depth map, which the relative errors refer to
+    step, low = quantization(depth)
+    depth_range = step * MAX_CODE
+    float32_bytes = depth.shape[0] * depth.shape[1] * 4
+
+    # Encode and decode the depth map with every encoding, comparing one band at a time
+    results = []
+    for encoding in encodings:
+        start = time.perf_counter()
+        compact = compact_depth(depth, encoding, compress)
+        encode_seconds = time.perf_counter() - start
+
+        # Sum the squared errors of the finite values, decoding the bands as the vertex builder does
+        max_error, squared, count, decode_seconds = 0.0, 0.0, 0, 0.0
+        for row in range(0, depth.shape[0], BAND_ROWS):
+            start = time.perf_counter()
+            decoded = compact[row:row + BAND_ROWS]
+            decode_seconds += time.perf_counter() - start
+            original = np.asarray(depth[row:row + BAND_ROWS], dtype=np.float32)
+            finite = np.isfinite(original)
+            error = np.abs(decoded[finite].astype(np.float64) - original[finite])
+            if error.size:
+                max_error = max(max_error, float(error.max()))
+                squared += float(np.square(error).sum())
+                count += error.size
+
+        # Record the measurements of the encoding
+        rms_error = (squared / count) ** 0.5 if count else 0.0
+        results.append({
+            "encoding": encoding,
+            "compressed": compress,
+            "bytes": compact.encoded_bytes,
+            "ratio": compact.encoded_bytes / float32_bytes,
+            "max_error": max_error,
+            "rms_error": rms_error,
+            "max_relative_error": max_error / depth_range,
+            "rms_relative_error": rms_error / depth_range,
+            "encode_seconds": encode_seconds,
+            "decode_seconds": decode_seconds,
+        })
+
+    # Return the measurements
+    return results
+
+# Define the command line interface
+def main(argv=None):
+    """Print the size and accuracy of every encoding of a depth map image.
+
+    Args:
+        argv (list): The arguments, or None to read the command line.
+
+    Returns:
+        int: The exit status.
+    """
+
+    # Read the arguments
+    parser = argparse.ArgumentParser(prog="depthify-compact", description="Compare the compact depth encodings.")
+    parser.add_argument("input", help="The depth map image")
+    parser.add_argument("--compress", action="store_true", help="Compress every band of codes")
+    parser.add_argument("--channel", type=int, default=0, help="The channel that holds the depth values")
+    args = parser.parse_args(argv)
+
+    # Decode the depth map as float32, the reference of the report
+    depth, _ = ingest.load_depth(args.input, args.channel)
+
+    # Print one line per encoding
+    print(f"{'encoding':<10}{'MB':>10}{'ratio':>8}{'max error':>12}{'rms error':>12}{'max rel':>10}{'decode s':>10}")
+    for result in accuracy_report(depth, compress=args.compress):
+        print(f"{result['encoding']:<10}{result['bytes'] / 2**20:>10.1f}{result['ratio']:>8.2f}"
+              f"{result['max_error']:>12.3g}{result['rms_error']:>12.3g}{result['max_relative_error']:>10.2e}"
+              f"{result['decode_seconds']:>10.3f}")
+    return 0
+
+# Run the report when the script is executed
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,369 +1,704 @@
-# Import the necessary modules
-import bpy
-import math
-
-# Import the mathutils module for math operations
-from mathutils import Vector
-
-# Import the translation function
-from bpy.app.translations import pgettext_iface as iface_
-
-# Import the bpy.app.timers module for creating progress bar and status message
-import bpy.app.timers
-
-# Define a global variable to store the timer object
-timer = None
-
-# Define a function to create a surface object from the width, height, and depth map values
-def create_surface(width, height, depth_map):
-    """Create a surface object from the width, height, and depth map values.
-
-    Args:
-        width (int): The width of the image.
-        height (int): The height of the image.
-        depth_map (list): The list of depth map values.
-
-    Returns:
-        bpy.types.Object: The surface object that was created.
-    """
-
-    # Create a list of vertices for the surface object
-    vertices = []
-
-    # Create a list of faces for the surface object
-    faces = []
-
-    # Loop through the rows and columns of the image
-    for row in range(height):
-        for col in range(width):
-            # Get the depth value from the depth map
-            depth = depth_map[row * width + col]
-
-            # Calculate the x, y, and z coordinates of the vertex
-            x = col - width / 2
-            y = row - height / 2
-            z = depth * 10
-
-            # Append the vertex to the vertices list
-            vertices.append(Vector((x, y, z)))
-
-            # Check if we can create a face with the current and previous vertices
-            if row > 0 and col > 0:
-                # Calculate the indices of the vertices that form the face
-                i1 = (row - 1) * width + (col - 1)
-                i2 = (row - 1) * width + col
-                i3 = row * width + col
-                i4 = row * width + (col - 1)
-
-                # Append the face to the faces list
-                faces.append([i1, i2, i3, i4])
-
-    # Create a new mesh data block with the vertices and faces
-    mesh = bpy.data.meshes.new("Surface")
-
-    # Assign the vertices and faces to the mesh
-    mesh.from_pydata(vertices, [], faces)
-
-    # Update the mesh with the new data
-    mesh.update()
-
-    # Create a new object with the mesh data block
-    obj = bpy.data.objects.new("Surface", mesh)
-
-    # Return the object
-    return obj
-
-# Define a function to apply adaptive subdivision to a surface object
-def apply_adaptive_subdivision(obj, subdivisions, subdivision_type):
-    """Apply adaptive subdivision to a surface object.
-
-    Args:
-        obj (bpy.types.Object): The surface object.
-        subdivisions (int): The number of subdivisions.
-        subdivision_type (str): The type of subdivision method.
-
-    Returns:
-        None.
-    """
-
-    # Get the context and scene
-    context = bpy.context
-    scene = context.scene
-
-    # Set the cycles render engine as active
-    scene.render.engine = 'CYCLES'
-
-    # Set the experimental feature set as active
-    scene.cycles.feature_set = 'EXPERIMENTAL'
-
-    # Create a new subdivision surface modifier for the object
-    modifier = obj.modifiers.new("Subdivision", 'SUBSURF')
-
-    # Set the modifier properties
-    modifier.subdivision_type = subdivision_type
-    modifier.levels = subdivisions
-    modifier.render_levels = subdivisions
-
-    # Enable adaptive subdivision for the modifier
-    modifier.use_adaptive_subdivision = True
-
-# Define a function to apply displacement to a surface object
-def apply_displacement(obj, displacement_strength, displacement_type):
-    """Apply displacement to a surface object.
-
-    Args:
-        obj (bpy.types.Object): The surface object.
-        displacement_strength (float): The strength of the displacement modifier.
-        displacement_type (str): The type of displacement method.
-
-    Returns:
-        None.
-    """
-
-     # Get the context and scene
-    context = bpy.context
-    scene = context.scene
-
-    # Set the cycles render engine as active
-    scene.render.engine = 'CYCLES'
-
-    # Set the experimental feature set as active
-    scene.cycles.feature_set = 'EXPERIMENTAL'
-
-    # Create a new material for the object using operators module
-    from .operators import create_materials
-
-    material = create_materials("Surface")
-
-    # Assign the material to the object's active material slot
-    obj.active_material = material
-
-    # Get the material nodes and links
-    nodes = material.node_tree.nodes
-    links = material.node_tree.links
-
-    # Get the output node and the principled BSDF node
-    output_node = nodes.get("Material Output")
-    principled_node = nodes.get("Principled BSDF")
-
-    # Create a new image texture node for the depth map image
-    image_node = nodes.new("ShaderNodeTexImage")
-
-    # Set the image node properties
-    image_node.image = bpy.data.images.load(bpy.path.abspath(scene.depthify_properties.image))
-    image_node.interpolation = 'Closest'
-
-    # Create a new displacement node for the displacement output
-    displacement_node = nodes.new("ShaderNodeDisplacement")
-
-    # Set the displacement node properties
-    displacement_node.inputs['Scale'].default_value = displacement_strength
-
-    # Link the image node to the principled node and the displacement node
-    links.new(image_node.outputs['Color'], principled_node.inputs['Base Color'])
-    links.new(image_node.outputs['Color'], displacement_node.inputs['Height'])
-
-    # Link the displacement node to the output node
-    links.new(displacement_node.outputs['Displacement'], output_node.inputs['Displacement'])
-
-    # Set the displacement method for the material
-    material.cycles.displacement_method = displacement_type
-
-# Define a function to scale a surface object
-def scale_surface(obj, scale):
-    """Scale a surface object.
-
-    Args:
-        obj (bpy.types.Object): The surface object.
-        scale (tuple): The scale factors for x, y, and z axes.
-
-    Returns:
-        None.
-    """
-
-    # Set the scale property of the object
-    obj.scale = Vector(scale)
-
-# Define a function to update the progress bar and status message
-def update_progress():
-    """Update the progress bar and status message.
-
-    Returns:
-        float: The time interval for the next update.
-    """
-
-    # Get the context and scene
-    context = bpy.context
-    scene = context.scene
-
-    # Get the current progress value from the scene property
-    progress = scene.depthify_properties.progress
-
-    # Check if the progress is complete
-    if progress >= 1.0:
-        # Log a success message to the console and the UI
-        logging.info("Depthify process completed")
-        logging.log(logging.INFO, "Depthify process completed")
-        bpy.ops.wm.progress_end()
-        bpy.ops.wm.report({'INFO'}, "Depthify process completed")
-
-        # Return None to stop the timer
-        return None
-
-    # Update the progress bar and status message using operators module
-    bpy.ops.wm.progress_update(value=int(progress * 100))
-    bpy.ops.wm.report({'INFO'}, f"Depthify process in progress: {progress * 100:.2f}%")
-
-    # Increment the progress value by 0.1
-    progress += 0.1
-
-    # Store the progress value in the scene property
-    scene.depthify_properties.progress = progress
-
-    # Return 0.5 as the time interval for the next update
-    return 0.5
-
-# Define a function to register a timer for updating the progress bar and status message
-def register_timer():
-    """Register a timer for updating the progress bar and status message.
-
-    Returns:
-        None.
-    """
-
-    # Get the context and scene
-    context = bpy.context
-    scene = context.scene
-
-    # Initialize the progress value to zero and store it in the scene property
-    scene.depthify_properties.progress = 0.0
-
-    # Start a progress bar using operators module
-    bpy.ops.wm.progress_begin(min=0, max=100)
-
-    # Create a global variable to store the timer object
-    global timer
-
-    # Register a timer with an initial time interval of 0.5 seconds and a callback function of update_progress
-    timer = bpy.app.timers.register(update_progress, first_interval=0.5)
-
-# Define a function to unregister the timer for updating the progress bar and status message
-def unregister_timer():
-    """Unregister the timer for updating the progress bar and status message.
-
-    Returns:
-        None.
-    """
-
-    # Get the context and scene
-    context = bpy.context
-    scene = context.scene
-
-    # Create a global variable to store the timer object
-    global timer
-
-    # Check if the timer is registered
-    if timer:
-        # Unregister the timer using timers module
-        bpy.app.timers.unregister(timer)
-
-        # Set the timer object to None
-        timer = None
-
-# Define a function to register Depthify module with Blender handlers module 
-def register():
-   """Register depthify module with Blender handlers module.
-
-   Returns:
-       None.
-   """
-
-   # Register a callback function with load_post handler to update image and depth map properties when loading a file 
-   bpy.app.handlers.load_post.append(update_image_and_depth_map)
-
-   # Register a callback function with save_pre handler to unregister timer when saving a file
-   bpy.app.handlers.save_pre.append(unregister_timer)
-
-# Define a function to unregister Depthify module from Blender handlers module
-def unregister():
-   """Unregister depthify module from Blender handlers module.
-
-   Returns:
-       None.
-   """
-
-   # Unregister the callback function from save_pre handler
-   bpy.app.handlers.save_pre.remove(unregister_timer)
-
-   # Unregister the callback function from load_post handler
-   bpy.app.handlers.load_post.remove(update_image_and_depth_map)
-
-# Define a function to update image and depth map properties when loading a file
-def update_image_and_depth_map(dummy):
-    """Update image and depth map properties when loading a file.
-
-    Args:
-        dummy: A dummy argument to match the handler signature.
-
-    Returns:
-        None.
-    """
-
-    # Get the context and scene
-    context = bpy.context
-    scene = context.scene
-
-    # Get the image and depth map properties
-    image = scene.depthify_properties.image
-    depth_map = scene.depthify_properties.depth_map
-
-    # Check if the image property is not empty
-    if image:
-        # Try to load the image file using imbuf module
-        try:
-            image = imbuf_load(bpy.path.abspath(image))
-        except Exception as e:
-            # Log an error message to the console and the UI
-            logging.error(f"Failed to load image file: {e}")
-            bpy.ops.wm.report({'ERROR'}, f"Failed to load image file: {e}")
-            return
-
-        # Get the width and height of the image
-        width = image.width
-        height = image.height
-
-        # Get the depth map values from the image pixels
-        depth_map = [pixel[0] for pixel in image.pixels]
-
-        # Store the depth map values in the depth map property
-        scene.depthify_properties.depth_map.clear()
-        scene.depthify_properties.depth_map.extend(depth_map)
-
-# Define a function to register Depthify module with Blender handlers module 
-def register():
-   """Register depthify module with Blender handlers module.
-
-   Returns:
-       None.
-   """
-
-   # Register a callback function with load_post handler to update image and depth map properties when loading a file 
-   bpy.app.handlers.load_post.append(update_image_and_depth_map)
-
-   # Register a callback function with save_pre handler to unregister timer when saving a file
-   bpy.app.handlers.save_pre.append(unregister_timer)
-
-# Define a function to unregister Depthify module from Blender handlers module
-def unregister():
-   """Unregister depthify module from Blender handlers module.
-
-   Returns:
-       None.
-   """
-
-   # Unregister the callback function from save_pre handler
-   bpy.app.handlers.save_pre.remove(unregister_timer)
-
-   # Unregister the callback function from load_post handler
-   bpy.app.handlers.load_post.remove(update_image_and_depth_map)
-
+# Import the necessary modules
+import bpy
+import json
+import logging
+import math
+import numpy as np
+
+# Import the translation function
+from bpy.app.translations import pgettext_iface as iface_
+
+# Import the builder, cache, geometry, lod, materials, sequence, storage and tiles modules for building the surface
+from . import builder
+from . import cache
+from . import geometry
+from . import lod
+from . import materials
+from . import sequence
+from . import storage
+from . import tiles
+
+# Define a function to remove a surface object with the meshes only it uses
+def remove_object(obj):
+    """Remove a surface object together with its mesh and the meshes of its levels of detail that nothing else uses.
+
+    Args:
+        obj (bpy.types.Object): The surface object.
+
+    Returns:
+        None.
+    """
+
+    # Collect the meshes, clearing the fake users that levels of detail of older files were kept alive with
+    meshes = lod.lod_meshes(obj)
+    for mesh in meshes:
+        mesh.use_fake_user = False
+    if obj.data is not None and obj.data not in meshes:
+        meshes.append(obj.data)
+
+    # Remove the object first, so that the meshes lose the users the object held
+    bpy.data.objects.remove(obj)
+    for mesh in meshes:
+        if mesh.users == 0:
+            bpy.data.meshes.remove(mesh)
+
+# Define a function to remove a template object of the surface cache
+def remove_template(template):
+    """Remove a template object of the surface cache and its meshes if nothing else uses them.
+
+    Args:
+        template (bpy.types.Object): The template object.
+
+    Returns:
+        None.
+    """
+
+    # Remove the object with the meshes only the template held
+    remove_object(template)
+
+# Define a function to release a surface evicted from the surface cache
+def release_cached_surface(key, name):
+    """Release the template object and mesh of a surface evicted from the surface cache.
+
+    Args:
+        key (str): The cache key of the surface.
+        name (str): The name of the template object.
+
+    Returns:
+        None.
+    """
+
+    # Get the template object, which may already have been removed, or replaced by another object of the same name
+    template = bpy.data.objects.get(name)
+    if template is None or not template.get("depthify_template"):
+        return
+
+    # Remove the template object and its mesh
+    remove_template(template)
+
+# Define a global variable to store the surface cache
+surface_cache = cache.LRUCache(on_evict=release_cached_surface)
+
+# Define a function to empty the surface cache
+def purge_templates():
+    """Remove every template object of the surface cache, together with any other template left in the file.
+
+    The templates have no users, so they are never saved, but a file that
+    links one somewhere would bring it back on load.
+
+    Returns:
+        None.
+    """
+
+    # Evict every cached surface, then remove the templates the cache no longer knows
+    surface_cache.clear()
+    for template in [obj for obj in bpy.data.objects if obj.get("depthify_template")]:
+        remove_template(template)
+
+# Define a global variable to store the frame players of sequence surfaces by sequence key
+sequence_players = {}
+
+# Define a function to load vertex and face arrays into a mesh data block
+def upload_mesh(mesh, vertices, faces, face_sizes=None, uvs=None, normals=None):
+    """Load vertex and face arrays into a mesh data block in bulk.
+
+    Args:
+        mesh (bpy.types.Mesh): The empty mesh data block to fill.
+        vertices (numpy.ndarray): The vertex coordinates of shape (N, 3).
+        faces (numpy.ndarray): The face indices, either of shape (F, K) or flat.
+        face_sizes (numpy.ndarray): The number of corners of each face when faces is flat.
+        uvs (numpy.ndarray): The UV coordinates of every loop of shape (L, 2), or None for no UV map.
+        normals (numpy.ndarray): The vertex normals of shape (N, 3), or None to let Blender compute them.
+
+    Returns:
+        None.
+    """
+
+    # Flatten the face indices and derive the corner count of every face
+    if face_sizes is None:
+        face_sizes = np.full(len(faces), faces.shape[1] if faces.ndim == 2 else 0, dtype=np.int32)
+    face_sizes = np.asarray(face_sizes, dtype=np.int32)
+    loop_indices = np.ascontiguousarray(faces, dtype=np.int32).ravel()
+
+    # Compute the first loop of every face from the corner counts
+    loop_starts = np.zeros(len(face_sizes), dtype=np.int32)
+    np.cumsum(face_sizes[:-1], out=loop_starts[1:])
+
+    # Add the vertices and set their coordinates from the flat buffer
+    mesh.vertices.add(len(vertices))
+    mesh.vertices.foreach_set("co", np.ascontiguousarray(vertices, dtype=np.float32).ravel())
+
+    # Add the loops and set the vertex each of them points to
+    mesh.loops.add(len(loop_indices))
+    mesh.loops.foreach_set("vertex_index", loop_indices)
+
+    # Add the polygons and set where their loops start
+    mesh.polygons.add(len(face_sizes))
+    mesh.polygons.foreach_set("loop_start", loop_starts)
+
+    # Set the loop counts on Blender versions where they are still writable
+    try:
+        mesh.polygons.foreach_set("loop_total", face_sizes)
+    except (AttributeError, TypeError, RuntimeError):
+        pass
+
+    # Add a UV map and set the coordinates of every loop
+    if uvs is not None:
+        uv_layer = mesh.uv_layers.new(name="UVMap")
+        uv_layer.data.foreach_set("uv", np.ascontiguousarray(uvs, dtype=np.float32).ravel())
+
+    # Build the edges and update the mesh with the new data
+    mesh.update(calc_edges=True)
+
+    # Shade with the precomputed normals
+    if normals is not None:
+        set_vertex_normals(mesh, normals)
+
+# Define a function to shade a mesh with precomputed vertex normals
+def set_vertex_normals(mesh, normals):
+    """Shade every face of a mesh smoothly with precomputed vertex normals.
+
+    Args:
+        mesh (bpy.types.Mesh): The mesh data block, with its faces already loaded.
+        normals (numpy.ndarray): The unit vertex normals of shape (N, 3).
+
+    Returns:
+        None.
+    """
+
+    # Mark every face as smooth so that the vertex normals are interpolated
+    mesh.polygons.foreach_set("use_smooth", np.ones(len(mesh.polygons), dtype=bool))
+
+    # Enable auto smooth, which custom normals needed before Blender 4.1
+    if hasattr(mesh, "use_auto_smooth"):
+        mesh.use_auto_smooth = True
+
+    # Store the normals as custom normals in one call
+    mesh.normals_split_custom_set_from_vertices(np.ascontiguousarray(normals, dtype=np.float32))
+
+# Define a function to update the precomputed normals of a grid mesh around edited blocks
+def set_block_normals(mesh, heights, blocks, downsample=1):
+    """Update the precomputed normals of a grid mesh around edited blocks of its depth map.
+
+    Blender 4.5 and later keep custom normals in a point attribute, whose
+    vertices around the edited blocks are written one by one, so the cost
+    follows the size of the edit. Older versions can only set every custom
+    normal at once, so they get the normals of the whole grid.
+
+    Args:
+        mesh (bpy.types.Mesh): The grid mesh with custom normals.
+        heights (numpy.ndarray): The new surface heights of the grid of shape (rows, columns).
+        blocks (numpy.ndarray): The (block row, block column) of every edited block, from storage.dirty_blocks.
+        downsample (int): The downsample factor the grid was built with.
+
+    Returns:
+        None.
+    """
+
+    # Set every normal at once on versions without a custom normal attribute
+    attribute = mesh.attributes.get("custom_normal")
+    if attribute is None or attribute.domain != 'POINT' or attribute.data_type != 'FLOAT_VECTOR':
+        set_vertex_normals(mesh, geometry.grid_normals(heights, downsample).reshape(-1, 3))
+        return
+
+    # Otherwise write only the normals of the vertices in and around the edited blocks
+    data, width = attribute.data, heights.shape[1]
+    for (r0, r1, c0, c1), normals in tiles.iter_block_normals(heights, blocks, storage.BLOCK_SIZE, downsample):
+        for row in range(r0, r1 + 1):
+            for col, normal in enumerate(normals[row - r0], c0):
+                data[row * width + col].vector = normal
+
+# Define a function to create a surface object from computed mesh arrays
+def surface_from_arrays(arrays, lod_distance=0.0):
+    """Create a surface object from the arrays computed by builder.build_surface_arrays.
+
+    When the arrays include coarser levels of detail, the object shows the
+    coarsest one as a viewport proxy and switches to the full mesh for
+    renders and when the viewport comes within the distance.
+
+    Args:
+        arrays (dict): The vertices, faces, face sizes and statistics of the surface.
+        lod_distance (float): The viewport distance below which the full level of detail is shown.
+
+    Returns:
+        bpy.types.Object: The surface object that was created.
+    """
+
+    # Create a new mesh data block
+    mesh = bpy.data.meshes.new("Surface")
+
+    # Load the vertices, faces, UVs and normals into the mesh in bulk
+    upload_mesh(mesh, arrays["vertices"], arrays["faces"], arrays["face_sizes"], arrays.get("uvs"),
+                arrays.get("normals"))
+
+    # Create a new object with the mesh data block
+    obj = bpy.data.objects.new("Surface", mesh)
+
+    # Load every coarser level of detail into its own mesh and show the coarsest one
+    if arrays.get("lods"):
+        meshes = [mesh]
+        for level, lod_arrays in enumerate(arrays["lods"], 1):
+            meshes.append(bpy.data.meshes.new(f"Surface_lod{level}"))
+            upload_mesh(meshes[-1], lod_arrays["vertices"], lod_arrays["faces"], lod_arrays["face_sizes"],
+                        lod_arrays.get("uvs"), lod_arrays.get("normals"))
+        lod.attach_lods(obj, meshes, lod_distance)
+
+    # Record the subdivision levels of displacement-only planes
+    if arrays.get("dicing_levels") is not None:
+        obj["depthify_dicing_levels"] = arrays["dicing_levels"]
+
+    # Record and log the achieved error and reduction of adaptive meshes
+    stats = arrays["stats"]
+    if stats:
+        obj["depthify_max_error"] = stats["max_error"]
+        obj["depthify_reduction"] = stats["vertex_reduction"]
+        logging.info(f"Adaptive surface: max error {stats['max_error']:.4f}, "
+                     f"{stats['vertex_reduction']:.1f}x fewer vertices, {stats['face_reduction']:.1f}x fewer faces")
+
+    # Return the object
+    return obj
+
+# Define a function to create a surface object from the width, height, and depth map values
+def create_surface(width, height, depth_map, depth_scale=geometry.DEPTH_SCALE, downsample=1,
+                   geometry_mode='GRID', error_tolerance=0.01, triangle_budget=0, workers=0):
+    """Create a surface object from the width, height, and depth map values.
+
+    Args:
+        width (int): The width of the image.
+        height (int): The height of the image.
+        depth_map (list): The list of depth map values.
+        depth_scale (float): The factor applied to the depth values.
+        downsample (int): The factor by which to reduce the resolution of the depth map.
+        geometry_mode (str): 'GRID' for one vertex per pixel, or 'ADAPTIVE' for a quadtree-decimated mesh.
+        error_tolerance (float): The largest vertical error of the adaptive mesh, in surface units.
+        triangle_budget (int): The largest number of triangles of the adaptive mesh, or 0 for no limit.
+        workers (int): The number of threads building the grid, or 0 for one per CPU core.
+
+    Returns:
+        bpy.types.Object: The surface object that was created.
+    """
+
+    # View the depth map as rows of pixels, keeping memory maps intact
+    depth_map = np.asanyarray(depth_map).reshape(height, width)
+
+    # Compute the mesh arrays and load them into a new surface object
+    arrays = builder.build_surface_arrays(depth_map, depth_scale, downsample, geometry_mode,
+                                         error_tolerance, triangle_budget, workers)
+    return surface_from_arrays(arrays)
+
+# Define a function to create one surface object per tile of a depth map
+def create_surface_tiles(depth_map, depth_scale=geometry.DEPTH_SCALE, downsample=1, tile_size=1024,
+                         max_resident_tiles=2, image_path="", workers=0):
+    """Create one surface object per tile of a depth map, streaming the tiles one at a time.
+
+    The tiles share their border vertices, so together they form the same
+    surface as create_surface. They are parented to an empty that holds the
+    settings needed to regenerate any single tile later.
+
+    Args:
+        depth_map (numpy.ndarray): The depth map of shape (height, width), typically memory-mapped.
+        depth_scale (float): The factor applied to the depth values.
+        downsample (int): The factor by which to reduce the resolution of the depth map.
+        tile_size (int): The largest number of vertex rows and columns of a tile.
+        max_resident_tiles (int): The largest number of built tiles held in memory at once.
+        image_path (str): The path of the image file, recorded for regenerating tiles.
+        workers (int): The number of threads building tiles, or 0 for one per CPU core.
+
+    Returns:
+        tuple: The parent empty object and the list of tile objects.
+    """
+
+    # Split the vertex grid into tiles
+    grid = tiles.grid_shape(depth_map.shape, downsample)
+    bounds = tiles.tile_bounds(grid[0], grid[1], tile_size)
+
+    # Create the parent empty and record the settings of the tiles on it
+    parent = bpy.data.objects.new("Surface", None)
+    parent["depthify_image"] = image_path
+    parent["depthify_depth_scale"] = depth_scale
+    parent["depthify_downsample"] = downsample
+
+    # Create a mesh object for every tile as soon as its arrays are built
+    tile_objects = []
+    for index, tile, vertices, faces, normals, uvs in tiles.iter_tiles(depth_map, bounds, downsample, depth_scale,
+                                                                       max_resident_tiles, workers):
+        mesh = bpy.data.meshes.new(f"Surface_tile_{index}")
+        upload_mesh(mesh, vertices, faces, None, uvs, normals)
+        obj = bpy.data.objects.new(mesh.name, mesh)
+        obj.parent = parent
+        obj["depthify_tile"] = list(tile)
+        tile_objects.append(obj)
+
+    # Return the parent and the tiles
+    return parent, tile_objects
+
+# Define a function to regenerate the mesh of a single surface tile
+def rebuild_surface_tile(obj, depth_map):
+    """Regenerate the mesh of a single surface tile from the current depth map.
+
+    Args:
+        obj (bpy.types.Object): The tile object created by create_surface_tiles.
+        depth_map (numpy.ndarray): The depth map of shape (height, width), typically memory-mapped.
+
+    Returns:
+        None.
+    """
+
+    # Get the tile bounds and the settings recorded on the parent
+    tile = tuple(obj["depthify_tile"])
+    parent = obj.parent
+    downsample = parent["depthify_downsample"]
+
+    # Read and build only this tile, with the margin its border normals need
+    window, margin = tiles.read_tile(depth_map, tile, downsample, tiles.TILE_MARGIN)
+    grid = tiles.grid_shape(depth_map.shape, downsample)
+    vertices, faces, normals, uvs = tiles.build_tile(window, margin, tile, grid, parent["depthify_depth_scale"],
+                                                     downsample, depth_map.shape)
+
+    # Load the arrays into a new mesh that keeps the materials of the old one
+    old_mesh = obj.data
+    mesh = bpy.data.meshes.new(old_mesh.name)
+    upload_mesh(mesh, vertices, faces, None, uvs, normals)
+    for material in old_mesh.materials:
+        mesh.materials.append(material)
+
+    # Swap the meshes and remove the old one if nothing else uses it
+    obj.data = mesh
+    if old_mesh.users == 0:
+        bpy.data.meshes.remove(old_mesh)
+
+# Define a function to create a surface object that plays back a depth sequence
+def create_sequence_surface(key, depth_scale=geometry.DEPTH_SCALE, frame_start=1):
+    """Create a surface object whose vertices follow the frames of a cached depth sequence.
+
+    All frames share one mesh; the depth of the current frame is copied
+    into it on every frame change, so no per-frame meshes or shape keys
+    are stored in the .blend file.
+
+    Args:
+        key (str): The sequence key returned by sequence.build_cache.
+        depth_scale (float): The factor applied to the depth values.
+        frame_start (int): The scene frame that shows the first frame of the sequence.
+
+    Returns:
+        bpy.types.Object: The surface object that was created.
+    """
+
+    # Map the frames and build the grid from the first one
+    frames = sequence.open_frames(key)
+    with open(sequence.cache_paths(key)[1]) as file:
+        downsample = json.load(file)["downsample"]
+    _, height, width = frames.shape
+    vertices, faces = geometry.build_grid(width, height, frames[0], depth_scale, downsample)
+
+    # Load the grid into a new surface object
+    mesh = bpy.data.meshes.new("Surface")
+    upload_mesh(mesh, vertices, faces)
+    obj = bpy.data.objects.new("Surface", mesh)
+
+    # Record the sequence and its playback settings on the object
+    obj["depthify_sequence"] = key
+    obj["depthify_sequence_start"] = frame_start
+    obj["depthify_depth_scale"] = depth_scale
+
+    # Return the object
+    return obj
+
+# Define a function to show the current frame of every sequence surface
+def update_sequence_frames(scene, depsgraph=None):
+    """Copy the depth of the current frame into every sequence surface of the scene.
+
+    Args:
+        scene (bpy.types.Scene): The scene whose frame changed.
+        depsgraph: The dependency graph, passed by newer Blender versions.
+
+    Returns:
+        None.
+    """
+
+    # Update every mesh object that plays back a sequence
+    for obj in scene.objects:
+        key = obj.get("depthify_sequence")
+        if not key or obj.type != 'MESH':
+            continue
+
+        # Open a player for the sequence the first time it is shown
+        player = sequence_players.get(key)
+        if player is None:
+            frames = sequence.open_frames(key)
+            if frames is None:
+                continue
+            player = sequence_players[key] = sequence.FramePlayer(frames, scene.depthify_properties.prefetch_frames)
+
+        # Skip meshes that no longer match the frames
+        mesh = obj.data
+        if len(mesh.vertices) != player.frames[0].size:
+            continue
+
+        # Read the coordinates once and then only replace their z column
+        if player.coords is None or len(player.coords) != len(mesh.vertices) * 3:
+            player.coords = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+            mesh.vertices.foreach_get("co", player.coords)
+        values = player.get(scene.frame_current - obj["depthify_sequence_start"])
+        np.multiply(values, obj["depthify_depth_scale"], out=player.coords[2::3])
+
+        # Write the coordinates in bulk
+        mesh.vertices.foreach_set("co", player.coords)
+        mesh.update()
+
+# Define a function to update the depth of the edited blocks of a surface in place
+def patch_surface_depth(obj, depth_map, blocks, downsample=1, depth_scale=geometry.DEPTH_SCALE, image_path=None):
+    """Update the z coordinates of the vertices in edited blocks of a grid surface, keeping its topology.
+
+    Args:
+        obj (bpy.types.Object): The grid surface object built from an earlier version of the depth map.
+        depth_map (numpy.ndarray): The new depth map of shape (height, width), typically memory-mapped.
+        blocks (numpy.ndarray): The (block row, block column) of every edited block, from storage.dirty_blocks.
+        downsample (int): The downsample factor the surface was built with.
+        depth_scale (float): The depth multiplier the surface was built with.
+        image_path (str): The path of the image file, whose texture is reloaded if the surface has a material.
+
+    Returns:
+        int: The number of vertices that were recomputed.
+    """
+
+    # Check that the mesh is still the full grid of the depth map
+    mesh = obj.data
+    grid_height, grid_width = tiles.grid_shape(depth_map.shape, downsample)
+    if len(mesh.vertices) != grid_height * grid_width:
+        raise ValueError(f"Mesh has {len(mesh.vertices)} vertices, expected {grid_height * grid_width}")
+
+    # Give the surface its own mesh when it shares one, so that the other surfaces and the cached surface keep their depth
+    if mesh.users > 1:
+        obj.data = mesh.copy()
+        mesh = obj.data
+
+    # Read the coordinates, recompute the edited blocks and write them back in bulk
+    vertices = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", vertices)
+    updated = tiles.patch_grid_depth(vertices.reshape(-1, 3), depth_map, blocks, storage.BLOCK_SIZE,
+                                     downsample, depth_scale)
+    mesh.vertices.foreach_set("co", vertices)
+    mesh.update()
+
+    # Recompute the precomputed normals around the edited blocks from the new heights
+    if mesh.has_custom_normals:
+        set_block_normals(mesh, vertices.reshape(grid_height, grid_width, 3)[..., 2], blocks, downsample)
+
+    # Reload the displacement texture, which follows the same image file
+    if image_path and obj.active_material is not None:
+        materials.get_image(image_path)
+
+    # Return the number of recomputed vertices
+    return updated
+
+# Define a function to get a copy of a cached surface object
+def get_cached_surface(key, linked=False):
+    """Get a copy of a cached surface object.
+
+    An unlinked copy has its own mesh data block, so it can be edited without
+    affecting the cached surface or other copies. A linked copy shares the
+    mesh, and its material, with the cached surface and every other linked
+    copy, so memory and file size grow with the number of depth maps rather
+    than the number of objects.
+
+    Args:
+        key (str): The cache key of the surface.
+        linked (bool): Whether the copy shares the mesh of the cached surface.
+
+    Returns:
+        bpy.types.Object: A new surface object, or None when the surface is not cached.
+    """
+
+    # Look up the name of the template object
+    name = surface_cache.get(key)
+    if name is None:
+        return None
+
+    # Forget the entry when the template object has been removed or purged
+    template = bpy.data.objects.get(name)
+    if template is None or not template.get("depthify_template"):
+        surface_cache.discard(key)
+        return None
+
+    # Duplicate the template object together with its modifiers, copying the mesh unless it is shared
+    obj = template.copy()
+    if not linked:
+        obj.data = template.data.copy()
+    del obj["depthify_template"]
+
+    # Return the new object
+    return obj
+
+# Define a function to add a surface object to the surface cache
+def cache_surface(key, obj, max_bytes=None, linked=False):
+    """Add a template copy of a surface object to the surface cache.
+
+    Args:
+        key (str): The cache key of the surface.
+        obj (bpy.types.Object): The surface object.
+        max_bytes (int): The byte budget of the cache, or None to keep the current one.
+        linked (bool): Whether the template shares the mesh of the surface object instead of copying it.
+
+    Returns:
+        None.
+    """
+
+    # Copy the object, and its mesh unless it is shared, so that later edits do not alter the cached surface
+    template = obj.copy()
+    if not linked:
+        template.data = obj.data.copy()
+
+    # Tag the template, which lives only for the session since nothing uses it, so that it is never mistaken
+    # for another object and can be purged when a file is loaded or the add-on is disabled
+    template["depthify_template"] = True
+
+    # Estimate the memory used by the mesh
+    mesh = template.data
+    nbytes = len(mesh.vertices) * 12 + len(mesh.edges) * 8 + len(mesh.loops) * 8 + len(mesh.polygons) * 12
+
+    # Update the budget and add the template to the cache
+    if max_bytes is not None:
+        surface_cache.max_bytes = max_bytes
+    surface_cache.put(key, template.name, nbytes)
+
+# Define a function to switch a scene to the Cycles experimental feature set
+def use_cycles_experimental(scene):
+    """Switch a scene to Cycles with the experimental feature set, which adaptive subdivision needs.
+
+    The settings are only written when they differ, since every write
+    tags the scene for a depsgraph update.
+
+    Args:
+        scene (bpy.types.Scene): The scene.
+
+    Returns:
+        None.
+    """
+
+    # Set the render engine and the feature set once
+    if scene.render.engine != 'CYCLES':
+        scene.render.engine = 'CYCLES'
+    if scene.cycles.feature_set != 'EXPERIMENTAL':
+        scene.cycles.feature_set = 'EXPERIMENTAL'
+
+# Define a function to apply adaptive subdivision to a surface object
+def apply_adaptive_subdivision(obj, subdivisions, subdivision_type):
+    """Apply adaptive subdivision to a surface object.
+
+    Args:
+        obj (bpy.types.Object): The surface object.
+        subdivisions (int): The number of subdivisions.
+        subdivision_type (str): The type of subdivision method.
+
+    Returns:
+        None.
+    """
+
+    # Render with Cycles, which adaptive subdivision needs
+    use_cycles_experimental(bpy.context.scene)
+
+    # Create a new subdivision surface modifier for the object
+    modifier = obj.modifiers.new("Subdivision", 'SUBSURF')
+
+    # Set the modifier properties
+    modifier.subdivision_type = subdivision_type
+    modifier.levels = subdivisions
+    modifier.render_levels = subdivisions
+
+    # Enable adaptive subdivision, which moved from the object Cycles settings to the modifier in newer Blender
+    if hasattr(modifier, "use_adaptive_subdivision"):
+        modifier.use_adaptive_subdivision = True
+    else:
+        obj.cycles.use_adaptive_subdivision = True
+
+# Define a function to dice a displacement-only plane down to the pixels of its depth map
+def apply_dicing(obj, levels, dicing_rate=1.0):
+    """Subdivide a displacement-only plane adaptively so that its micropolygons reach the depth map pixels.
+
+    Args:
+        obj (bpy.types.Object): The plane object created in the displacement-only mode.
+        levels (int): The subdivision levels at which the faces are diced down to single pixels.
+        dicing_rate (float): The size of the micropolygons on screen, in pixels.
+
+    Returns:
+        None.
+    """
+
+    # Subdivide without smoothing, since all relief comes from the displacement
+    apply_adaptive_subdivision(obj, levels, 'SIMPLE')
+
+    # Let Cycles dice as finely as the depth map, but no finer
+    scene = bpy.context.scene
+    scene.cycles.max_subdivisions = levels
+    obj.cycles.dicing_rate = dicing_rate
+
+# Define a function to apply displacement to a surface object
+def apply_displacement(obj, displacement_strength, displacement_type, midlevel=0.5, interpolation='Closest',
+                       image_path=None, collect=True):
+    """Apply displacement to a surface object.
+
+    Args:
+        obj (bpy.types.Object): The surface object.
+        displacement_strength (float): The strength of the displacement modifier.
+        displacement_type (str): The type of displacement method.
+        midlevel (float): The depth value that is not displaced.
+        interpolation (str): The interpolation of the depth map texture.
+        image_path (str): The path of the depth map image, or None for the image of the scene properties.
+        collect (bool): Whether to remove the materials and images left without users afterwards.
+
+    Returns:
+        None.
+    """
+
+    # Render with Cycles, which true displacement needs
+    scene = bpy.context.scene
+    use_cycles_experimental(scene)
+
+    # Reuse the loaded depth map image and the material shared by surfaces with the same settings
+    image = materials.get_image(image_path or scene.depthify_properties.image)
+    method = 'DISPLACEMENT' if displacement_type == 'TRUE' else displacement_type
+    material = materials.get_material(image, displacement_strength, method, midlevel, interpolation)
+
+    # Link the material to the object when the mesh is shared, so that each surface keeps its own displacement
+    if obj.data.users > 1:
+        if not obj.material_slots:
+            obj.data.materials.append(None)
+        obj.material_slots[0].link = 'OBJECT'
+
+    # Assign the material to the object's active material slot
+    obj.active_material = material
+
+    # Remove the materials and images left without users by earlier surfaces
+    if collect:
+        removed = materials.collect_orphans()
+        if any(removed):
+            logging.info(f"Removed {removed[0]} unused materials and {removed[1]} unused images")
+
+# Define a function to scale a surface object
+def scale_surface(obj, scale):
+    """Scale a surface object.
+
+    Args:
+        obj (bpy.types.Object): The surface object.
+        scale (tuple): The scale factors for x, y, and z axes.
+
+    Returns:
+        None.
+    """
+
+    # Set the scale property of the object
+    obj.scale = scale
+
+# Define a function to stop the sequence players
+def close_players():
+    """Stop the prefetch threads of every sequence player and drop the players.
+
+    Returns:
+        None.
+    """
+
+    # Close every player and forget it, so that the next frame change opens it again
+    for player in sequence_players.values():
+        player.close()
+    sequence_players.clear()
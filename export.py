@@ -0,0 +1,335 @@
+"""Write the surface grid of a depth map straight to a mesh file, without Blender.
+
+The grid is the one create_surface builds, with the same centering, spacing
+and depth scale, written band by band so that memory stays constant however
+large the depth map is:
+
+    python Depthify/export.py depth.png surface.ply --downsample 2
+
+Binary PLY, binary STL, GLB and OBJ files are supported.
+"""
+
+# Import the necessary modules
+import argparse
+import json
+import os
+import struct
+import sys
+
+import numpy as np
+
+# Import the geometry, storage and tiles modules both inside the add-on package and standalone
+try:
+    from . import geometry
+    from . import storage
+    from . import tiles
+except ImportError:
+    import geometry
+    import storage
+    import tiles
+
+# Define the number of vertex rows computed and written at once
+BAND_ROWS = 256
+
+# Define a function to iterate over the bands of the surface grid
+def iter_bands(depth, downsample=1, depth_scale=geometry.DEPTH_SCALE, band_rows=BAND_ROWS, overlap=0):
+    """Iterate over the vertices and faces of the surface grid band by band.
+
+    Args:
+        depth (numpy.ndarray): The full resolution depth map, which may be memory-mapped.
+        downsample (int): The downsample factor of the depth map.
+        depth_scale (float): The factor applied to the depth values.
+        band_rows (int): The number of vertex rows of every band.
+        overlap (int): The number of vertex rows of the next band to add to every band.
+
+    Yields:
+        tuple: The first vertex row of the band, its vertex array and its face array with indices into the full grid.
+    """
+
+    # Build the bands in order, adding the following rows when asked to
+    grid_height, grid_width = tiles.grid_shape(depth.shape, downsample)
+    for a in range(0, grid_height, band_rows):
+        b = min(a + band_rows, grid_height)
+        vertices, faces = tiles.build_band(depth, (a, min(b + overlap, grid_height)), downsample, depth_scale)
+
+        # Keep only the faces that start in this band, so that every face is yielded once
+        yield a, vertices, faces[:(min(b, grid_height - 1) - a) * (grid_width - 1)]
+
+# Define a function to split quads into triangles
+def triangulate(faces):
+    """Split every quad into two triangles along its first diagonal.
+
+    Args:
+        faces (numpy.ndarray): The int32 quads of shape (count, 4).
+
+    Returns:
+        numpy.ndarray: The int32 triangles of shape (count * 2, 3).
+    """
+
+    # Take the corners 0, 1, 2 and 0, 2, 3 of every quad, keeping the winding
+    return faces[:, [0, 1, 2, 0, 2, 3]].reshape(-1, 3)
+
+# Define a function to write a binary PLY file
+def write_ply(file, depth, downsample=1, depth_scale=geometry.DEPTH_SCALE, band_rows=BAND_ROWS):
+    """Write the surface grid as a binary little-endian PLY file with quad faces.
+
+    Args:
+        file (file): The file opened for binary writing.
+        depth (numpy.ndarray): The full resolution depth map.
+        downsample (int): The downsample factor of the depth map.
+        depth_scale (float): The factor applied to the depth values.
+        band_rows (int): The number of vertex rows written at once.
+
+    Returns:
+        tuple: The number of vertices and faces written.
+    """
+
+    # Write the header with the counts, which follow from the grid shape
+    height, width = tiles.grid_shape(depth.shape, downsample)
+    vertex_count, face_count = width * height, max(width - 1, 0) * max(height - 1, 0)
+    file.write((f"ply\nformat binary_little_endian 1.0\ncomment Depthify surface\n"
+                f"element vertex {vertex_count}\nproperty float x\nproperty float y\nproperty float z\n"
+                f"element face {face_count}\nproperty list uchar int vertex_indices\nend_header\n").encode("ascii"))
+
+    # Write the vertices band by band
+    for _, vertices, _ in iter_bands(depth, downsample, depth_scale, band_rows):
+        file.write(vertices.astype("<f4", copy=False).tobytes())
+
+    # Write the faces band by band, each as a corner count followed by four indices
+    face_type = np.dtype([("count", "u1"), ("indices", "<i4", 4)])
+    for _, _, faces in iter_bands(depth, downsample, depth_scale, band_rows):
+        records = np.empty(len(faces), dtype=face_type)
+        records["count"] = 4
+        records["indices"] = faces
+        file.write(records.tobytes())
+
+    # Return the counts
+    return vertex_count, face_count
+
+# Define a function to write a binary STL file
+def write_stl(file, depth, downsample=1, depth_scale=geometry.DEPTH_SCALE, band_rows=BAND_ROWS):
+    """Write the surface grid as a binary STL file of triangles with face normals.
+
+    Args:
+        file (file): The file opened for binary writing.
+        depth (numpy.ndarray): The full resolution depth map.
+        downsample (int): The downsample factor of the depth map.
+        depth_scale (float): The factor applied to the depth values.
+        band_rows (int): The number of vertex rows written at once.
+
+    Returns:
+        tuple: The number of vertices and triangles written.
+    """
+
+    # Write the 80 byte header and the triangle count
+    height, width = tiles.grid_shape(depth.shape, downsample)
+    triangle_count = 2 * max(width - 1, 0) * max(height - 1, 0)
+    file.write(b"Depthify surface".ljust(80, b"\0"))
+    file.write(struct.pack("<I", triangle_count))
+
+    # Write the triangles of every band, which needs the first vertex row of the next band as well
+    triangle_type = np.dtype([("normal", "<f4", 3), ("corners", "<f4", (3, 3)), ("attributes", "<u2")])
+    for a, vertices, faces in iter_bands(depth, downsample, depth_scale, band_rows, overlap=1):
+        corners = vertices[triangulate(faces - a * width)]
+
+        # Compute the unit normal of every triangle, leaving degenerate ones at zero
+        normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+        lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+        np.divide(normals, lengths, out=normals, where=lengths > 0)
+
+        # Pack the normals, corners and empty attributes into the 50 byte records
+        records = np.zeros(len(corners), dtype=triangle_type)
+        records["normal"] = normals
+        records["corners"] = corners
+        file.write(records.tobytes())
+
+    # Return the counts
+    return width * height, triangle_count
+
+# Define a function to write an OBJ file
+def write_obj(file, depth, downsample=1, depth_scale=geometry.DEPTH_SCALE, band_rows=BAND_ROWS):
+    """Write the surface grid as a text OBJ file with quad faces.
+
+    Args:
+        file (file): The file opened for binary writing.
+        depth (numpy.ndarray): The full resolution depth map.
+        downsample (int): The downsample factor of the depth map.
+        depth_scale (float): The factor applied to the depth values.
+        band_rows (int): The number of vertex rows written at once.
+
+    Returns:
+        tuple: The number of vertices and faces written.
+    """
+
+    # Write the vertices band by band
+    file.write(b"# Depthify surface\no Surface\n")
+    vertex_count = face_count = 0
+    for _, vertices, _ in iter_bands(depth, downsample, depth_scale, band_rows):
+        np.savetxt(file, vertices, fmt="v %.6g %.6g %.6g")
+        vertex_count += len(vertices)
+
+    # Write the faces band by band, with the one-based indices of OBJ
+    for _, _, faces in iter_bands(depth, downsample, depth_scale, band_rows):
+        np.savetxt(file, faces + 1, fmt="f %d %d %d %d")
+        face_count += len(faces)
+
+    # Return the counts
+    return vertex_count, face_count
+
+# Define a function to get the triangles of a band that avoid the holes of the depth map
+def glb_triangles(a, width, vertices, faces):
+    """Get the triangles of a band whose corners all have finite depth values.
+
+    Args:
+        a (int): The first vertex row of the band.
+        width (int): The number of vertex columns of the grid.
+        vertices (numpy.ndarray): The vertices of the band and of the first row of the next band.
+        faces (numpy.ndarray): The quads of the band with indices into the full grid.
+
+    Returns:
+        numpy.ndarray: The int32 triangles of shape (count, 3) with indices into the full grid.
+    """
+
+    # Drop the triangles that touch a hole, which would otherwise stretch down to the base plane
+    triangles = triangulate(faces)
+    return triangles[np.isfinite(vertices[triangles - a * width, 2]).all(axis=1)]
+
+# Define a function to write a binary glTF file
+def write_glb(file, depth, downsample=1, depth_scale=geometry.DEPTH_SCALE, band_rows=BAND_ROWS):
+    """Write the surface grid as a binary glTF file with one triangle mesh.
+
+    glTF is Y-up, so the vertices are rotated the same way as by Blender's
+    glTF exporter: the x, y, z of the surface become x, z, -y. glTF allows
+    no NaN positions, so the vertices of holes are written on the base
+    plane and the triangles that touch them are left out. A grid one vertex
+    wide or tall has no triangles and is written as points without indices,
+    since glTF forbids empty buffer views.
+
+    Args:
+        file (file): The file opened for binary writing.
+        depth (numpy.ndarray): The full resolution depth map.
+        downsample (int): The downsample factor of the depth map.
+        depth_scale (float): The factor applied to the depth values.
+        band_rows (int): The number of vertex rows written at once.
+
+    Returns:
+        tuple: The number of vertices and triangles written.
+    """
+
+    # Find the bounds of the positions and the number of triangles, which glTF requires before any data is written
+    height, width = tiles.grid_shape(depth.shape, downsample)
+    vertex_count, triangle_count = width * height, 0
+    low, high = np.full(3, np.inf), np.full(3, -np.inf)
+    for a, vertices, faces in iter_bands(depth, downsample, depth_scale, band_rows, overlap=1):
+        positions = np.nan_to_num(vertices, nan=0.0, posinf=0.0, neginf=0.0)
+        low = np.fmin(low, positions.min(axis=0))
+        high = np.fmax(high, positions.max(axis=0))
+        triangle_count += len(glb_triangles(a, width, vertices, faces))
+
+    # Describe the positions followed by the indices in a single buffer, leaving out the indices of points
+    position_bytes, index_bytes = vertex_count * 12, triangle_count * 12
+    document = {
+        "asset": {"version": "2.0", "generator": "Depthify"},
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{"mesh": 0, "name": "Surface"}],
+        "meshes": [{"name": "Surface", "primitives": [{"attributes": {"POSITION": 0}, "indices": 1}]}],
+        "buffers": [{"byteLength": position_bytes + index_bytes}],
+        "bufferViews": [
+            {"buffer": 0, "byteOffset": 0, "byteLength": position_bytes, "target": 34962},
+            {"buffer": 0, "byteOffset": position_bytes, "byteLength": index_bytes, "target": 34963},
+        ],
+        "accessors": [
+            {"bufferView": 0, "componentType": 5126, "count": vertex_count, "type": "VEC3",
+             "min": [float(low[0]), float(low[2]), float(-high[1])],
+             "max": [float(high[0]), float(high[2]), float(-low[1])]},
+            {"bufferView": 1, "componentType": 5125, "count": triangle_count * 3, "type": "SCALAR"},
+        ],
+    }
+    if not triangle_count:
+        document["meshes"][0]["primitives"] = [{"attributes": {"POSITION": 0}, "mode": 0}]
+        del document["bufferViews"][1], document["accessors"][1]
+
+    # Write the header and the JSON chunk, padded with spaces to a multiple of four bytes
+    text = json.dumps(document, separators=(",", ":"), allow_nan=False).encode("utf-8")
+    text += b" " * (-len(text) % 4)
+    file.write(struct.pack("<III", 0x46546C67, 2, 12 + 8 + len(text) + 8 + position_bytes + index_bytes))
+    file.write(struct.pack("<II", len(text), 0x4E4F534A) + text)
+
+    # Write the binary chunk, with the positions rotated to Y-up and holes on the base plane, and then the triangles
+    file.write(struct.pack("<II", position_bytes + index_bytes, 0x004E4942))
+    for _, vertices, _ in iter_bands(depth, downsample, depth_scale, band_rows):
+        rotated = np.empty_like(vertices, dtype="<f4")
+        rotated[:, 0], rotated[:, 1], rotated[:, 2] = vertices[:, 0], vertices[:, 2], -vertices[:, 1]
+        file.write(np.nan_to_num(rotated, nan=0.0, posinf=0.0, neginf=0.0).tobytes())
+    for a, vertices, faces in iter_bands(depth, downsample, depth_scale, band_rows, overlap=1):
+        file.write(glb_triangles(a, width, vertices, faces).astype("<u4").tobytes())
+
+    # Return the counts
+    return vertex_count, triangle_count
+
+# Define the writers by file extension
+WRITERS = {".ply": write_ply, ".stl": write_stl, ".obj": write_obj, ".glb": write_glb}
+
+# Define a function to export the surface grid of a depth map to a mesh file
+def export_depth(path, depth, downsample=1, depth_scale=geometry.DEPTH_SCALE, band_rows=BAND_ROWS):
+    """Export the surface grid of a depth map to a mesh file chosen by its extension.
+
+    The file is written under a temporary name and moved in place when
+    finished, so an interrupted export leaves no partial file behind.
+
+    Args:
+        path (str): The path of the .ply, .stl, .obj or .glb file to write.
+        depth (numpy.ndarray): The full resolution depth map, which may be memory-mapped.
+        downsample (int): The downsample factor of the depth map.
+        depth_scale (float): The factor applied to the depth values.
+        band_rows (int): The number of vertex rows written at once.
+
+    Returns:
+        tuple: The number of vertices and faces written, with triangles counted for STL and glTF.
+    """
+
+    # Pick the writer of the file extension
+    writer = WRITERS.get(os.path.splitext(path)[1].lower())
+    if writer is None:
+        raise ValueError(f"Unsupported mesh format: {path}")
+
+    # Write the file under a temporary name and move it in place
+    with open(path + ".tmp", "wb") as file:
+        counts = writer(file, depth, downsample, depth_scale, band_rows)
+    os.replace(path + ".tmp", path)
+
+    # Return the counts
+    return counts
+
+# Define the entry point of the exporter
+def main(argv=None):
+    """Export the surface grid of a depth map image to a mesh file.
+
+    Args:
+        argv (list): The arguments, or None to read the command line.
+
+    Returns:
+        int: The exit status.
+    """
+
+    # Read the arguments
+    parser = argparse.ArgumentParser(prog="depthify-export", description="Export a depth map as a mesh file.")
+    parser.add_argument("input", help="The depth map image")
+    parser.add_argument("output", help="The .ply, .stl, .obj or .glb file to write")
+    parser.add_argument("--downsample", type=int, default=1, help="The downsample factor of the depth map")
+    parser.add_argument("--depth-scale", type=float, default=geometry.DEPTH_SCALE, help="The depth scale")
+    parser.add_argument("--channel", type=int, default=0, help="The channel that holds the depth values")
+    args = parser.parse_args(argv)
+
+    # Load the depth map through the sidecar cache, which memory-maps it after the first run
+    depth, _ = storage.load_depth(args.input, args.channel)
+
+    # Export the surface and print its size
+    vertex_count, face_count = export_depth(args.output, depth, args.downsample, args.depth_scale)
+    print(f"Wrote {vertex_count:,} vertices and {face_count:,} faces to {args.output}")
+    return 0
+
+# Run the exporter when the script is executed
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,613 @@
+# Import the necessary modules
+import math
+
+import numpy as np
+
+# Define the factor that converts depth map values to surface heights
+DEPTH_SCALE = 10.0
+
+# Define the largest number of pixels along a face edge of a displacement-only plane
+PLANE_CELL = 64
+
+# Define the largest number of faces along each side of a displacement-only plane
+PLANE_SEGMENTS = 32
+
+# Define a function to compute the vertex coordinates of the surface grid
+def grid_vertices(width, height, depth_map, depth_scale=DEPTH_SCALE, spacing=1.0, offset=(0, 0), center=None,
+                  out=None):
+    """Compute the vertex coordinates of the surface grid.
+
+    The vertices follow the layout used by create_surface: one vertex per
+    pixel in row-major order, centered on the origin, with the depth value
+    scaled into the z coordinate.
+
+    Args:
+        width (int): The width of the image.
+        height (int): The height of the image.
+        depth_map (array-like): The depth map values, flat or of shape (height, width).
+        depth_scale (float): The factor applied to the depth values.
+        spacing (float): The distance between neighbouring vertices.
+        offset (tuple): The row and column of the first vertex when the grid is part of a larger grid.
+        center (tuple): The row and column placed at the origin, or None for the middle of this grid.
+        out (numpy.ndarray): A float32 array of shape (width * height, 3) to fill instead of allocating one.
+
+    Returns:
+        numpy.ndarray: A contiguous float32 array of shape (width * height, 3).
+    """
+
+    # View the depth map as a two-dimensional array without copying when possible
+    depth = np.asarray(depth_map, dtype=np.float32).reshape(height, width)
+
+    # Allocate the vertex array in a single block unless one is given
+    vertices = np.empty((height, width, 3), dtype=np.float32) if out is None else out.reshape(height, width, 3)
+
+    # Center the grid on the origin unless it is part of a larger grid
+    center_row, center_col = center if center is not None else (height / 2, width / 2)
+
+    # Broadcast the x and y coordinates over the columns and rows
+    vertices[..., 0] = (np.arange(offset[1], offset[1] + width, dtype=np.float32) - center_col) * spacing
+    vertices[..., 1] = ((np.arange(offset[0], offset[0] + height, dtype=np.float32) - center_row) * spacing)[:, None]
+
+    # Scale the depth values into the z coordinates
+    np.multiply(depth, depth_scale, out=vertices[..., 2])
+
+    # Return the vertices as a flat list of coordinates
+    return vertices.reshape(-1, 3)
+
+# Define a function to compute the quad indices of the surface grid
+def grid_faces(width, height, row_offset=0, out=None):
+    """Compute the quad indices of the surface grid.
+
+    Each quad joins the pixels (row - 1, col - 1), (row - 1, col), (row, col)
+    and (row, col - 1), in the same order as the original per-pixel loop.
+
+    Args:
+        width (int): The width of the image.
+        height (int): The height of the image.
+        row_offset (int): The row of the first vertex when the rows are part of a taller grid.
+        out (numpy.ndarray): An int32 array of shape ((width - 1) * (height - 1), 4) to fill instead of allocating one.
+
+    Returns:
+        numpy.ndarray: A contiguous int32 array of shape ((width - 1) * (height - 1), 4).
+    """
+
+    # Number every vertex of the grid in row-major order
+    index = np.arange(row_offset * width, (row_offset + height) * width, dtype=np.int32).reshape(height, width)
+
+    # Allocate the face array in a single block unless one is given
+    shape = (max(height - 1, 0), max(width - 1, 0), 4)
+    faces = np.empty(shape, dtype=np.int32) if out is None else out.reshape(shape)
+
+    # Fill the four corners of every quad from shifted views of the index grid
+    faces[..., 0] = index[:-1, :-1]
+    faces[..., 1] = index[:-1, 1:]
+    faces[..., 2] = index[1:, 1:]
+    faces[..., 3] = index[1:, :-1]
+
+    # Return the faces as a flat list of quads
+    return faces.reshape(-1, 4)
+
+# Define a function to compute the vertices and faces of the surface grid
+def build_grid(width, height, depth_map, depth_scale=DEPTH_SCALE, spacing=1.0):
+    """Compute the vertices and faces of the surface grid.
+
+    Args:
+        width (int): The width of the image.
+        height (int): The height of the image.
+        depth_map (array-like): The depth map values, flat or of shape (height, width).
+        depth_scale (float): The factor applied to the depth values.
+        spacing (float): The distance between neighbouring vertices.
+
+    Returns:
+        tuple: The vertex array and the face array.
+    """
+
+    # Compute both arrays and return them together
+    return grid_vertices(width, height, depth_map, depth_scale, spacing), grid_faces(width, height)
+
+# Define a function to reduce the resolution of a depth map by an integer factor
+def downsample(depth, factor):
+    """Reduce the resolution of a depth map by averaging square blocks of pixels.
+
+    Partial blocks at the right and bottom edges are averaged over the pixels
+    they contain, so every input pixel contributes to the result.
+
+    Args:
+        depth (numpy.ndarray): The depth map of shape (height, width).
+        factor (int): The size of the blocks to average.
+
+    Returns:
+        numpy.ndarray: The float32 depth map of shape (ceil(height / factor), ceil(width / factor)).
+    """
+
+    # Return the depth map unchanged when there is nothing to reduce
+    depth = np.asarray(depth, dtype=np.float32)
+    if factor <= 1:
+        return depth
+
+    # Sum the pixels of every block along both axes
+    height, width = depth.shape
+    rows = np.arange(0, height, factor)
+    cols = np.arange(0, width, factor)
+    sums = np.add.reduceat(np.add.reduceat(depth, rows, axis=0, dtype=np.float64), cols, axis=1)
+
+    # Divide by the number of pixels in every block, including partial ones
+    counts = np.outer(np.diff(np.append(rows, height)), np.diff(np.append(cols, width)))
+    return (sums / counts).astype(np.float32)
+
+# Define a function to compute the vertex normals of a height grid
+def grid_normals(heights, spacing=1.0):
+    """Compute the unit normal of every point of a height grid with Sobel derivatives.
+
+    The derivatives are central differences smoothed across the other axis
+    with 1-2-1 weights, and one-sided at the borders, as for a surface whose
+    x and y coordinates grow with the column and the row.
+
+    Args:
+        heights (numpy.ndarray): The surface heights of shape (rows, columns).
+        spacing (float): The distance between neighbouring points.
+
+    Returns:
+        numpy.ndarray: A float32 array of shape (rows, columns, 3).
+    """
+
+    # Extend the border linearly so that the differences at the edges become one-sided
+    padded = np.pad(np.asarray(heights, dtype=np.float32), 1, mode="reflect", reflect_type="odd")
+
+    # Smooth across each axis and take the central difference along the other one
+    across_rows = padded[:-2] + 2 * padded[1:-1] + padded[2:]
+    across_cols = padded[:, :-2] + 2 * padded[:, 1:-1] + padded[:, 2:]
+    dx = (across_rows[:, 2:] - across_rows[:, :-2]) / (8 * spacing)
+    dy = (across_cols[2:] - across_cols[:-2]) / (8 * spacing)
+
+    # Build the normals (-dx, -dy, 1) and scale them to unit length in place
+    normals = np.empty(dx.shape + (3,), dtype=np.float32)
+    np.negative(dx, out=normals[..., 0])
+    np.negative(dy, out=normals[..., 1])
+    normals[..., 2] = 1.0
+    normals /= np.sqrt(np.einsum("...i,...i", normals, normals))[..., None]
+    return normals
+
+# Define a function to compute the normals and UVs of a surface built on the pixel grid
+def surface_attributes(vertices, faces, heights, image_shape, spacing=1.0, offset=(0, 0), grid=None):
+    """Compute the vertex normals and the per-loop UVs of a surface whose vertices lie on the pixel grid.
+
+    This covers the grid and the adaptive meshes, whose vertices are all
+    points of the height grid. Every vertex gets the UV of the center of the
+    pixels it stands for, so an image texture lines up with the depth map.
+    A tile of a larger grid passes the heights of its window with the
+    neighbouring rows and columns, so its border normals match the full grid.
+
+    Args:
+        vertices (numpy.ndarray): The vertex coordinates of shape (N, 3).
+        faces (numpy.ndarray): The face indices, either of shape (F, K) or flat.
+        heights (numpy.ndarray): The surface heights of the vertex grid of shape (rows, columns).
+        image_shape (tuple): The height and width of the full resolution depth map.
+        spacing (float): The distance between neighbouring points, which is the downsample factor.
+        offset (tuple): The row and column of the first height when the heights are a window of a larger grid.
+        grid (tuple): The number of rows and columns of the full grid the vertices are centered on,
+            or None for the shape of the heights.
+
+    Returns:
+        tuple: The float32 normals of shape (N, 3) and the float32 UVs of every loop of shape (L, 2).
+    """
+
+    # Find the row and column of every vertex from its position on the centered grid
+    rows, cols = grid if grid is not None else heights.shape
+    row = np.rint(vertices[:, 1] / spacing + rows / 2).astype(np.int32)
+    col = np.rint(vertices[:, 0] / spacing + cols / 2).astype(np.int32)
+
+    # Look up the normal of every vertex in the window of heights
+    normals = grid_normals(heights, spacing)[row - offset[0], col - offset[1]]
+
+    # Map every vertex to the middle of the block of pixels it averages, which is partial at the far edges
+    image_height, image_width = image_shape
+    uvs = np.empty((len(vertices), 2), dtype=np.float32)
+    uvs[:, 0] = (col * spacing + np.minimum((col + 1) * spacing, image_width)) / (2 * image_width)
+    uvs[:, 1] = (row * spacing + np.minimum((row + 1) * spacing, image_height)) / (2 * image_height)
+
+    # Spread the UVs over the loops
+    return normals, uvs[np.asarray(faces).ravel()]
+
+# Define a function to build a pyramid of reduced depth maps
+def depth_pyramid(depth, levels, factor=2):
+    """Build a mipmap-style pyramid of depth maps, each reduced by the factor from the one before.
+
+    Every level averages blocks of the previous level, so the full
+    resolution map is only read once however many levels are built.
+
+    Args:
+        depth (numpy.ndarray): The depth map of shape (height, width) at the finest level.
+        levels (int): The number of reduced levels to build.
+        factor (int): The reduction between neighbouring levels.
+
+    Returns:
+        list: The float32 depth maps of the reduced levels, from finest to coarsest.
+    """
+
+    # Reduce every level from the previous one, stopping when a level is a single row or column
+    pyramid = []
+    for _ in range(levels):
+        if min(depth.shape) < 2 * factor:
+            break
+        depth = downsample(depth, factor)
+        pyramid.append(depth)
+    return pyramid
+
+# Define a function to interpolate values given at knots along an axis
+def interpolate_knots(values, knots, size, axis):
+    """Linearly interpolate values given at knot positions to every position along an axis.
+
+    Args:
+        values (numpy.ndarray): The values at the knots, with len(knots) entries along the axis.
+        knots (numpy.ndarray): The increasing positions of the knots, starting at 0 and ending at size - 1.
+        size (int): The number of positions to interpolate.
+        axis (int): The axis to interpolate along.
+
+    Returns:
+        numpy.ndarray: The interpolated values, with size entries along the axis.
+    """
+
+    # Find the knot interval of every position and the fraction of the way through it
+    positions = np.arange(size)
+    segment = np.clip(np.searchsorted(knots, positions, side="right") - 1, 0, len(knots) - 2)
+    fraction = ((positions - knots[segment]) / (knots[segment + 1] - knots[segment])).astype(np.float32)
+
+    # Blend the values at both ends of every interval
+    shape = [1, 1]
+    shape[axis] = size
+    low = np.take(values, segment, axis=axis)
+    high = np.take(values, segment + 1, axis=axis)
+    return low + (high - low) * fraction.reshape(shape)
+
+# Define a function to get the knots of a quadtree level along an axis
+def level_knots(size, step):
+    """Get the cell boundaries of a quadtree level along an axis.
+
+    Args:
+        size (int): The number of pixels along the axis.
+        step (int): The cell size of the level.
+
+    Returns:
+        numpy.ndarray: The boundaries at every multiple of step, plus the last pixel.
+    """
+
+    # Clip the last cell at the edge of the depth map
+    return np.unique(np.append(np.arange(0, size - 1, step), size - 1))
+
+# Define a function to measure how far every cell of a quadtree level is from a bilinear patch
+def level_errors(depth, row_knots, col_knots):
+    """Measure how far the depth values of every cell of a level are from the bilinear patch through its corners.
+
+    All cells of the level are handled at once: the corner values are
+    interpolated over the whole depth map and the deviation is reduced to its
+    maximum per cell, including the rows and columns shared with neighbours.
+
+    Args:
+        depth (numpy.ndarray): The depth map of shape (height, width).
+        row_knots (numpy.ndarray): The row boundaries of the cells.
+        col_knots (numpy.ndarray): The column boundaries of the cells.
+
+    Returns:
+        numpy.ndarray: The largest deviation of every cell, of shape (len(row_knots) - 1, len(col_knots) - 1).
+    """
+
+    # Interpolate the corner values over the whole depth map, first along rows and then along columns
+    height, width = depth.shape
+    corners = depth[np.ix_(row_knots, col_knots)]
+    patch = interpolate_knots(interpolate_knots(corners, row_knots, height, 0), col_knots, width, 1)
+    error = np.abs(depth - patch)
+
+    # Reduce the deviation to the cell rows, adding the closing row that each cell shares with the next
+    rows = np.maximum(np.maximum.reduceat(error, row_knots[:-1], axis=0), error[row_knots[1:]])
+
+    # Reduce the rows to the cells in the same way along the columns
+    return np.maximum(np.maximum.reduceat(rows, col_knots[:-1], axis=1), rows[:, col_knots[1:]])
+
+# Define a function to list the corners that splitting quadtree cells adds
+def split_corners(rows, cols, row_knots, col_knots, next_rows, next_cols, width):
+    """List the corners that splitting cells of a quadtree level into the cells of the next level adds.
+
+    Args:
+        rows (numpy.ndarray): The row of every cell among the cells of the level.
+        cols (numpy.ndarray): The column of every cell among the cells of the level.
+        row_knots (numpy.ndarray): The row boundaries of the cells of the level.
+        col_knots (numpy.ndarray): The column boundaries of the cells of the level.
+        next_rows (numpy.ndarray): The row boundaries of the cells of the next level.
+        next_cols (numpy.ndarray): The column boundaries of the cells of the next level.
+        width (int): The width of the depth map.
+
+    Returns:
+        numpy.ndarray: The int64 pixel indices of shape (cells, 5) of the middle of the four sides and the
+            center of every cell, with -1 where the next level does not divide the cell along that axis.
+    """
+
+    # Find the first boundary of the next level after the start of every cell, which lies inside when it divides it
+    r0, r1 = row_knots[rows].astype(np.int64), row_knots[rows + 1].astype(np.int64)
+    c0, c1 = col_knots[cols].astype(np.int64), col_knots[cols + 1].astype(np.int64)
+    rm = next_rows[np.searchsorted(next_rows, r0) + 1].astype(np.int64)
+    cm = next_cols[np.searchsorted(next_cols, c0) + 1].astype(np.int64)
+    divided_rows, divided_cols = rm < r1, cm < c1
+
+    # Number the corners in row-major order, leaving out the ones of undivided axes
+    corners = np.stack([rm * width + c0, rm * width + c1, r0 * width + cm, r1 * width + cm, rm * width + cm], axis=1)
+    valid = np.stack([divided_rows, divided_rows, divided_cols, divided_cols, divided_rows & divided_cols], axis=1)
+    return np.where(valid, corners, -1)
+
+# Define a function to split a depth map into a quadtree of nearly planar cells
+def quadtree_cells(depth, tolerance, max_triangles=0):
+    """Split a depth map into a quadtree of cells that each fit a bilinear patch.
+
+    The quadtree is refined one level at a time, with every level handled as
+    whole arrays. Cells are split while they deviate from their bilinear patch
+    by more than the tolerance; with a triangle budget, the worst cells of each
+    level are split first until the budget is spent.
+
+    Every cell becomes a polygon through all the corners on its boundary, so
+    the triangles follow from the corners alone: a mesh of V corners, B of
+    them on the border of the depth map, triangulates into 2V - B - 2
+    triangles. Each new corner costs two triangles, or one on the border.
+
+    Args:
+        depth (numpy.ndarray): The depth map of shape (height, width).
+        tolerance (float): The largest allowed deviation of a cell, in depth units.
+        max_triangles (int): The largest number of triangles of the triangulated polygons, or 0 for no limit.
+
+    Returns:
+        tuple: The int32 array of cells as (r0, r1, c0, c1) rows and the largest remaining deviation.
+    """
+
+    # Start from a single cell covering the whole depth map
+    height, width = depth.shape
+    if height < 2 or width < 2:
+        return np.empty((0, 4), dtype=np.int32), 0.0
+    step = 1 << int(np.ceil(np.log2(max(height, width) - 1)))
+    row_knots, col_knots = level_knots(height, step), level_knots(width, step)
+    active = np.ones((1, 1), dtype=bool)
+    leaves = []
+    max_error = 0.0
+
+    # Start the triangle count from the four corners of the depth map
+    corners = np.array([0, width - 1, (height - 1) * width, height * width - 1], dtype=np.int64)
+    count = 2
+
+    # Define a function to find the corners on the border of the depth map
+    def on_border(pixels):
+        rows, cols = np.divmod(pixels, width)
+        return (rows == 0) | (rows == height - 1) | (cols == 0) | (cols == width - 1)
+
+    # Refine the quadtree one level at a time
+    while True:
+        # Measure every cell of the level and find the ones that can and should be split
+        errors = level_errors(depth, row_knots, col_knots)
+        if step > 1:
+            next_rows, next_cols = level_knots(height, step // 2), level_knots(width, step // 2)
+            # Cells that are not divided by the next level are carried over whole until a finer level divides them
+            divisible = (np.diff(row_knots) > 1)[:, None] | (np.diff(col_knots) > 1)[None, :]
+            split = active & (errors > tolerance) & divisible
+        else:
+            split = np.zeros_like(active)
+
+        # Split only the worst cells when the triangle budget would be exceeded
+        if max_triangles and split.any():
+            candidates = np.flatnonzero(split)
+            order = candidates[np.argsort(-errors.ravel()[candidates], kind="stable")]
+
+            # Charge every split for the corners it adds, counting a corner shared by two splits twice to stay safe
+            added = split_corners(*np.unravel_index(order, split.shape), row_knots, col_knots, next_rows, next_cols,
+                                  width)
+            cost = np.where((added >= 0) & ~np.isin(added, corners), np.where(on_border(added), 1, 2), 0)
+            keep = count + np.cumsum(cost.sum(axis=1)) <= max_triangles
+            split.ravel()[order[~keep]] = False
+
+            # Add the corners of the kept splits and count the triangles exactly, now that shared corners are known
+            added = added[keep]
+            corners = np.union1d(corners, added[added >= 0])
+            count = 2 * len(corners) - int(on_border(corners).sum()) - 2
+
+        # Keep the cells that are not split as leaves
+        leaf_rows, leaf_cols = np.nonzero(active & ~split)
+        leaves.append(np.stack([row_knots[leaf_rows], row_knots[leaf_rows + 1],
+                                col_knots[leaf_cols], col_knots[leaf_cols + 1]], axis=1))
+        if len(leaf_rows):
+            max_error = max(max_error, float(errors[leaf_rows, leaf_cols].max()))
+
+        # Stop when no cell is split, otherwise mark the children of the split cells for the next level
+        if not split.any():
+            break
+        parent_rows = np.searchsorted(row_knots, next_rows[:-1], side="right") - 1
+        parent_cols = np.searchsorted(col_knots, next_cols[:-1], side="right") - 1
+        active = split[np.ix_(parent_rows, parent_cols)]
+        row_knots, col_knots, step = next_rows, next_cols, step // 2
+
+    # Return the leaves and the largest deviation that remains
+    return np.concatenate(leaves).astype(np.int32), max_error
+
+# Define a function to list the pixels along the boundary of cells
+def cell_perimeters(cells):
+    """List the pixels along the boundary of every cell, in the winding order of the grid quads.
+
+    Each boundary starts at (r0, c0) and runs along row r0, up column c1,
+    back along row r1 and down column c0, visiting every pixel once.
+
+    Args:
+        cells (numpy.ndarray): The cells as (r0, r1, c0, c1) rows.
+
+    Returns:
+        tuple: The cell index, row and column of every boundary pixel, grouped by cell.
+    """
+
+    # Get the size of every cell and the length of its boundary
+    r0, r1, c0, c1 = cells.T.astype(np.int64)
+    width, height = c1 - c0, r1 - r0
+    length = 2 * (width + height)
+
+    # Number the boundary pixels of every cell from zero
+    cell = np.repeat(np.arange(len(cells)), length)
+    starts = np.cumsum(length) - length
+    k = np.arange(length.sum()) - starts[cell]
+
+    # Place the pixels on the four sides of the boundary
+    w, h = width[cell], height[cell]
+    sides = [k < w, k < w + h, k < 2 * w + h]
+    rows = np.select(sides, [r0[cell], r0[cell] + k - w, r1[cell]], r1[cell] - (k - 2 * w - h))
+    cols = np.select(sides, [c0[cell] + k, c1[cell], c1[cell] - (k - w - h)], c0[cell])
+
+    # Return the boundary pixels
+    return cell, rows, cols
+
+# Define a function to build an adaptive surface mesh from a quadtree of cells
+def build_adaptive(width, height, depth_map, tolerance, max_triangles=0, depth_scale=DEPTH_SCALE, spacing=1.0):
+    """Build an adaptive surface mesh with large faces in flat regions and full detail at depth edges.
+
+    Every quadtree cell becomes one polygon. Cells next to smaller cells also
+    pass through the corners of those cells on their shared edge, so the
+    surface has no cracks at resolution changes.
+
+    Args:
+        width (int): The width of the image.
+        height (int): The height of the image.
+        depth_map (array-like): The depth map values, flat or of shape (height, width).
+        tolerance (float): The largest allowed vertical error, in surface units.
+        max_triangles (int): The largest number of triangles to emit, or 0 for no limit.
+        depth_scale (float): The factor applied to the depth values.
+        spacing (float): The distance between neighbouring pixels.
+
+    Returns:
+        tuple: The vertex array, the flat face index array, the corner count of every face,
+            and a dictionary with the achieved error and the reduction ratios.
+    """
+
+    # Split the depth map into cells, measuring the error in depth units
+    depth = np.asarray(depth_map, dtype=np.float32).reshape(height, width)
+    cells, max_error = quadtree_cells(depth, tolerance / depth_scale if depth_scale else 0.0, max_triangles)
+    r0, r1, c0, c1 = cells.T
+
+    # Mark the pixels that are a corner of any cell and number them in row-major order
+    used = np.zeros((height, width), dtype=bool)
+    for rows, cols in ((r0, c0), (r0, c1), (r1, c1), (r1, c0)):
+        used[rows, cols] = True
+    index = np.cumsum(used.ravel(), dtype=np.int64).reshape(height, width).astype(np.int32) - 1
+
+    # Build the vertices of the used pixels with the same layout as the full grid
+    rows, cols = np.nonzero(used)
+    vertices = np.empty((len(rows), 3), dtype=np.float32)
+    vertices[:, 0] = (cols - width / 2) * spacing
+    vertices[:, 1] = (rows - height / 2) * spacing
+    vertices[:, 2] = depth[rows, cols] * depth_scale
+
+    # Walk the boundary of every cell and keep the used pixels as its corners
+    cell, rows, cols = cell_perimeters(cells)
+    keep = used[rows, cols]
+    faces = index[rows[keep], cols[keep]]
+    sizes = np.bincount(cell[keep], minlength=len(cells)).astype(np.int32)
+
+    # Compare the result with the full grid
+    grid_faces = (width - 1) * (height - 1)
+    stats = {
+        "max_error": max_error * depth_scale,
+        "vertices": len(vertices),
+        "faces": len(sizes),
+        "triangles": int((sizes - 2).sum()),
+        "vertex_reduction": width * height / max(len(vertices), 1),
+        "face_reduction": grid_faces / max(len(sizes), 1),
+    }
+
+    # Return the mesh arrays and the statistics
+    return vertices, faces, sizes, stats
+
+# Define a function to get the number of faces along each side of a displacement-only plane
+def plane_segments(width, height, cell=PLANE_CELL, max_segments=PLANE_SEGMENTS):
+    """Get the number of faces along each side of the plane built by build_plane.
+
+    Args:
+        width (int): The width of the image.
+        height (int): The height of the image.
+        cell (int): The largest number of pixels along the edge of a face, before the segment limit.
+        max_segments (int): The largest number of faces along each side of the plane.
+
+    Returns:
+        tuple: The number of segments along the x and y axes.
+    """
+
+    # Split each side into segments of at most cell pixels, within the segment limit
+    return (min(max(math.ceil((width - 1) / cell), 1), max_segments),
+            min(max(math.ceil((height - 1) / cell), 1), max_segments))
+
+# Define a function to compute a coarse plane for displacement-only surfaces
+def build_plane(width, height, cell=PLANE_CELL, max_segments=PLANE_SEGMENTS):
+    """Compute a flat plane with UVs that covers the same area as the surface grid.
+
+    The plane carries no relief: the depth comes from material displacement
+    at render time, so its size stays bounded however large the depth map is.
+
+    Args:
+        width (int): The width of the image.
+        height (int): The height of the image.
+        cell (int): The largest number of pixels along the edge of a face, before the segment limit.
+        max_segments (int): The largest number of faces along each side of the plane.
+
+    Returns:
+        tuple: The vertex array, the quad array and the per-loop UV array of shape (faces * 4, 2).
+    """
+
+    # Split each side into segments of at most cell pixels, within the segment limit
+    segments_x, segments_y = plane_segments(width, height, cell, max_segments)
+    cols = np.linspace(0, width - 1, segments_x + 1, dtype=np.float32)
+    rows = np.linspace(0, height - 1, segments_y + 1, dtype=np.float32)
+
+    # Place the vertices where the corner pixels of the grid would be, flat at zero depth
+    vertices = np.zeros((len(rows), len(cols), 3), dtype=np.float32)
+    vertices[..., 0] = cols - width / 2
+    vertices[..., 1] = (rows - height / 2)[:, None]
+    faces = grid_faces(len(cols), len(rows))
+
+    # Map every vertex to the center of its pixel in the image and spread the UVs over the loops
+    uvs = np.empty((len(rows), len(cols), 2), dtype=np.float32)
+    uvs[..., 0] = (cols + 0.5) / width
+    uvs[..., 1] = ((rows + 0.5) / height)[:, None]
+    return vertices.reshape(-1, 3), faces, uvs.reshape(-1, 2)[faces.ravel()]
+
+# Define a function to get the subdivision levels that dice a plane down to single pixels
+def dicing_levels(width, height, cell=PLANE_CELL, max_segments=PLANE_SEGMENTS, downsample=1):
+    """Get the number of subdivision levels that dice the faces of build_plane down to single pixels.
+
+    Args:
+        width (int): The width of the image.
+        height (int): The height of the image.
+        cell (int): The cell size passed to build_plane.
+        max_segments (int): The segment limit passed to build_plane.
+        downsample (int): The number of pixels per micropolygon edge to stop at.
+
+    Returns:
+        int: The number of levels, each halving the edges of the faces.
+    """
+
+    # Find the longest face edge in pixels and halve it until it spans the downsample factor
+    segments_x, segments_y = plane_segments(width, height, cell, max_segments)
+    edge = max((width - 1) / segments_x, (height - 1) / segments_y)
+    return max(math.ceil(math.log2(max(edge / downsample, 1.0))), 0)
+
+# Define a function to estimate the error of a surface diced at a coarser step than the pixels
+def dicing_error(depth, step):
+    """Estimate the largest vertical error of a surface diced into micropolygons of step pixels.
+
+    Displacement samples the depth map at the micropolygon corners and
+    interpolates in between, so the error is the deviation of the depth map
+    from the bilinear patches of a uniform grid with that step.
+
+    Args:
+        depth (numpy.ndarray): The depth map of shape (height, width).
+        step (int): The edge length of the micropolygons, in pixels.
+
+    Returns:
+        float: The largest deviation, in depth units.
+    """
+
+    # Dicing at every pixel reproduces the grid exactly
+    if step <= 1:
+        return 0.0
+
+    # Measure the cells of a uniform grid with the given step
+    height, width = depth.shape
+    return float(level_errors(depth, level_knots(height, step), level_knots(width, step)).max())
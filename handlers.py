@@ -0,0 +1,73 @@
+# Import the necessary modules
+import bpy
+import sys
+
+# Define a function to play back the sequence surfaces of a scene
+@bpy.app.handlers.persistent
+def play_sequences(scene, depsgraph=None):
+    """Show the current frame of every sequence surface, loading the playback code only for scenes that have one.
+
+    Args:
+        scene (bpy.types.Scene): The scene whose frame changed.
+        depsgraph: The dependency graph, passed by newer Blender versions.
+
+    Returns:
+        None.
+    """
+
+    # Return at once for scenes without sequence surfaces, which is every frame change of most files
+    if not scene.get("depthify_sequences"):
+        return
+
+    # Import the depthify module on the first frame that needs it and copy the frame into the surfaces
+    from . import depthify
+    depthify.update_sequence_frames(scene, depsgraph)
+
+# Define a function to drop the surface cache of the previous file
+@bpy.app.handlers.persistent
+def purge_surface_cache(filepath=""):
+    """Drop the cached surfaces, whose templates belonged to the file that was open before.
+
+    Args:
+        filepath (str): The path of the loaded file, passed by newer Blender versions.
+
+    Returns:
+        None.
+    """
+
+    # Nothing is cached before the first build, which is when the depthify module is loaded
+    depthify = sys.modules.get(f"{__package__}.depthify")
+    if depthify is not None:
+        depthify.purge_templates()
+
+# Define a function to register the handlers
+def register():
+    """Register the frame change and file load handlers.
+
+    Returns:
+        None.
+    """
+
+    # Play back sequence surfaces when the frame changes
+    bpy.app.handlers.frame_change_pre.append(play_sequences)
+
+    # Drop the cached surfaces when another file is loaded
+    bpy.app.handlers.load_post.append(purge_surface_cache)
+
+# Define a function to unregister the handlers
+def unregister():
+    """Unregister the handlers, stop any sequence players and remove the cached surfaces.
+
+    Returns:
+        None.
+    """
+
+    # Stop playing back sequence surfaces and purging the surface cache
+    bpy.app.handlers.frame_change_pre.remove(play_sequences)
+    bpy.app.handlers.load_post.remove(purge_surface_cache)
+
+    # Stop the prefetch threads and remove the templates, when a build or playback ever loaded the depthify module
+    depthify = sys.modules.get(f"{__package__}.depthify")
+    if depthify is not None:
+        depthify.close_players()
+        depthify.purge_templates()
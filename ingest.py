@@ -0,0 +1,234 @@
+# Import the necessary modules
+import importlib.util
+import logging
+import os
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+# Define the file extensions that are decoded directly with NumPy
+NUMPY_EXTENSIONS = {".npy"}
+
+# Define the file extensions that are decoded with Pillow when it is installed
+PILLOW_EXTENSIONS = {".png", ".tif", ".tiff"}
+
+# Define a function to normalize integer pixel data to the 0-1 range
+def to_float32(pixels):
+    """Convert pixel data to float32 values in the 0-1 range.
+
+    Args:
+        pixels (numpy.ndarray): The pixel data of any numeric type.
+
+    Returns:
+        numpy.ndarray: The pixel data as float32 values.
+    """
+
+    # Scale integer data by the largest value of its type
+    if np.issubdtype(pixels.dtype, np.integer):
+        return np.multiply(pixels, 1.0 / np.iinfo(pixels.dtype).max, dtype=np.float32)
+
+    # Return float data as float32 without copying when it already is
+    return np.asarray(pixels, dtype=np.float32)
+
+# Define a function to extract the depth channel from an image array
+def depth_channel(pixels, channel=0):
+    """Extract the depth channel from an image array as a strided view.
+
+    Args:
+        pixels (numpy.ndarray): The pixel data of shape (height, width) or (height, width, channels).
+        channel (int): The channel that holds the depth values.
+
+    Returns:
+        numpy.ndarray: A view of shape (height, width) into the pixel data.
+    """
+
+    # Return single channel images unchanged
+    if pixels.ndim == 2:
+        return pixels
+
+    # Return a view onto the requested channel
+    return pixels[..., channel]
+
+# Define a function to read the pixels of a Blender image into a NumPy array
+def read_blender_image(image):
+    """Read the pixels of a Blender image into a preallocated float32 array.
+
+    Args:
+        image (bpy.types.Image): The image data block.
+
+    Returns:
+        numpy.ndarray: The pixel data of shape (height, width, channels), bottom row first.
+    """
+
+    # Get the size and channel count of the image
+    width, height = image.size
+    channels = image.channels
+
+    # Preallocate the buffer and copy the pixels into it in a single call
+    pixels = np.empty(width * height * channels, dtype=np.float32)
+    image.pixels.foreach_get(pixels)
+
+    # Return the buffer shaped as rows of pixels
+    return pixels.reshape(height, width, channels)
+
+# Define a function to decode an image file with NumPy
+def read_numpy_file(path):
+    """Decode a .npy depth file as a memory-mapped array.
+
+    Args:
+        path (str): The path of the .npy file.
+
+    Returns:
+        numpy.ndarray: The pixel data, bottom row first.
+    """
+
+    # Memory-map the array so that the file is only paged in on access
+    return np.load(path, mmap_mode="r")
+
+# Define a function to decode an image file with Pillow
+def read_pillow_file(path):
+    """Decode a PNG or TIFF file with Pillow, keeping 16-bit precision.
+
+    Args:
+        path (str): The path of the image file.
+
+    Returns:
+        numpy.ndarray: The pixel data, bottom row first.
+    """
+
+    # Import Pillow lazily since it is an optional dependency
+    from PIL import Image
+
+    # Decode the file into an array of its native integer type
+    with Image.open(path) as image:
+        pixels = np.asarray(image)
+
+    # Flip the rows with a view to match the bottom-up order of Blender images
+    return pixels[::-1]
+
+# Define a function to decode an image file with Blender
+def read_blender_file(path):
+    """Decode an image file with Blender's image loader.
+
+    Args:
+        path (str): The path of the image file.
+
+    Returns:
+        numpy.ndarray: The pixel data, bottom row first.
+    """
+
+    # Import bpy lazily so that the module can be used outside of Blender
+    import bpy
+
+    # Load the image, reusing an existing data block for the same file
+    image = bpy.data.images.load(path, check_existing=True)
+
+    # Read the pixels in bulk
+    return read_blender_image(image)
+
+# Define a function to check whether an image file can only be decoded by Blender
+def needs_blender(path):
+    """Check whether an image file can only be decoded by Blender, which must happen on the main thread.
+
+    Args:
+        path (str): The path of the image file.
+
+    Returns:
+        bool: Whether read_file would fall back to Blender's image loader.
+    """
+
+    # NumPy files never need Blender
+    extension = os.path.splitext(path)[1].lower()
+    if extension in NUMPY_EXTENSIONS:
+        return False
+
+    # Pillow formats only need Blender when Pillow is not installed, which is checked without importing it
+    if extension in PILLOW_EXTENSIONS:
+        return importlib.util.find_spec("PIL") is None
+
+    # Everything else is decoded by Blender
+    return True
+
+# Define a function to decode an image file with the fastest available decoder
+def read_file(path):
+    """Decode an image file with the fastest available decoder.
+
+    Args:
+        path (str): The path of the image file.
+
+    Returns:
+        tuple: The pixel data and the name of the decoder that was used.
+    """
+
+    # Get the lowercase extension of the file
+    extension = os.path.splitext(path)[1].lower()
+
+    # Memory-map NumPy files directly
+    if extension in NUMPY_EXTENSIONS:
+        return read_numpy_file(path), "numpy"
+
+    # Try Pillow for formats it decodes at full bit depth
+    if extension in PILLOW_EXTENSIONS:
+        try:
+            return read_pillow_file(path), "pillow"
+        except ImportError:
+            logging.debug("Pillow is not available, falling back to Blender")
+
+    # Fall back to Blender's image loader for everything else, such as EXR
+    return read_blender_file(path), "blender"
+
+# Define a function to load the depth map of an image file
+def load_depth(path, channel=0, trace=False):
+    """Load the depth map of an image file and report the cost of doing so.
+
+    Tracing allocations slows decoding several times over and is global to
+    the process, so it only happens when asked for and on the main thread,
+    where no other load can start, stop or reset it.
+
+    Args:
+        path (str): The path of the image file.
+        channel (int): The channel that holds the depth values.
+        trace (bool): Whether to record the peak of traced allocations.
+
+    Returns:
+        tuple: The float32 depth map of shape (height, width), bottom row first,
+            and a dictionary with the decoder, size, elapsed seconds and peak bytes, which are None without tracing.
+    """
+
+    # Trace allocations when asked to on the main thread, unless another caller is already tracing them
+    trace = trace and threading.current_thread() is threading.main_thread()
+    tracing = tracemalloc.is_tracing()
+    if trace and not tracing:
+        tracemalloc.start()
+    elif trace and hasattr(tracemalloc, "reset_peak"):
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+
+    try:
+        # Decode the file and take a view of its depth channel
+        pixels, decoder = read_file(path)
+        depth = to_float32(depth_channel(pixels, channel))
+    finally:
+        # Record the elapsed time and the allocation peak
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if trace else None
+        if trace and not tracing:
+            tracemalloc.stop()
+
+    # Collect the statistics of the ingestion
+    stats = {
+        "decoder": decoder,
+        "width": depth.shape[1],
+        "height": depth.shape[0],
+        "seconds": elapsed,
+        "peak_bytes": peak,
+    }
+
+    # Log the statistics to the console
+    logging.info(f"Loaded depth map {path} with {decoder}: {depth.shape[1]}x{depth.shape[0]} in {elapsed:.3f}s"
+                 + (f", peak {peak / 2**20:.1f} MiB" if peak is not None else ""))
+
+    # Return the depth map and the statistics
+    return depth, stats
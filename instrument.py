@@ -0,0 +1,233 @@
+# Import the necessary modules
+import cProfile
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+
+# Define the logger that receives one JSON line per stage and per build
+logger = logging.getLogger("depthify.instrument")
+
+# Define the number of functions kept from the profile of a stage
+PROFILE_FUNCTIONS = 15
+
+# Define the recorder of the most recent build, shown in the panel
+latest = None
+
+# Define a function to summarize a profile into its most expensive functions
+def profile_summary(profiler, limit=PROFILE_FUNCTIONS):
+    """Summarize a profile into the functions with the largest cumulative time.
+
+    Args:
+        profiler (cProfile.Profile): The stopped profiler.
+        limit (int): The number of functions to keep.
+
+    Returns:
+        list: A dictionary with the location, call count, own time and cumulative time of each function.
+    """
+
+    # Sort the profiled functions by cumulative time
+    stats = pstats.Stats(profiler)
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+
+    # Describe every function by its file, line and name
+    return [{
+        "function": f"{os.path.basename(filename)}:{line}({name})",
+        "calls": calls,
+        "own_seconds": round(own, 6),
+        "seconds": round(cumulative, 6),
+    } for (filename, line, name), (_, calls, own, cumulative, _) in rows]
+
+# Define a recorder for the stages of a build
+class BuildRecorder:
+    """Record the time, peak memory and element counts of every stage of a build."""
+
+    # Define a function to initialize the recorder
+    def __init__(self, name="surface", profile=(), profile_dir=None, trace_memory=True):
+        """Initialize the recorder.
+
+        Args:
+            name (str): The kind of build, written to every log line.
+            profile (iterable): The names of the stages to run under cProfile, or 'ALL' for every stage.
+            profile_dir (str): The directory to write the .prof file of every profiled stage to, or None.
+            trace_memory (bool): Whether to record the peak of traced allocations of every stage.
+        """
+
+        # Store the settings of the recorder
+        self.name = name
+        self.profile = {profile} if isinstance(profile, str) else set(profile)
+        self.profile_dir = profile_dir
+        self.trace_memory = trace_memory
+
+        # Identify the build in the log lines
+        self.build_id = uuid.uuid4().hex[:12]
+        self.started = time.time()
+        self.stages = []
+        self.status = None
+
+        # Serialize stages that finish on worker threads
+        self.lock = threading.Lock()
+
+    # Define a function to check whether a stage is profiled
+    def profiled(self, stage):
+        return "ALL" in self.profile or stage in self.profile
+
+    # Define a function to record a stage
+    @contextmanager
+    def stage(self, stage, **counts):
+        """Record the stage run inside the with block.
+
+        The yielded dictionary holds the record of the stage, so that the
+        block can add the number of pixels, vertices or faces it handled.
+
+        Args:
+            stage (str): The name of the stage.
+            **counts: Element counts known before the stage runs.
+
+        Yields:
+            dict: The record of the stage.
+        """
+
+        # Start tracing allocations, or restart the peak when a caller already traces them
+        record = {"stage": stage, **counts}
+        tracing = tracemalloc.is_tracing()
+        if self.trace_memory:
+            if not tracing:
+                tracemalloc.start()
+            elif hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+
+        # Profile the stage on the thread that runs it
+        profiler = cProfile.Profile() if self.profiled(stage) else None
+        if profiler is not None:
+            profiler.enable()
+        start = time.perf_counter()
+
+        try:
+            yield record
+        except BaseException as e:
+            # Record the failure and let it propagate
+            record["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            # Record the elapsed time and the allocation peak
+            record["seconds"] = time.perf_counter() - start
+            if self.trace_memory:
+                record["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+                if not tracing:
+                    tracemalloc.stop()
+
+            # Keep the most expensive functions and write the full profile when asked to
+            if profiler is not None:
+                profiler.disable()
+                record["profile"] = profile_summary(profiler)
+                if self.profile_dir:
+                    os.makedirs(self.profile_dir, exist_ok=True)
+                    path = os.path.join(self.profile_dir, f"{self.build_id}-{stage.lower()}.prof")
+                    profiler.dump_stats(path)
+                    record["profile_path"] = path
+
+            # Add the record in the order the stages finish
+            with self.lock:
+                self.stages.append(record)
+
+    # Define a function to run a function as a stage
+    def run(self, stage, function, *args, **kwargs):
+        """Run a function as a stage, for example on a worker thread.
+
+        Args:
+            stage (str): The name of the stage.
+            function (callable): The function to run.
+            *args: The positional arguments of the function.
+            **kwargs: The keyword arguments of the function.
+
+        Returns:
+            The result of the function.
+        """
+
+        # Record the call as a stage
+        with self.stage(stage):
+            return function(*args, **kwargs)
+
+    # Define a function to add element counts to a finished stage
+    def count(self, stage, **counts):
+        """Add element counts to the latest record of a stage.
+
+        Args:
+            stage (str): The name of the stage.
+            **counts: The counts to add, such as pixels, vertices or faces.
+
+        Returns:
+            None.
+        """
+
+        # Update the latest record with the given name
+        with self.lock:
+            for record in reversed(self.stages):
+                if record["stage"] == stage:
+                    record.update(counts)
+                    return
+
+    # Define a function to get the total time of the recorded stages
+    def total_seconds(self):
+        return sum(record["seconds"] for record in self.stages)
+
+    # Define a function to finish the build and write its log lines
+    def finish(self, status):
+        """Finish the build, write one JSON log line per stage and one for the build.
+
+        Args:
+            status (str): The outcome of the build, such as 'FINISHED' or 'CANCELLED'.
+
+        Returns:
+            None.
+        """
+
+        # Finish a build only once
+        global latest
+        if self.status is not None:
+            return
+        self.status = status
+        latest = self
+
+        # Write the stages first, so that a slow build can be traced to the stage that regressed
+        for record in self.stages:
+            logger.info(json.dumps({"event": "depthify.stage", "build": self.build_id, "name": self.name, **record},
+                                   default=str))
+
+        # Write the summary of the build
+        logger.info(json.dumps({
+            "event": "depthify.build",
+            "build": self.build_id,
+            "name": self.name,
+            "status": status,
+            "started": self.started,
+            "seconds": self.total_seconds(),
+            "peak_bytes": max((record.get("peak_bytes", 0) for record in self.stages), default=0),
+            "stages": [record["stage"] for record in self.stages],
+        }, default=str))
+
+    # Define a function to describe every stage in one line of text
+    def summary(self):
+        """Describe every recorded stage in one line of text.
+
+        Returns:
+            list: A line with the time, peak memory and counts of every stage.
+        """
+
+        # Format the measurements of every stage
+        lines = []
+        for record in self.stages:
+            text = f"{record['stage'].title()}: {record['seconds'] * 1000:.0f} ms"
+            if "peak_bytes" in record:
+                text += f", {record['peak_bytes'] / 2**20:.1f} MiB"
+            for key in ("pixels", "vertices", "faces"):
+                if key in record:
+                    text += f", {record[key]:,} {key}"
+            lines.append(text)
+        return lines
@@ -0,0 +1,263 @@
+# Import the necessary modules
+import bpy
+import math
+
+# Define how often the levels of detail follow the viewport, in seconds
+UPDATE_INTERVAL = 0.5
+
+# Define the levels of detail to restore after a render, by object name
+render_levels = {}
+
+# Define a function to attach levels of detail to a surface object
+def attach_lods(obj, meshes, distance):
+    """Attach levels of detail to a surface object and show its coarsest level as a proxy.
+
+    The object references every mesh, so the levels that are not shown stay
+    alive without fake users and are released together with the object.
+
+    Args:
+        obj (bpy.types.Object): The surface object.
+        meshes (list): The meshes from the full level to the coarsest one.
+        distance (float): The viewport distance below which the full level is shown.
+
+    Returns:
+        None.
+    """
+
+    # Record the meshes and the switching distance on the object, referencing the meshes to keep them alive
+    obj["depthify_lods"] = [mesh.name for mesh in meshes]
+    obj["depthify_lod_meshes"] = {str(level): mesh for level, mesh in enumerate(meshes)}
+    obj["depthify_lod_distance"] = distance
+
+    # Show the coarsest level until the viewport comes close, following the viewports from now on
+    obj["depthify_lod"] = 0
+    set_lod(obj, len(meshes) - 1)
+    start_updates()
+
+# Define a function to get the level of detail for a viewing distance
+def lod_for_distance(distance, threshold, levels):
+    """Get the level of detail for a viewing distance.
+
+    The full level is used below the threshold, and every doubling of the
+    distance beyond it moves one level coarser, as with mipmaps.
+
+    Args:
+        distance (float): The distance from the viewer to the surface.
+        threshold (float): The distance below which the full level is used.
+        levels (int): The number of levels, including the full one.
+
+    Returns:
+        int: The index of the level, 0 for the full level.
+    """
+
+    # Use the full level when close or when no threshold is set
+    if threshold <= 0 or distance <= threshold:
+        return 0
+
+    # Move one level coarser for every doubling of the distance
+    return min(1 + int(math.log2(distance / threshold)), levels - 1)
+
+# Define a function to show a level of detail on a surface object
+def set_lod(obj, level):
+    """Show a level of detail on a surface object by swapping its mesh.
+
+    Args:
+        obj (bpy.types.Object): The surface object with levels of detail.
+        level (int): The index of the level, 0 for the full level.
+
+    Returns:
+        bool: Whether the mesh was swapped.
+    """
+
+    # Get the mesh of the level, which the user may have removed
+    if obj.get("depthify_lod") == level and obj.data.name == obj["depthify_lods"][level]:
+        return False
+    mesh = bpy.data.meshes.get(obj["depthify_lods"][level])
+    if mesh is None:
+        return False
+
+    # Carry the materials over, since they are stored on the mesh
+    if not mesh.materials:
+        for material in obj.data.materials:
+            mesh.materials.append(material)
+
+    # Swap the mesh and remember the level
+    obj.data = mesh
+    obj["depthify_lod"] = level
+    return True
+
+# Define a function to get the meshes of every level of detail of a surface object
+def lod_meshes(obj):
+    """Get the meshes of every level of detail of a surface object.
+
+    Args:
+        obj (bpy.types.Object): The surface object.
+
+    Returns:
+        list: The meshes that still exist, from the full level to the coarsest one.
+    """
+
+    # Look the meshes up by name, skipping the ones the user removed
+    meshes = [bpy.data.meshes.get(name) for name in obj.get("depthify_lods", [])]
+    return [mesh for mesh in meshes if mesh is not None]
+
+# Define a function to find the surface objects with levels of detail
+def lod_objects(scene):
+    return [obj for obj in scene.objects if "depthify_lods" in obj and obj.type == 'MESH']
+
+# Define a function to check whether any surface object of the file has levels of detail
+def has_lods():
+    return any("depthify_lods" in obj for obj in bpy.data.objects)
+
+# Define a function to get the positions of the viewers of the 3D viewports
+def viewer_positions():
+    """Get the positions of the viewers of every 3D viewport.
+
+    Returns:
+        list: The world space positions of the viewport eyes.
+    """
+
+    # Invert the view matrix of every 3D viewport to find where it looks from
+    positions = []
+    for window in bpy.context.window_manager.windows:
+        for area in window.screen.areas:
+            if area.type == 'VIEW_3D':
+                positions.append(area.spaces.active.region_3d.view_matrix.inverted().translation)
+    return positions
+
+# Define a function to switch the levels of detail to follow the viewports
+def update_lods():
+    """Switch the surface objects to the level of detail matching their distance to the nearest viewport.
+
+    Returns:
+        float: The number of seconds until the next update, or None to stop once no surface has levels of detail.
+    """
+
+    # Stop the timer when the last surface with levels of detail is gone, until attach_lods starts it again
+    if not has_lods():
+        return None
+
+    # Leave the full levels in place while a render runs
+    if render_levels:
+        return UPDATE_INTERVAL
+
+    # Measure the distance from the nearest viewport to the bounds of every surface
+    positions = viewer_positions()
+    if not positions:
+        return UPDATE_INTERVAL
+    for obj in lod_objects(bpy.context.scene):
+        center = obj.matrix_world.translation
+        radius = obj.dimensions.length / 2
+        distance = max(min((position - center).length for position in positions) - radius, 0.0)
+
+        # Show the level matching the distance
+        levels = len(obj["depthify_lods"])
+        set_lod(obj, lod_for_distance(distance, obj["depthify_lod_distance"], levels))
+
+    # Run again after the interval
+    return UPDATE_INTERVAL
+
+# Define a function to start following the viewports
+def start_updates():
+    """Start the viewport timer of the levels of detail unless it is already running.
+
+    Returns:
+        None.
+    """
+
+    # Follow the viewports on a timer, since navigating does not trigger any handler
+    if not bpy.app.timers.is_registered(update_lods):
+        bpy.app.timers.register(update_lods, first_interval=UPDATE_INTERVAL)
+
+# Define a function to follow the viewports in a loaded file
+@bpy.app.handlers.persistent
+def resume_updates(filepath=""):
+    """Start the viewport timer when the loaded file has surface objects with levels of detail.
+
+    Args:
+        filepath (str): The path of the loaded file, passed by newer Blender versions.
+
+    Returns:
+        None.
+    """
+
+    # Leave the timer stopped for the files without levels of detail
+    if has_lods():
+        start_updates()
+
+# Define a function to show the full levels for a final render
+@bpy.app.handlers.persistent
+def use_full_lods(scene, depsgraph=None):
+    """Show the full level of every surface object before a render and remember the shown levels.
+
+    This runs before every frame is evaluated for the render, so the render
+    depsgraph is built from the full meshes rather than from the proxies.
+
+    Args:
+        scene (bpy.types.Scene): The scene being rendered.
+        depsgraph: The dependency graph, passed by newer Blender versions.
+
+    Returns:
+        None.
+    """
+
+    # Swap in the full meshes and remember which levels to restore, keeping the levels of the first frame
+    for obj in lod_objects(scene):
+        render_levels.setdefault(obj.name, obj.get("depthify_lod", 0))
+        set_lod(obj, 0)
+
+# Define a function to restore the levels shown before a render
+@bpy.app.handlers.persistent
+def restore_lods(scene, depsgraph=None):
+    """Restore the levels of detail shown before a render.
+
+    Args:
+        scene (bpy.types.Scene): The scene that was rendered.
+        depsgraph: The dependency graph, passed by newer Blender versions.
+
+    Returns:
+        None.
+    """
+
+    # Swap the proxies back in
+    for name, level in render_levels.items():
+        obj = scene.objects.get(name)
+        if obj is not None:
+            set_lod(obj, level)
+    render_levels.clear()
+
+# Define a function to register the level of detail handlers
+def register():
+    """Register the render handlers and the file load handler that starts the viewport timer.
+
+    The timer itself only runs while surfaces with levels of detail exist.
+
+    Returns:
+        None.
+    """
+
+    # Show the full levels while rendering
+    bpy.app.handlers.render_pre.append(use_full_lods)
+    bpy.app.handlers.render_complete.append(restore_lods)
+    bpy.app.handlers.render_cancel.append(restore_lods)
+
+    # Follow the viewports in loaded files that have levels of detail
+    bpy.app.handlers.load_post.append(resume_updates)
+
+# Define a function to unregister the level of detail handlers
+def unregister():
+    """Unregister the render and file load handlers and stop the viewport timer.
+
+    Returns:
+        None.
+    """
+
+    # Stop following the viewports
+    bpy.app.handlers.load_post.remove(resume_updates)
+    if bpy.app.timers.is_registered(update_lods):
+        bpy.app.timers.unregister(update_lods)
+
+    # Remove the render handlers
+    bpy.app.handlers.render_cancel.remove(restore_lods)
+    bpy.app.handlers.render_complete.remove(restore_lods)
+    bpy.app.handlers.render_pre.remove(use_full_lods)
@@ -0,0 +1,204 @@
+# Import the necessary modules
+import bpy
+import os
+
+# Define the names of the registered materials by key
+registered_materials = {}
+
+# Define a function to get the shared image datablock of a depth map
+def get_image(path):
+    """Get the image datablock of a depth map, loading it only once per file version.
+
+    An image that is already loaded from the same file is reused, and
+    reloaded in place when the file has changed on disk since it was loaded.
+
+    Args:
+        path (str): The path of the image file.
+
+    Returns:
+        bpy.types.Image: The shared image datablock.
+    """
+
+    # Reuse any image loaded from the same absolute path
+    path = os.path.abspath(bpy.path.abspath(path))
+    image = bpy.data.images.load(path, check_existing=True)
+
+    # Reload the pixels when the file changed since they were loaded, keyed by modification time
+    mtime = str(os.stat(path).st_mtime_ns)
+    if image.get("depthify_mtime") not in (None, mtime):
+        image.reload()
+    image["depthify_mtime"] = mtime
+
+    # Return the shared image
+    return image
+
+# Define a function to build the key of a material
+def material_key(image, displacement_strength, displacement_method, midlevel, interpolation):
+    """Build the key that identifies a shared displacement material.
+
+    Args:
+        image (bpy.types.Image): The depth map image.
+        displacement_strength (float): The scale of the displacement.
+        displacement_method (str): The displacement method of the material.
+        midlevel (float): The depth value that is not displaced.
+        interpolation (str): The interpolation of the depth map texture.
+
+    Returns:
+        str: The key of the material.
+    """
+
+    # Round the floats so that slider noise does not create new materials
+    path = os.path.abspath(bpy.path.abspath(image.filepath))
+    return f"{path}|{round(displacement_strength, 6)}|{displacement_method}|{round(midlevel, 6)}|{interpolation}"
+
+# Define a function to build the node tree of a displacement material
+def build_material(name, image, displacement_strength, displacement_method, midlevel, interpolation):
+    """Create a material that displaces a surface by a depth map image.
+
+    Args:
+        name (str): The name of the material.
+        image (bpy.types.Image): The depth map image.
+        displacement_strength (float): The scale of the displacement.
+        displacement_method (str): The displacement method of the material.
+        midlevel (float): The depth value that is not displaced.
+        interpolation (str): The interpolation of the depth map texture.
+
+    Returns:
+        bpy.types.Material: The new material.
+    """
+
+    # Create a new material with a node tree
+    material = bpy.data.materials.new(name)
+    material.use_nodes = True
+
+    # Get the material nodes and links
+    nodes = material.node_tree.nodes
+    links = material.node_tree.links
+
+    # Get the output node and the principled BSDF node
+    output_node = nodes.get("Material Output")
+    principled_node = nodes.get("Principled BSDF")
+
+    # Create a new image texture node for the depth map image
+    image_node = nodes.new("ShaderNodeTexImage")
+
+    # Set the image node properties
+    image_node.image = image
+    image_node.interpolation = interpolation
+    image_node.extension = 'EXTEND'
+    image.colorspace_settings.name = 'Non-Color'
+
+    # Create a new displacement node for the displacement output
+    displacement_node = nodes.new("ShaderNodeDisplacement")
+
+    # Set the displacement node properties
+    displacement_node.inputs['Scale'].default_value = displacement_strength
+    displacement_node.inputs['Midlevel'].default_value = midlevel
+
+    # Link the image node to the principled node and the displacement node
+    links.new(image_node.outputs['Color'], principled_node.inputs['Base Color'])
+    links.new(image_node.outputs['Color'], displacement_node.inputs['Height'])
+
+    # Link the displacement node to the output node
+    links.new(displacement_node.outputs['Displacement'], output_node.inputs['Displacement'])
+
+    # Set the displacement method for the material, which moved out of the Cycles settings in newer Blender
+    if hasattr(material, "displacement_method"):
+        material.displacement_method = displacement_method
+    else:
+        material.cycles.displacement_method = displacement_method
+
+    # Return the material
+    return material
+
+# Define a function to get the shared material for a combination of settings
+def get_material(image, displacement_strength, displacement_method, midlevel=0.5, interpolation='Closest'):
+    """Get the shared displacement material for an image and displacement settings, creating it once.
+
+    Args:
+        image (bpy.types.Image): The depth map image.
+        displacement_strength (float): The scale of the displacement.
+        displacement_method (str): The displacement method of the material.
+        midlevel (float): The depth value that is not displaced.
+        interpolation (str): The interpolation of the depth map texture.
+
+    Returns:
+        bpy.types.Material: The shared material.
+    """
+
+    # Look up the material registered under the key, which may have been removed by the user
+    key = material_key(image, displacement_strength, displacement_method, midlevel, interpolation)
+    material = bpy.data.materials.get(registered_materials.get(key, ""))
+    if material is not None and material.get("depthify_key") == key:
+        return material
+
+    # Find a material with the key saved in the file, as after reopening it
+    material = next((material for material in bpy.data.materials if material.get("depthify_key") == key), None)
+
+    # Create the material when none matches
+    if material is None:
+        material = build_material("Surface", image, displacement_strength, displacement_method, midlevel, interpolation)
+        material["depthify_key"] = key
+
+    # Register the material and return it
+    registered_materials[key] = material.name
+    return material
+
+# Define a function to remove the materials and images no surface uses any more
+def collect_orphans():
+    """Remove the Depthify materials and depth map images that no longer have any users.
+
+    Images loaded more than once from the same file by earlier versions are
+    removed as well once nothing uses them.
+
+    Returns:
+        tuple: The number of removed materials and images.
+    """
+
+    # Remove the unused materials created for surfaces
+    removed_materials = 0
+    for material in [material for material in bpy.data.materials if "depthify_key" in material]:
+        if material.users == 0:
+            registered_materials.pop(material["depthify_key"], None)
+            bpy.data.materials.remove(material)
+            removed_materials += 1
+
+    # Collect the files of the registered depth map images
+    paths = {os.path.abspath(bpy.path.abspath(image.filepath)) for image in bpy.data.images
+             if "depthify_mtime" in image}
+
+    # Remove the unused images of those files, including duplicates without the registry tag
+    removed_images = 0
+    for image in list(bpy.data.images):
+        if image.users == 0 and image.filepath and os.path.abspath(bpy.path.abspath(image.filepath)) in paths:
+            bpy.data.images.remove(image)
+            removed_images += 1
+
+    # Return the counts
+    return removed_materials, removed_images
+
+# Define a function to change the displacement scale of a material in place
+def set_displacement_strength(material, displacement_strength):
+    """Change the displacement scale of a registered material in place and update its key.
+
+    Only use this on a material that a single surface uses, since every
+    user of the material sees the change.
+
+    Args:
+        material (bpy.types.Material): The material created by get_material.
+        displacement_strength (float): The new scale of the displacement.
+
+    Returns:
+        None.
+    """
+
+    # Set the scale input of the displacement node
+    for node in material.node_tree.nodes:
+        if node.type == 'DISPLACEMENT':
+            node.inputs['Scale'].default_value = displacement_strength
+
+    # Replace the strength in the key, which ends with the strength, method, midlevel and interpolation
+    path, _, method, midlevel, interpolation = material["depthify_key"].rsplit("|", 4)
+    registered_materials.pop(material["depthify_key"], None)
+    material["depthify_key"] = f"{path}|{round(displacement_strength, 6)}|{method}|{midlevel}|{interpolation}"
+    registered_materials[material["depthify_key"]] = material.name
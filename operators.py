@@ -1,17 +1,70 @@
 # Import the necessary modules
 import bpy
 import logging
+import math
 import os
-
-# Import the mathutils module for math operations
-from mathutils import Vector
-
-# Import the imbuf module for image processing
-from imbuf import load as imbuf_load
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor
 
 # Import the translation function
 from bpy.app.translations import pgettext_iface as iface_
 
+# Define the modules that build the surface, imported on the first build so that enabling the add-on stays fast
+batch = builder = cache = depthify = ingest = instrument = materials = planner = preprocess = sequence = storage = tiles = None
+
+# Define a function to import the modules that build the surface
+def import_pipeline():
+    """Import the modules that build the surface, together with NumPy and the image decoders they use.
+
+    Returns:
+        None.
+    """
+
+    # Bind the modules to the names used by the operators, which is free after the first call
+    global batch, builder, cache, depthify, ingest, instrument, materials, planner, preprocess, sequence, storage, tiles
+    from . import batch, builder, cache, depthify, ingest, instrument, materials, planner, preprocess, sequence, storage, tiles
+
+# Define a function to copy the preprocessing settings into plain values that worker threads can read
+def read_filters(props):
+    return {
+        "fill_holes": props.fill_holes,
+        "denoise": props.denoise,
+        "denoise_radius": props.denoise_radius,
+        "denoise_range": props.denoise_range,
+        "normalize": props.normalize_depth,
+        "normalize_clip": props.normalize_clip,
+        "conversion": props.depth_conversion,
+        "gamma": props.depth_gamma,
+        "encoding": props.depth_encoding.lower(),
+        "compress": props.compress_depth,
+    }
+
+# Define a function to copy the geometry settings into plain values that worker threads can read
+def read_settings(props):
+    return {
+        "depth_scale": props.depth_scale,
+        "downsample": props.downsample,
+        "geometry_mode": props.geometry_mode,
+        "error_tolerance": props.error_tolerance,
+        "triangle_budget": props.triangle_budget,
+        "workers": props.workers,
+        "lod_levels": props.lod_levels if props.use_lod else 0,
+    }
+
+# Define a function to fit the geometry settings of a build into the memory and face budgets
+def plan_build(props, shape, fixed_downsample=False):
+    # Choose the downsample factor and subdivision levels using planner module and show the plan in the panel
+    plan = planner.plan_build(shape, read_settings(props), props.subdivisions, props.memory_budget * 2**20,
+                              props.face_budget, fixed_downsample)
+    props.build_plan = plan["message"]
+
+    # Log the plan, as a warning when the settings were reduced or the budgets cannot be kept
+    if plan["reduced"] or not plan["fits"]:
+        logging.warning(f"Depthify build plan: {plan['message']}")
+    else:
+        logging.info(f"Depthify build plan: {plan['message']}")
+    return plan
+
 # Define a custom operator class for creating a surface object from an image file
 class DepthifyCreateSurfaceOperator(bpy.types.Operator):
     """Create a 3D surface from a depth map image"""
@@ -21,12 +74,17 @@ class DepthifyCreateSurfaceOperator(bpy.types.Operator):
     bl_label = iface_("Create Surface")
     bl_options = {'REGISTER', 'UNDO'}
 
-    # Define a function to execute the operator
-    def execute(self, context):
-        # Get the current scene and its properties
-        scene = context.scene
-        props = scene.depthify_properties
+    # Define the stages of a build and their share of the progress bar
+    stages = (
+        ('LOAD', iface_("Loading depth map"), 0.2),
+        ('BUILD', iface_("Building geometry"), 0.5),
+        ('UPLOAD', iface_("Uploading mesh"), 0.15),
+        ('MODIFIERS', iface_("Adding modifiers"), 0.05),
+        ('MATERIAL', iface_("Creating material"), 0.1),
+    )
 
+    # Define a function to get the validated absolute path of the image file
+    def resolve_image_file(self, props):
         # Get the image file path from the image property
         image_file = props.image
 
@@ -35,7 +93,7 @@ class DepthifyCreateSurfaceOperator(bpy.types.Operator):
             # Log an error message to the console and the UI
             logging.error("No image file selected")
             self.report({'ERROR'}, "No image file selected")
-            return {'CANCELLED'}
+            return None
 
         # Get the absolute path of the image file
         try:
@@ -44,93 +102,800 @@ class DepthifyCreateSurfaceOperator(bpy.types.Operator):
             # Log an error message to the console and the UI
             logging.error(f"Invalid image file path: {e}")
             self.report({'ERROR'}, f"Invalid image file path: {e}")
-            return {'CANCELLED'}
+            return None
 
         # Check if the image file exists and is readable
         if not os.path.exists(image_file) or not os.access(image_file, os.R_OK):
             # Log an error message to the console and the UI
             logging.error(f"Image file not found or not readable: {image_file}")
             self.report({'ERROR'}, f"Image file not found or not readable: {image_file}")
+            return None
+
+        # Return the absolute path
+        return image_file
+
+    # Define a function to start recording the stages of a build
+    def start_recording(self, props, name="surface"):
+        # Profile the chosen stages and keep their .prof files next to the depth map cache
+        profile = () if props.profile_stage == 'NONE' else (props.profile_stage,)
+        profile_dir = os.path.join(storage.default_cache_dir(), "profiles")
+        self.recorder = instrument.BuildRecorder(name, profile, profile_dir, props.trace_memory)
+
+    # Define a function to record the number of pixels of a loaded depth map
+    def count_pixels(self, depth_map, record):
+        self.recorder.count('LOAD', pixels=int(depth_map.size), decoded="stats" in record,
+                            filters=record.get("timings", []))
+
+    # Define a function to record the number of vertices and faces of the built arrays
+    def count_elements(self, stage, arrays):
+        faces = arrays["faces"] if arrays["face_sizes"] is None else arrays["face_sizes"]
+        self.recorder.count(stage, vertices=len(arrays["vertices"]), faces=len(faces))
+
+    # Define a function to fit the build into the budgets before any geometry is built
+    def fit_budget(self, props, shape):
+        # Plan the build and warn in the UI when the resolution or subdivisions were reduced
+        self.plan = plan_build(props, shape)
+        if self.plan["reduced"] or not self.plan["fits"]:
+            self.report({'WARNING'}, self.plan["message"])
+        self.recorder.count('LOAD', planned_faces=self.plan["estimate"]["evaluated_faces"],
+                            planned_bytes=self.plan["estimate"]["bytes"])
+
+    # Define a function to store the loaded depth map reference and look up a cached surface
+    def use_depth_map(self, props, record):
+        # Store the reference and hash of the cached depth map in the scene
+        props.depth_map_ref = record["key"]
+        props.depth_map_hash = record["hash"]
+
+        # Build the cache key from the depth map content and the geometry parameters
+        self.key = cache.surface_key(record["hash"], self.plan["subdivisions"], props.subdivision_type,
+                                     props.depth_scale, self.plan["settings"]["downsample"],
+                                     props.geometry_mode, props.error_tolerance, props.triangle_budget,
+                                     props.lod_levels if props.use_lod else 0, props.lod_distance)
+
+        # Reuse a cached surface object, or share its mesh, when the image and geometry parameters are unchanged
+        with self.recorder.stage('CACHE') as stage:
+            surface = depthify.get_cached_surface(self.key, props.share_meshes)
+            stage["hit"] = surface is not None
+            stage["linked"] = surface is not None and props.share_meshes
+
+        # Give the reused surface the current scale, which is set per object
+        if surface is not None:
+            depthify.scale_surface(surface, props.scale)
+        return surface
+
+    # Define a function to update only the edited blocks of the current surface when only its depth values changed
+    def patch_surface(self, props, depth_map, record, image_file):
+        # Only patch a linked grid surface built with the same settings from another version of the same image
+        surface = props.surface
+        if (surface is None or surface.type != 'MESH' or props.geometry_mode != 'GRID'
+                or surface.get("depthify_image") != image_file
+                or "depthify_lods" in surface or surface.get("depthify_depth_key") in (None, record["key"])
+                or surface.get("depthify_depth_scale") != props.depth_scale
+                or surface.get("depthify_downsample") != self.plan["settings"]["downsample"]):
+            return False
+
+        # Find the edited blocks and recompute their vertices using storage and depthify modules
+        try:
+            with self.recorder.stage('PATCH') as stage:
+                blocks = storage.dirty_blocks(surface["depthify_depth_key"], record["key"])
+                if blocks is None:
+                    return False
+                stage["blocks"] = len(blocks)
+                stage["vertices"] = depthify.patch_surface_depth(surface, depth_map, blocks,
+                                                                 self.plan["settings"]["downsample"],
+                                                                 props.depth_scale, image_file)
+        except ValueError as e:
+            # Fall back to a full build when the mesh no longer matches the depth map
+            logging.info(f"Rebuilding surface instead of patching it: {e}")
+            return False
+
+        # Record the version of the depth map the surface now shows
+        props.depth_map_ref = record["key"]
+        props.depth_map_hash = record["hash"]
+        surface["depthify_depth_key"] = record["key"]
+
+        # Log a success message to the console and the UI
+        logging.info(f"Surface object updated in {len(blocks)} edited blocks from image file: {image_file}")
+        self.report({'INFO'}, f"Surface object updated in {len(blocks)} edited blocks from image file: {image_file}")
+        return True
+
+    # Define a function to create the surface object from the built arrays
+    def upload_surface(self, props, arrays):
+        # Create a surface object using depthify module
+        try:
+            with self.recorder.stage('UPLOAD'):
+                surface = depthify.surface_from_arrays(arrays, props.lod_distance)
+            self.count_elements('UPLOAD', arrays)
+            return surface
+        except Exception as e:
+            # Log an error message to the console and the UI
+            logging.error(f"Failed to create surface object: {e}")
+            self.report({'ERROR'}, f"Failed to create surface object: {e}")
+            return None
+
+    # Define a function to add the subdivision modifier and scale to a new surface object
+    def apply_modifiers(self, props, surface):
+        # Apply adaptive subdivision to the surface object using depthify module, dicing planes down to the pixels
+        try:
+            if "depthify_dicing_levels" in surface:
+                with self.recorder.stage('SUBDIVISION', levels=surface["depthify_dicing_levels"]):
+                    depthify.apply_dicing(surface, surface["depthify_dicing_levels"])
+            else:
+                with self.recorder.stage('SUBDIVISION', levels=self.plan["subdivisions"]):
+                    depthify.apply_adaptive_subdivision(surface, self.plan["subdivisions"], props.subdivision_type)
+        except Exception as e:
+            # Log an error message to the console and the UI
+            logging.error(f"Failed to apply adaptive subdivision: {e}")
+            self.report({'ERROR'}, f"Failed to apply adaptive subdivision: {e}")
+            return False
+
+        # Scale the surface object using depthify module
+        try:
+            with self.recorder.stage('SCALE'):
+                depthify.scale_surface(surface, props.scale)
+        except Exception as e:
+            # Log an error message to the console and the UI
+            logging.error(f"Failed to scale surface object: {e}")
+            self.report({'ERROR'}, f"Failed to scale surface object: {e}")
+            return False
+
+        # Keep a copy of the surface object for the next run with the same inputs
+        depthify.cache_surface(self.key, surface, props.cache_budget * 2**20, props.share_meshes)
+        return True
+
+    # Define a function to add the displacement material to the surface object
+    def apply_material(self, props, surface):
+        # Apply displacement to the surface object using depthify module
+        try:
+            with self.recorder.stage('DISPLACEMENT'):
+                if props.geometry_mode == 'DISPLACEMENT':
+                    # Displace by the full depth, as the grid does, with smooth interpolation between pixels
+                    depthify.apply_displacement(surface, props.depth_scale * props.displacement_strength,
+                                                'DISPLACEMENT', midlevel=0.0, interpolation='Linear')
+                else:
+                    depthify.apply_displacement(surface, props.displacement_strength, props.displacement_type)
+        except Exception as e:
+            # Log an error message to the console and the UI
+            logging.error(f"Failed to apply displacement: {e}")
+            self.report({'ERROR'}, f"Failed to apply displacement: {e}")
+            return False
+        return True
+
+    # Define a function to link the finished surface object to the scene
+    def link_surface(self, context, surface, image_file):
+        # Get the current scene and its properties
+        scene = context.scene
+        props = scene.depthify_properties
+
+        # Log the surface cache counters to the console
+        logging.info(f"Depthify surface cache: {depthify.surface_cache.stats()}")
+
+        # Store the surface object in the surface property
+        props.surface = surface
+
+        # Record the image, its version and the settings, so that later edits of the image can be patched in
+        surface["depthify_image"] = image_file
+        surface["depthify_depth_key"] = props.depth_map_ref
+        surface["depthify_depth_scale"] = props.depth_scale
+        surface["depthify_downsample"] = self.plan["settings"]["downsample"]
+
+        # Record the highest subdivision level that fits the budgets, which the subdivisions slider keeps to
+        surface["depthify_max_subdivisions"] = self.plan["max_subdivisions"]
+
+        # Link the surface object to the scene and set it as the active object
+        with self.recorder.stage('LINK'):
+            scene.collection.objects.link(surface)
+            scene.view_layers[0].objects.active = surface
+
+        # Log a success message to the console and the UI
+        logging.info(f"Surface object created from image file: {image_file}")
+        self.report({'INFO'}, f"Surface object created from image file: {image_file}")
+
+        # Return a success status
+        return {'FINISHED'}
+
+    # Define a function to execute the operator in one blocking call, as used by scripts
+    def execute(self, context):
+        # Import the modules that build the surface on the first build
+        import_pipeline()
+
+        # Record every stage of the build and log the measurements however it ends
+        self.start_recording(context.scene.depthify_properties)
+        status = {'CANCELLED'}
+        try:
+            status = self.run_stages(context)
+        finally:
+            self.recorder.finish(next(iter(status)))
+        return status
+
+    # Define a function to run the stages of the build one after another
+    def run_stages(self, context):
+        # Get the current scene and its properties
+        scene = context.scene
+        props = scene.depthify_properties
+
+        # Get the validated path of the image file
+        image_file = self.resolve_image_file(props)
+        if image_file is None:
             return {'CANCELLED'}
 
-        # Load the image file using imbuf module
+        # Build a surface that plays back the image sequence when sequence mode is enabled
+        if props.use_sequence:
+            return self.execute_sequence(context, image_file)
+
+        # Load and filter the depth map of the image file through the sidecar cache using preprocess module
         try:
-            image = imbuf_load(image_file)
+            with self.recorder.stage('LOAD'):
+                depth_map, record = preprocess.load_depth(image_file, read_filters(props), trace=props.trace_memory)
+            self.count_pixels(depth_map, record)
         except Exception as e:
             # Log an error message to the console and the UI
             logging.error(f"Failed to load image file: {e}")
             self.report({'ERROR'}, f"Failed to load image file: {e}")
             return {'CANCELLED'}
 
-        # Get the width and height of the image
-        width = image.width
-        height = image.height
+        # Fit the resolution and subdivisions into the memory and face budgets
+        self.fit_budget(props, depth_map.shape)
 
-        # Get the depth map values from the image pixels
-        depth_map = [pixel[0] for pixel in image.pixels]
+        # Build the surface as streamed tiles when tiling is enabled
+        if props.use_tiles:
+            props.depth_map_ref = record["key"]
+            props.depth_map_hash = record["hash"]
+            return self.execute_tiled(context, depth_map, image_file)
 
-        # Store the depth map values in the depth map property
-        props.depth_map.clear()
-        props.depth_map.extend(depth_map)
+        # Update the current surface in place when only some blocks of the image were edited
+        if self.patch_surface(props, depth_map, record, image_file):
+            return {'FINISHED'}
 
-        # Create a surface object using depthify module
+        # Reuse a cached surface object when the image and geometry parameters are unchanged
+        surface = self.use_depth_map(props, record)
+
+        # Build the surface object when it is not cached
+        if surface is None:
+            # Compute the mesh arrays using depthify module
+            try:
+                with self.recorder.stage('BUILD'):
+                    arrays = builder.build_surface_arrays(depth_map, **self.plan["settings"])
+                self.count_elements('BUILD', arrays)
+            except Exception as e:
+                # Log an error message to the console and the UI
+                logging.error(f"Failed to create surface object: {e}")
+                self.report({'ERROR'}, f"Failed to create surface object: {e}")
+                return {'CANCELLED'}
+
+            # Create the surface object and add its modifiers
+            surface = self.upload_surface(props, arrays)
+            if surface is None or not self.apply_modifiers(props, surface):
+                return {'CANCELLED'}
+
+        # Add the material and link the surface object to the scene
+        if not self.apply_material(props, surface):
+            return {'CANCELLED'}
+        return self.link_surface(context, surface, image_file)
+
+    # Define a function to start the build in the background when invoked from the UI
+    def invoke(self, context, event):
+        # Import the modules that build the surface on the first build
+        import_pipeline()
+
+        # Get the current scene and its properties
+        props = context.scene.depthify_properties
+
+        # Run tiled and sequence builds in one call, since they already stream their tiles and frames
+        if props.use_tiles or props.use_sequence:
+            return self.execute(context)
+
+        # Get the validated path of the image file
+        self.image_file = self.resolve_image_file(props)
+        if self.image_file is None:
+            return {'CANCELLED'}
+
+        # Initialize the state of the build
+        self.start_recording(props)
+        self.cancelled = threading.Event()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="depthify")
+        self.surface = None
+        self.arrays = None
+        self.set_stage('LOAD')
+
+        # Load and filter the depth map on the background thread
+        self.future = self.executor.submit(self.recorder.run, 'LOAD', preprocess.load_depth, self.image_file,
+                                           read_filters(props))
+
+        # Poll the background work from a timer so that the UI stays responsive
+        window_manager = context.window_manager
+        self.timer = window_manager.event_timer_add(0.1, window=context.window)
+        window_manager.progress_begin(0, 100)
+        window_manager.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    # Define a function to switch to the next stage of the build
+    def set_stage(self, stage):
+        self.stage = stage
+        self.stage_progress = 0.0
+
+    # Define a function to record the progress of the current stage from any thread
+    def report_progress(self, done, total):
+        # Abort the background work as soon as possible after a cancel request
+        if self.cancelled.is_set():
+            raise CancelledError()
+        self.stage_progress = done / total
+
+    # Define a function to show the overall progress in the UI
+    def show_progress(self, context):
+        # Add up the shares of the finished stages and the finished part of the current stage
+        overall = 0.0
+        label = ""
+        for stage, text, share in self.stages:
+            if stage == self.stage:
+                overall += share * self.stage_progress
+                label = text
+                break
+            overall += share
+
+        # Update the progress bar, the panel and the status bar
+        props = context.scene.depthify_properties
+        props.progress = overall
+        props.progress_stage = label
+        context.window_manager.progress_update(int(overall * 100))
+        if context.workspace is not None:
+            context.workspace.status_text_set(f"Depthify: {label} ({overall * 100:.0f}%), Esc to cancel")
+        for area in context.screen.areas if context.screen else ():
+            if area.type == 'PROPERTIES':
+                area.tag_redraw()
+
+    # Define a function to handle timer and key events while the build runs
+    def modal(self, context, event):
+        # Cancel the build when Esc is pressed
+        if event.type == 'ESC':
+            self.cancel(context)
+            logging.info("Depthify build cancelled")
+            self.report({'WARNING'}, "Depthify build cancelled")
+            return {'CANCELLED'}
+
+        # Let other events through to the UI
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        # Show the progress and wait while the background stage is still running
+        self.show_progress(context)
+        if self.future is not None and not self.future.done():
+            return {'RUNNING_MODAL'}
+
+        # Get the current scene properties
+        props = context.scene.depthify_properties
+
+        # Collect the result of the finished background stage
+        if self.future is not None:
+            try:
+                result = self.future.result()
+            except Exception as e:
+                # Log an error message to the console and the UI
+                logging.error(f"Failed to {'load image file' if self.stage == 'LOAD' else 'create surface object'}: {e}")
+                self.report({'ERROR'}, f"Failed to {'load image file' if self.stage == 'LOAD' else 'create surface object'}: {e}")
+                self.cancel(context)
+                return {'CANCELLED'}
+            self.future = None
+
+            # Start building the geometry once the depth map is loaded, unless the surface is cached
+            if self.stage == 'LOAD':
+                depth_map, record = result
+                self.count_pixels(depth_map, record)
+
+                # Fit the resolution and subdivisions into the memory and face budgets
+                self.fit_budget(props, depth_map.shape)
+
+                # Update the current surface in place when only some blocks of the image were edited
+                if self.patch_surface(props, depth_map, record, self.image_file):
+                    self.finish(context, 'FINISHED')
+                    return {'FINISHED'}
+                self.surface = self.use_depth_map(props, record)
+                if self.surface is not None:
+                    self.set_stage('MATERIAL')
+                else:
+                    self.set_stage('BUILD')
+                    self.future = self.executor.submit(self.recorder.run, 'BUILD', builder.build_surface_arrays,
+                                                       depth_map, progress=self.report_progress,
+                                                       **self.plan["settings"])
+            else:
+                self.arrays = result
+                self.count_elements('BUILD', result)
+                self.set_stage('UPLOAD')
+            return {'RUNNING_MODAL'}
+
+        # Run one main thread stage per timer event so that the UI redraws in between
+        if self.stage == 'UPLOAD':
+            self.surface = self.upload_surface(props, self.arrays)
+            self.arrays = None
+            if self.surface is None:
+                self.cancel(context)
+                return {'CANCELLED'}
+            self.set_stage('MODIFIERS')
+        elif self.stage == 'MODIFIERS':
+            if not self.apply_modifiers(props, self.surface):
+                self.cancel(context)
+                return {'CANCELLED'}
+            self.set_stage('MATERIAL')
+        elif self.stage == 'MATERIAL':
+            if not self.apply_material(props, self.surface):
+                self.cancel(context)
+                return {'CANCELLED'}
+            self.surface, surface = None, self.surface
+            status = self.link_surface(context, surface, self.image_file)
+            self.finish(context, 'FINISHED')
+            return status
+        return {'RUNNING_MODAL'}
+
+    # Define a function to stop the timer and the background thread
+    def finish(self, context, status='CANCELLED'):
+        # Remove the timer and end the progress bar, once
+        window_manager = context.window_manager
+        if self.timer is None:
+            return
+        self.recorder.finish(status)
+        window_manager.event_timer_remove(self.timer)
+        self.timer = None
+        window_manager.progress_end()
+        if context.workspace is not None:
+            context.workspace.status_text_set(None)
+
+        # Reset the progress shown in the panel
+        props = context.scene.depthify_properties
+        props.progress = 0.0
+        props.progress_stage = ""
+
+        # Let the background thread finish on its own
+        self.executor.shutdown(wait=False)
+
+    # Define a function to abort the build and discard its partial results
+    def cancel(self, context):
+        # Ask the background work to stop
+        self.cancelled.set()
+        self.finish(context)
+
+        # Remove a surface object that was created but not linked yet
+        if self.surface is not None:
+            depthify.remove_object(self.surface)
+            self.surface = None
+
+    # Define a function to build the surface as one object per tile
+    def execute_tiled(self, context, depth_map, image_file):
+        # Get the current scene and its properties
+        scene = context.scene
+        props = scene.depthify_properties
+
+        # Create the tile objects using depthify module
         try:
-            surface = depthify.create_surface(width, height, depth_map)
+            with self.recorder.stage('TILES') as stage:
+                surface, tile_objects = depthify.create_surface_tiles(
+                    depth_map, props.depth_scale, self.plan["settings"]["downsample"], props.tile_size,
+                    props.max_resident_tiles, image_file, props.workers)
+                stage["tiles"] = len(tile_objects)
         except Exception as e:
             # Log an error message to the console and the UI
-            logging.error(f"Failed to create surface object: {e}")
-            self.report({'ERROR'}, f"Failed to create surface object: {e}")
+            logging.error(f"Failed to create surface tiles: {e}")
+            self.report({'ERROR'}, f"Failed to create surface tiles: {e}")
             return {'CANCELLED'}
 
-        # Store the surface object in the surface property
+        # Store the parent object in the surface property
         props.surface = surface
 
-        # Apply adaptive subdivision to the surface object using depthify module
+        # Apply adaptive subdivision and displacement to every tile using depthify module
         try:
-            depthify.apply_adaptive_subdivision(surface, props.subdivisions, props.subdivision_type)
+            with self.recorder.stage('SUBDIVISION', levels=self.plan["subdivisions"]):
+                for tile in tile_objects:
+                    depthify.apply_adaptive_subdivision(tile, self.plan["subdivisions"], props.subdivision_type)
+                    tile["depthify_max_subdivisions"] = self.plan["max_subdivisions"]
+            with self.recorder.stage('DISPLACEMENT'):
+                for tile in tile_objects:
+                    depthify.apply_displacement(tile, props.displacement_strength, props.displacement_type)
         except Exception as e:
             # Log an error message to the console and the UI
-            logging.error(f"Failed to apply adaptive subdivision: {e}")
-            self.report({'ERROR'}, f"Failed to apply adaptive subdivision: {e}")
+            logging.error(f"Failed to apply subdivision and displacement to tiles: {e}")
+            self.report({'ERROR'}, f"Failed to apply subdivision and displacement to tiles: {e}")
             return {'CANCELLED'}
 
-        # Apply displacement to the surface object using depthify module
+        # Scale the parent object, which scales all tiles together
+        with self.recorder.stage('SCALE'):
+            depthify.scale_surface(surface, props.scale)
+
+        # Link the parent and tile objects to the scene and set the parent object as the active object
+        with self.recorder.stage('LINK'):
+            scene.collection.objects.link(surface)
+            for tile in tile_objects:
+                scene.collection.objects.link(tile)
+            scene.view_layers[0].objects.active = surface
+
+        # Log a success message to the console and the UI
+        logging.info(f"Surface with {len(tile_objects)} tiles created from image file: {image_file}")
+        self.report({'INFO'}, f"Surface with {len(tile_objects)} tiles created from image file: {image_file}")
+
+        # Return a success status
+        return {'FINISHED'}
+
+    # Define a function to build a surface that plays back an image sequence
+    def execute_sequence(self, context, image_file):
+        # Get the current scene and its properties
+        scene = context.scene
+        props = scene.depthify_properties
+
+        # Decode the frames into the float16 frame cache using sequence module
         try:
-            depthify.apply_displacement(surface, props.displacement_strength, props.displacement_type)
+            with self.recorder.stage('LOAD') as stage:
+                paths = sequence.find_frames(image_file)
+                key, record = sequence.build_cache(paths, props.downsample)
+                stage["frames"] = len(paths)
         except Exception as e:
             # Log an error message to the console and the UI
-            logging.error(f"Failed to apply displacement: {e}")
-            self.report({'ERROR'}, f"Failed to apply displacement: {e}")
+            logging.error(f"Failed to load image sequence: {e}")
+            self.report({'ERROR'}, f"Failed to load image sequence: {e}")
             return {'CANCELLED'}
 
-        # Scale the surface object using depthify module
+        # Create the surface object that follows the frames using depthify module
         try:
+            with self.recorder.stage('UPLOAD'):
+                surface = depthify.create_sequence_surface(key, props.depth_scale, scene.frame_current)
+            with self.recorder.stage('SUBDIVISION', levels=props.subdivisions):
+                depthify.apply_adaptive_subdivision(surface, props.subdivisions, props.subdivision_type)
             depthify.scale_surface(surface, props.scale)
         except Exception as e:
             # Log an error message to the console and the UI
-            logging.error(f"Failed to scale surface object: {e}")
-            self.report({'ERROR'}, f"Failed to scale surface object: {e}")
+            logging.error(f"Failed to create sequence surface: {e}")
+            self.report({'ERROR'}, f"Failed to create sequence surface: {e}")
             return {'CANCELLED'}
 
-        # Link the surface object to the scene
-        scene.collection.objects.link(surface)
+        # Store the surface object in the surface property, with the image it plays back from
+        props.surface = surface
+        surface["depthify_image"] = image_file
+
+        # Mark the scene so that the frame change handler only loads the playback code for scenes with sequences
+        scene["depthify_sequences"] = True
 
-        # Set the surface object as the active object
-        scene.view_layers[0].objects.active = surface
+        # Link the surface object to the scene and set it as the active object
+        with self.recorder.stage('LINK'):
+            scene.collection.objects.link(surface)
+            scene.view_layers[0].objects.active = surface
 
         # Log a success message to the console and the UI
-        logging.info(f"Surface object created from image file: {image_file}")
-        self.report({'INFO'}, f"Surface object created from image file: {image_file}")
+        logging.info(f"Surface with {len(paths)} frames created from image sequence: {image_file}")
+        self.report({'INFO'}, f"Surface with {len(paths)} frames created from image sequence: {image_file}")
+
+        # Return a success status
+        return {'FINISHED'}
+
+# Define a custom operator class for creating surface objects from many image files at once
+class DepthifyCreateSurfacesOperator(bpy.types.Operator):
+    """Create a 3D surface from each selected depth map image, or from every image of a folder"""
+
+    # Define some metadata for the operator
+    bl_idname = "object.depthify_create_surfaces"
+    bl_label = iface_("Create Surfaces")
+    bl_options = {'REGISTER', 'UNDO'}
+
+    # Define the files and folder chosen in the file browser
+    files: bpy.props.CollectionProperty(type=bpy.types.OperatorFileListElement, options={'HIDDEN', 'SKIP_SAVE'})
+    directory: bpy.props.StringProperty(subtype='DIR_PATH', options={'HIDDEN', 'SKIP_SAVE'})
+    filter_image: bpy.props.BoolProperty(default=True, options={'HIDDEN', 'SKIP_SAVE'})
+    filter_folder: bpy.props.BoolProperty(default=True, options={'HIDDEN', 'SKIP_SAVE'})
+
+    # Define a function to get the image files chosen in the file browser
+    def resolve_image_files(self):
+        # Take the selected files, or every image of the folder when none is selected
+        directory = bpy.path.abspath(self.directory)
+        names = [file.name for file in self.files if file.name]
+        if not names:
+            return batch.find_inputs(directory)
+        return [os.path.join(directory, name) for name in names if os.path.isfile(os.path.join(directory, name))]
+
+    # Define a function to place the surfaces side by side in a grid
+    def arrange_surfaces(self, surfaces, sizes):
+        # Give every surface a cell as large as the largest one, in rows about as long as the columns
+        columns = math.ceil(math.sqrt(len(surfaces)))
+        width = max(size[0] for size in sizes) * 1.1
+        height = max(size[1] for size in sizes) * 1.1
+        for index, surface in enumerate(surfaces):
+            row, column = divmod(index, columns)
+            surface.location = (column * width, -row * height, 0.0)
+
+    # Define a function to open the file browser
+    def invoke(self, context, event):
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+    # Define a function to execute the operator
+    def execute(self, context):
+        # Import the modules that build the surface on the first build
+        import_pipeline()
+
+        # Record the stages of every image and log the measurements however the batch ends
+        self.recorder = instrument.BuildRecorder("batch", trace_memory=False)
+        status = {'CANCELLED'}
+        try:
+            status = self.build_surfaces(context)
+        finally:
+            self.recorder.finish(next(iter(status)))
+        return status
+
+    # Define a function to build, set up and link the surfaces of all images
+    def build_surfaces(self, context):
+        # Get the current scene, its properties and the chosen image files
+        scene = context.scene
+        props = scene.depthify_properties
+        image_files = self.resolve_image_files()
+        if not image_files:
+            # Log an error message to the console and the UI
+            logging.error(f"No depth map images found in: {self.directory}")
+            self.report({'ERROR'}, f"No depth map images found in: {self.directory}")
+            return {'CANCELLED'}
+
+        # Decode the images that only Blender can read on the main thread, so that the workers find their sidecars
+        filters = read_filters(props)
+        for image_file in image_files:
+            if ingest.needs_blender(image_file):
+                try:
+                    self.recorder.run('LOAD', preprocess.load_depth, image_file, filters)
+                except Exception as e:
+                    logging.error(f"Failed to load image file {image_file}: {e}")
+
+        # Switch the scene to Cycles once for all surfaces
+        depthify.use_cycles_experimental(scene)
+
+        # Build the surfaces on the worker threads and set up each one on the main thread as it arrives,
+        # building every depth map only once however many images share it
+        surfaces, sizes, failed, reduced = [], [], 0, 0
+        shared = {}
+        max_resident = 2 * min(tiles.worker_count(props.workers), len(image_files))
+        for _, image_file, record, arrays, error in builder.iter_surface_arrays(
+                image_files, filters, read_settings(props), max_resident, props.workers, self.recorder,
+                skip_duplicates=True):
+            try:
+                if error is not None:
+                    raise error
+
+                # Duplicate the surface of an earlier image with the same depth map, linking its mesh when
+                # meshes are shared and copying it otherwise
+                original, size = shared.get(record["hash"], (None, None))
+                if original is not None:
+                    with self.recorder.stage('LINKED' if props.share_meshes else 'DUPLICATE'):
+                        surface = original.copy()
+                        if not props.share_meshes:
+                            surface.data = original.data.copy()
+                        surface.name = os.path.splitext(os.path.basename(image_file))[0]
+                elif arrays is None:
+                    raise RuntimeError("the image with the same depth map failed")
+                else:
+                    # Create the object and add its modifiers and shared material, leaving the cleanup to the end
+                    with self.recorder.stage('UPLOAD'):
+                        surface = depthify.surface_from_arrays(arrays, props.lod_distance)
+                        surface.name = os.path.splitext(os.path.basename(image_file))[0]
+                    # Cap the subdivisions of the built mesh to the memory and face budgets
+                    plan = plan_build(props, record["shape"], fixed_downsample=True)
+                    reduced += plan["reduced"]
+                    surface["depthify_max_subdivisions"] = plan["max_subdivisions"]
+                    with self.recorder.stage('SUBDIVISION', levels=plan["subdivisions"]):
+                        if "depthify_dicing_levels" in surface:
+                            depthify.apply_dicing(surface, surface["depthify_dicing_levels"])
+                        else:
+                            depthify.apply_adaptive_subdivision(surface, plan["subdivisions"], props.subdivision_type)
+                        depthify.scale_surface(surface, props.scale)
+
+                    # Measure the footprint of the surface for the layout
+                    span = arrays["vertices"][:, :2].max(axis=0) - arrays["vertices"][:, :2].min(axis=0)
+                    size = (span[0] * props.scale[0], span[1] * props.scale[1])
+                    shared[record["hash"]] = (surface, size)
+                with self.recorder.stage('DISPLACEMENT'):
+                    if props.geometry_mode == 'DISPLACEMENT':
+                        depthify.apply_displacement(surface, props.depth_scale * props.displacement_strength,
+                                                    'DISPLACEMENT', midlevel=0.0, interpolation='Linear',
+                                                    image_path=image_file, collect=False)
+                    else:
+                        depthify.apply_displacement(surface, props.displacement_strength, props.displacement_type,
+                                                    image_path=image_file, collect=False)
+            except Exception as e:
+                # Log the failure and carry on with the next image
+                logging.error(f"Failed to create surface from image file {image_file}: {e}")
+                failed += 1
+                continue
+
+            # Record the version of the depth map and the settings, as for a single surface
+            surface["depthify_image"] = image_file
+            surface["depthify_depth_key"] = record["key"]
+            surface["depthify_depth_scale"] = props.depth_scale
+            surface["depthify_downsample"] = props.downsample
+
+            # Keep the surface and the size of its footprint for the layout
+            surfaces.append(surface)
+            sizes.append(size)
+
+        # Stop when no surface was built
+        if not surfaces:
+            logging.error(f"Failed to create any of {len(image_files)} surfaces")
+            self.report({'ERROR'}, f"Failed to create any of {len(image_files)} surfaces")
+            return {'CANCELLED'}
+
+        # Place the surfaces side by side and link them to the scene in one collection
+        with self.recorder.stage('LINK', surfaces=len(surfaces)):
+            self.arrange_surfaces(surfaces, sizes)
+            collection = bpy.data.collections.new("Depthify Surfaces")
+            for surface in surfaces:
+                collection.objects.link(surface)
+            scene.collection.children.link(collection)
+            scene.view_layers[0].objects.active = surfaces[-1]
+
+        # Remove the materials and images left without users once for the whole batch
+        materials.collect_orphans()
+
+        # Warn when the budgets capped the subdivisions of some surfaces
+        if reduced:
+            props.build_plan = f"Capped the subdivisions of {reduced} surfaces to fit the budget"
+            self.report({'WARNING'}, props.build_plan)
+
+        # Log a success message to the console and the UI
+        logging.info(f"Created {len(surfaces)} surfaces from {len(image_files)} image files, {failed} failed")
+        self.report({'INFO'}, f"Created {len(surfaces)} surfaces from {len(image_files)} image files, {failed} failed")
+
+        # Return a success status
+        return {'FINISHED'}
+
+# Define a custom operator class for regenerating a single surface tile
+class DepthifyRebuildTileOperator(bpy.types.Operator):
+    """Regenerate the active surface tile from its depth map image"""
+
+    # Define some metadata for the operator
+    bl_idname = "object.depthify_rebuild_tile"
+    bl_label = iface_("Rebuild Tile")
+    bl_options = {'REGISTER', 'UNDO'}
+
+    # Define a function to check whether the active object is a surface tile
+    @classmethod
+    def poll(cls, context):
+        obj = context.object
+        return obj is not None and "depthify_tile" in obj and obj.parent is not None
+
+    # Define a function to execute the operator
+    def execute(self, context):
+        # Import the modules that build the surface on the first build
+        import_pipeline()
+
+        # Get the active tile and the image path recorded on its parent
+        obj = context.object
+        image_file = obj.parent.get("depthify_image", "")
+
+        # Load and filter the depth map through the sidecar cache using preprocess module
+        try:
+            depth_map, record = preprocess.load_depth(image_file, read_filters(context.scene.depthify_properties))
+        except Exception as e:
+            # Log an error message to the console and the UI
+            logging.error(f"Failed to load image file: {e}")
+            self.report({'ERROR'}, f"Failed to load image file: {e}")
+            return {'CANCELLED'}
+
+        # Regenerate the mesh of the tile using depthify module
+        try:
+            depthify.rebuild_surface_tile(obj, depth_map)
+        except Exception as e:
+            # Log an error message to the console and the UI
+            logging.error(f"Failed to rebuild surface tile: {e}")
+            self.report({'ERROR'}, f"Failed to rebuild surface tile: {e}")
+            return {'CANCELLED'}
+
+        # Log a success message to the console and the UI
+        logging.info(f"Surface tile {obj.name} rebuilt from image file: {image_file}")
+        self.report({'INFO'}, f"Surface tile {obj.name} rebuilt from image file: {image_file}")
 
         # Return a success status
         return {'FINISHED'}
 
-# Define a function to register the operator class
+# Define a function to register the operator classes
 def register():
-    # Register the operator class
+    # Register the operator classes
     bpy.utils.register_class(DepthifyCreateSurfaceOperator)
+    bpy.utils.register_class(DepthifyCreateSurfacesOperator)
+    bpy.utils.register_class(DepthifyRebuildTileOperator)
 
-# Define a function to unregister the operator class
+# Define a function to unregister the operator classes
 def unregister():
-    # Unregister the operator class
+    # Unregister the operator classes
+    bpy.utils.unregister_class(DepthifyRebuildTileOperator)
+    bpy.utils.unregister_class(DepthifyCreateSurfacesOperator)
     bpy.utils.unregister_class(DepthifyCreateSurfaceOperator)
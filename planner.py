@@ -0,0 +1,158 @@
+# Import the necessary modules
+import math
+
+# Import the geometry and tiles modules both inside the add-on package and standalone
+try:
+    from . import geometry
+    from . import tiles
+except ImportError:
+    import geometry
+    import tiles
+
+# Define the approximate memory of one mesh vertex in Blender, with its position, normal and flags, in bytes
+VERTEX_BYTES = 48
+
+# Define the approximate memory of one quad in Blender, with its four loops, edges, UVs and custom normals, in bytes
+FACE_BYTES = 160
+
+# Define the largest number of subdivision levels the panel offers
+MAX_SUBDIVISIONS = 6
+
+# Define a function to estimate the size of a surface before building it
+def estimate_build(image_shape, downsample=1, geometry_mode='GRID', subdivisions=0, triangle_budget=0, lod_levels=0):
+    """Estimate the number of elements and the memory of the surface a build would create.
+
+    The subdivision modifier quadruples the faces at every level, and Blender
+    keeps the evaluated mesh next to the base mesh, so both are counted. The
+    adaptive mode is estimated by the full grid, within its triangle budget.
+
+    Args:
+        image_shape (tuple): The height and width of the depth map.
+        downsample (int): The downsample factor of the depth map.
+        geometry_mode (str): The geometry mode of the build.
+        subdivisions (int): The number of subdivision levels, ignored by displacement-only planes.
+        triangle_budget (int): The largest number of triangles of the adaptive mesh, or 0 for no limit.
+        lod_levels (int): The number of coarser levels of detail.
+
+    Returns:
+        dict: The vertices and faces of the base and evaluated meshes, the subdivision levels and the estimated bytes.
+    """
+
+    # Count the faces of the plane, which are diced down to the downsampled pixels, for displacement-only surfaces
+    height, width = image_shape
+    if geometry_mode == 'DISPLACEMENT':
+        segments_x, segments_y = geometry.plane_segments(width, height)
+        vertices = (segments_x + 1) * (segments_y + 1)
+        faces = segments_x * segments_y
+        levels = geometry.dicing_levels(width, height, downsample=downsample)
+    else:
+        # Count the vertices and quads of the downsampled grid
+        grid_height, grid_width = tiles.grid_shape(image_shape, downsample)
+        vertices = grid_height * grid_width
+        faces = (grid_height - 1) * (grid_width - 1)
+        levels = subdivisions
+
+        # Bound the adaptive mesh by its triangle budget, keeping the full grid as the worst case
+        if geometry_mode == 'ADAPTIVE' and triangle_budget:
+            faces = min(faces, triangle_budget)
+            vertices = min(vertices, faces)
+
+    # Add the coarser levels of detail, each a quarter of the one before
+    lod_vertices = sum(vertices // 4**level for level in range(1, lod_levels + 1))
+    lod_faces = sum(faces // 4**level for level in range(1, lod_levels + 1))
+
+    # Count the mesh evaluated by the subdivision modifier, which splits every face into four per level
+    evaluated_faces = faces * 4**levels
+    evaluated_vertices = vertices + faces * (4**levels - 1)
+
+    # Add up the base mesh, the levels of detail and the evaluated mesh when it differs from the base mesh
+    total_vertices = vertices + lod_vertices + (evaluated_vertices if levels else 0)
+    total_faces = faces + lod_faces + (evaluated_faces if levels else 0)
+    nbytes = total_vertices * VERTEX_BYTES + total_faces * FACE_BYTES
+
+    # Return the estimate
+    return {"vertices": vertices, "faces": faces, "levels": levels, "evaluated_vertices": evaluated_vertices,
+            "evaluated_faces": evaluated_faces, "bytes": nbytes}
+
+# Define a function to check an estimate against the budgets
+def within_budget(estimate, max_bytes=0, max_faces=0):
+    """Check whether an estimated build stays within the memory and face budgets.
+
+    Args:
+        estimate (dict): The estimate returned by estimate_build.
+        max_bytes (int): The memory budget in bytes, or 0 for no limit.
+        max_faces (int): The budget of evaluated faces, or 0 for no limit.
+
+    Returns:
+        bool: Whether both budgets are kept.
+    """
+
+    # Compare the memory and the faces Blender evaluates with their budgets
+    return ((not max_bytes or estimate["bytes"] <= max_bytes)
+            and (not max_faces or estimate["evaluated_faces"] <= max_faces))
+
+# Define a function to fit the resolution and subdivision levels of a build into the budgets
+def plan_build(image_shape, settings, subdivisions, max_bytes=0, max_faces=0, fixed_downsample=False):
+    """Choose the downsample factor and subdivision levels of a build so that it fits the budgets.
+
+    Subdivision levels are capped first, since they add no detail beyond
+    the pixels of the depth map, and the depth map is downsampled further
+    only when the base mesh alone is too large.
+
+    Args:
+        image_shape (tuple): The height and width of the depth map.
+        settings (dict): The geometry settings of the build, as passed to build_surface_arrays.
+        subdivisions (int): The requested number of subdivision levels.
+        max_bytes (int): The memory budget in bytes, or 0 for no limit.
+        max_faces (int): The budget of evaluated faces, or 0 for no limit.
+        fixed_downsample (bool): Whether the downsample factor is kept, as for meshes that are already built.
+
+    Returns:
+        dict: The adjusted settings and subdivisions, the estimate, the highest subdivision level that fits,
+            whether anything was reduced, whether the budgets are kept and a message describing the plan.
+    """
+
+    # Get the geometry parameters that the estimate depends on
+    downsample = settings["downsample"]
+    geometry_mode = settings["geometry_mode"]
+    triangle_budget = settings.get("triangle_budget", 0)
+    lod_levels = settings.get("lod_levels", 0)
+    levels = subdivisions
+
+    # Cap the subdivision levels, then raise the downsample factor, until the build fits or nothing is left to reduce
+    while True:
+        estimate = estimate_build(image_shape, downsample, geometry_mode, levels, triangle_budget, lod_levels)
+        fits = within_budget(estimate, max_bytes, max_faces)
+        if fits:
+            break
+        if levels > 0 and geometry_mode != 'DISPLACEMENT':
+            levels -= 1
+        elif not fixed_downsample and downsample < max(image_shape):
+            downsample += 1
+        else:
+            break
+
+    # Find the highest subdivision level that still fits at the chosen resolution, for later slider changes
+    max_levels = levels
+    while max_levels < MAX_SUBDIVISIONS and within_budget(
+            estimate_build(image_shape, downsample, geometry_mode, max_levels + 1, triangle_budget, lod_levels),
+            max_bytes, max_faces):
+        max_levels += 1
+
+    # Describe the reductions and the estimated size
+    changes = []
+    if downsample != settings["downsample"]:
+        changes.append(f"downsample {settings['downsample']} to {downsample}")
+    if levels != subdivisions:
+        changes.append(f"subdivisions {subdivisions} to {levels}")
+    size = f"{estimate['evaluated_faces']:,} faces, {math.ceil(estimate['bytes'] / 2**20):,} MB"
+    if not fits:
+        message = f"Over budget even at downsample {downsample}: {size}"
+    elif changes:
+        message = f"Reduced {' and '.join(changes)} to fit the budget: {size}"
+    else:
+        message = f"Estimated {size}"
+
+    # Return the plan
+    return {"settings": dict(settings, downsample=downsample), "subdivisions": levels, "max_subdivisions": max_levels,
+            "estimate": estimate, "reduced": bool(changes), "fits": fits, "message": message}
@@ -0,0 +1,359 @@
+# Import the necessary modules
+import hashlib
+import json
+import logging
+import time
+
+import numpy as np
+
+# Import the storage module both inside the add-on package and standalone
+try:
+    from . import storage
+except ImportError:
+    import storage
+
+# Define the largest number of bytes of filter windows held in memory at once
+WINDOW_BYTES = 64 * 2**20
+
+# Define the settings that leave the depth map unchanged
+DEFAULT_SETTINGS = {
+    "fill_holes": False,
+    "denoise": 'NONE',
+    "denoise_radius": 1,
+    "denoise_range": 0.05,
+    "normalize": False,
+    "normalize_clip": 0.0,
+    "conversion": 'NONE',
+    "gamma": 1.0,
+    "encoding": "float32",
+    "compress": False,
+}
+
+# Define a function to fill holes in a depth map
+def fill_holes(depth, fill_zeros=True):
+    """Fill the missing values of a depth map from their surroundings with a push-pull pyramid.
+
+    Every hole gets the average of the valid values in the smallest
+    pyramid cell around it that has any, so large holes are filled smoothly
+    and small ones from their direct neighbours.
+
+    Args:
+        depth (numpy.ndarray): The depth map of shape (height, width).
+        fill_zeros (bool): Whether zero values count as holes, as written by many depth estimators.
+
+    Returns:
+        numpy.ndarray: A float32 copy of the depth map without holes.
+    """
+
+    # Find the holes, and return early when there are none or nothing to fill them from
+    depth = np.array(depth, dtype=np.float32)
+    holes = ~np.isfinite(depth)
+    if fill_zeros:
+        holes |= depth == 0
+    if not holes.any():
+        return depth
+    if holes.all():
+        depth[:] = 0.0
+        return depth
+
+    # Fill the holes from the pyramid of valid values
+    weights = (~holes).astype(np.float32)
+    filled = push_pull(np.where(holes, 0.0, depth).astype(np.float32), weights)
+    depth[holes] = filled[holes]
+    return depth
+
+# Define a function to fill a weighted grid from coarser averages
+def push_pull(values, weights):
+    """Average weighted values into ever coarser cells and fill empty cells from the coarser levels.
+
+    Args:
+        values (numpy.ndarray): The values multiplied by their weights, of shape (height, width).
+        weights (numpy.ndarray): The weights, zero where there is no value.
+
+    Returns:
+        numpy.ndarray: The average of every cell, taken from the first level where it has any weight.
+    """
+
+    # Average the values where they have weight
+    with np.errstate(invalid="ignore", divide="ignore"):
+        average = np.where(weights > 0, values / weights, 0.0).astype(np.float32)
+    height, width = values.shape
+    if (weights > 0).all() or (height == 1 and width == 1):
+        return average
+
+    # Sum 2x2 cells, padding odd sizes with empty cells
+    padding = ((0, height % 2), (0, width % 2))
+    values, weights = np.pad(values, padding), np.pad(weights, padding)
+    coarse_values = values[0::2, 0::2] + values[1::2, 0::2] + values[0::2, 1::2] + values[1::2, 1::2]
+    coarse_weights = weights[0::2, 0::2] + weights[1::2, 0::2] + weights[0::2, 1::2] + weights[1::2, 1::2]
+
+    # Fill the empty cells from the next coarser level
+    coarse = push_pull(coarse_values, coarse_weights)
+    upsampled = np.repeat(np.repeat(coarse, 2, axis=0), 2, axis=1)[:height, :width]
+    return np.where(weights[:height, :width] > 0, average, upsampled)
+
+# Define a function to take the median of every pixel's neighbourhood
+def median_filter(depth, radius=1):
+    """Replace every value by the median of the square window around it, removing isolated spikes.
+
+    The windows are strided views of the padded depth map, evaluated in
+    bands of rows so that memory stays bounded for large radii.
+
+    Args:
+        depth (numpy.ndarray): The depth map of shape (height, width).
+        radius (int): The number of pixels on each side of the window.
+
+    Returns:
+        numpy.ndarray: The filtered float32 depth map.
+    """
+
+    # Repeat the border pixels so that every window is full
+    size = 2 * radius + 1
+    padded = np.pad(np.asarray(depth, dtype=np.float32), radius, mode="edge")
+    height, width = depth.shape
+    output = np.empty((height, width), dtype=np.float32)
+
+    # Take the middle of the partially sorted windows of a band of rows at a time, as the window size is odd
+    middle = size * size // 2
+    band_rows = max(WINDOW_BYTES // (width * size * size * 4), 1)
+    for a in range(0, height, band_rows):
+        b = min(a + band_rows, height)
+        windows = np.lib.stride_tricks.sliding_window_view(padded[a:b + 2 * radius], (size, size))
+        output[a:b] = np.partition(windows.reshape(b - a, width, -1), middle, axis=-1)[..., middle]
+    return output
+
+# Define a function to smooth a depth map while keeping its edges
+def bilateral_filter(depth, radius=2, sigma_range=0.05, sigma_space=None):
+    """Smooth a depth map with a bilateral filter, which averages only over similar depths.
+
+    The filter runs as one array operation per window offset, so it costs
+    (2 * radius + 1) squared passes over the depth map.
+
+    Args:
+        depth (numpy.ndarray): The depth map of shape (height, width).
+        radius (int): The number of pixels on each side of the window.
+        sigma_range (float): The depth difference at which neighbours lose most of their weight.
+        sigma_space (float): The distance at which neighbours lose most of their weight, or None for half the radius.
+
+    Returns:
+        numpy.ndarray: The filtered float32 depth map.
+    """
+
+    # Repeat the border pixels so that every window is full
+    sigma_space = sigma_space or max(radius / 2, 0.5)
+    center = np.asarray(depth, dtype=np.float32)
+    padded = np.pad(center, radius, mode="edge")
+    height, width = center.shape
+
+    # Accumulate the weighted neighbours one offset at a time
+    total = np.zeros_like(center)
+    weights = np.zeros_like(center)
+    weight = np.empty_like(center)
+    for dy in range(-radius, radius + 1):
+        for dx in range(-radius, radius + 1):
+            neighbour = padded[radius + dy:radius + dy + height, radius + dx:radius + dx + width]
+
+            # Weigh the neighbour by its distance and by its difference in depth
+            np.subtract(neighbour, center, out=weight)
+            np.square(weight, out=weight)
+            weight *= -0.5 / sigma_range**2
+            weight -= (dy * dy + dx * dx) / (2 * sigma_space**2)
+            np.exp(weight, out=weight)
+            weights += weight
+            weight *= neighbour
+            total += weight
+
+    # Divide by the total weight, which the center pixel keeps above zero
+    total /= weights
+    return total
+
+# Define a function to stretch a depth map to the 0-1 range
+def normalize_range(depth, clip=0.0):
+    """Stretch a depth map to the 0-1 range, optionally ignoring outliers at both ends.
+
+    Args:
+        depth (numpy.ndarray): The depth map of shape (height, width).
+        clip (float): The percentage of values at each end that are clipped instead of stretched to.
+
+    Returns:
+        numpy.ndarray: The normalized float32 depth map.
+    """
+
+    # Find the range, with percentiles only when clipping since they need a sort
+    depth = np.asarray(depth, dtype=np.float32)
+    if clip > 0:
+        low, high = np.percentile(depth, (clip, 100 - clip))
+    else:
+        low, high = depth.min(), depth.max()
+
+    # Return a flat depth map when there is no range
+    if high <= low:
+        return np.zeros_like(depth)
+
+    # Stretch and clip the values
+    output = (depth - low) * np.float32(1 / (high - low))
+    return np.clip(output, 0.0, 1.0, out=output)
+
+# Define a function to apply a gamma curve to a depth map
+def gamma_correct(depth, gamma=1.0):
+    """Apply a gamma curve to a depth map, clamping negative values to zero.
+
+    Args:
+        depth (numpy.ndarray): The depth map of shape (height, width).
+        gamma (float): The exponent, above 1 to flatten the low values and below 1 to raise them.
+
+    Returns:
+        numpy.ndarray: The corrected float32 depth map.
+    """
+
+    # Raise the clamped values to the exponent
+    return np.power(np.maximum(depth, 0.0, dtype=np.float32), np.float32(gamma))
+
+# Define a function to convert inverse depth to depth
+def inverse_depth(depth, epsilon=1e-3):
+    """Convert inverse depth, or disparity, as written by many depth estimators, to depth in the 0-1 range.
+
+    Args:
+        depth (numpy.ndarray): The inverse depth map of shape (height, width).
+        epsilon (float): The smallest inverse depth, which keeps far away points finite.
+
+    Returns:
+        numpy.ndarray: The float32 depth map stretched to the 0-1 range.
+    """
+
+    # Take the reciprocal and stretch it to the same range as the other depth maps
+    return normalize_range(np.reciprocal(np.maximum(depth, epsilon, dtype=np.float32)))
+
+# Define a function to list the filters of a chain of settings
+def filter_chain(settings):
+    """List the filters that a set of preprocessing settings runs, in order.
+
+    Holes are filled first so that the other filters never see them, and the
+    range is normalized before the gamma curve, which expects 0-1 values.
+
+    Args:
+        settings (dict): The preprocessing settings, with the keys of DEFAULT_SETTINGS.
+
+    Returns:
+        list: The name, function and keyword arguments of every filter.
+    """
+
+    # Fill in the settings that are not given
+    settings = dict(DEFAULT_SETTINGS, **settings)
+    chain = []
+
+    # Fill the holes
+    if settings["fill_holes"]:
+        chain.append(("fill_holes", fill_holes, {}))
+
+    # Remove the noise
+    if settings["denoise"] == 'MEDIAN':
+        chain.append(("median", median_filter, {"radius": settings["denoise_radius"]}))
+    elif settings["denoise"] == 'BILATERAL':
+        chain.append(("bilateral", bilateral_filter, {"radius": settings["denoise_radius"],
+                                                      "sigma_range": settings["denoise_range"]}))
+
+    # Stretch the range
+    if settings["normalize"]:
+        chain.append(("normalize", normalize_range, {"clip": settings["normalize_clip"]}))
+
+    # Convert the values
+    if settings["conversion"] == 'GAMMA' and settings["gamma"] != 1.0:
+        chain.append(("gamma", gamma_correct, {"gamma": settings["gamma"]}))
+    elif settings["conversion"] == 'INVERSE':
+        chain.append(("inverse", inverse_depth, {}))
+
+    # Return the filters
+    return chain
+
+# Define a function to run the preprocessing filters on a depth map
+def preprocess(depth, settings):
+    """Run the preprocessing filters on a depth map and time every one of them.
+
+    Args:
+        depth (numpy.ndarray): The depth map of shape (height, width).
+        settings (dict): The preprocessing settings, with the keys of DEFAULT_SETTINGS.
+
+    Returns:
+        tuple: The filtered depth map and the name and seconds of every filter.
+    """
+
+    # Decode a compact depth map once, since the filters read every pixel
+    timings = []
+    depth = np.asarray(depth, dtype=np.float32)
+
+    # Run the filters one after another, timing each
+    for name, function, kwargs in filter_chain(settings):
+        start = time.perf_counter()
+        depth = function(depth, **kwargs)
+        timings.append({"filter": name, "seconds": time.perf_counter() - start})
+
+    # Return the depth map with the timings
+    return depth, timings
+
+# Define a function to compute the cache key of a preprocessed depth map
+def preprocess_key(source_key, settings):
+    """Compute the cache key of a depth map after a chain of filters.
+
+    Args:
+        source_key (str): The cache key of the unfiltered depth map.
+        settings (dict): The preprocessing settings.
+
+    Returns:
+        str: A hexadecimal key that changes with the source and with any filter setting.
+    """
+
+    # Hash the source key with the filters that actually run
+    chain = [(name, kwargs) for name, _, kwargs in filter_chain(settings)]
+    return hashlib.sha1(f"{source_key}|{json.dumps(chain, sort_keys=True)}".encode("utf-8")).hexdigest()
+
+# Define a function to load the preprocessed depth map of an image file
+def load_depth(path, settings=None, channel=0, cache_dir=None, trace=False):
+    """Load the depth map of an image file and run the preprocessing filters on it, both through the sidecar cache.
+
+    Running the same filters on the same image again only memory-maps the
+    cached result. The filters read the float32 source, so they see its holes
+    and full precision, and only their result is cached in the encoding of
+    the settings, which is returned as a compact.CompactDepth.
+
+    Args:
+        path (str): The path of the image file.
+        settings (dict): The preprocessing settings, or None for no filters.
+        channel (int): The channel that holds the depth values.
+        cache_dir (str): The cache directory, or None for the default.
+        trace (bool): Whether to record the peak of traced allocations while decoding the image.
+
+    Returns:
+        tuple: The depth map and its metadata record, with the time of every filter under "timings" when they ran.
+    """
+
+    # Load the unfiltered depth map in the chosen encoding when no filter runs
+    settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+    encoding, compress = settings["encoding"], settings["compress"]
+    if not filter_chain(settings):
+        return storage.load_depth(path, channel, cache_dir, encoding, compress, trace)
+
+    # Otherwise load it as float32, and return the cached result of the same filters in the chosen encoding
+    depth, record = storage.load_depth(path, channel, cache_dir, trace=trace)
+    key = storage.encoded_key(preprocess_key(record["key"], settings), encoding, compress)
+    filtered, filtered_record = storage.read_depth(key, cache_dir)
+    if filtered is not None:
+        return filtered, filtered_record
+
+    # Otherwise run the filters and store the result, logging the time of every filter
+    filtered, timings = preprocess(depth, settings)
+    for timing in timings:
+        logging.info(f"Depth map filter {timing['filter']}: {timing['seconds']:.3f}s")
+    filtered_record = storage.store_depth(key, filtered, cache_dir, encoding, compress, source=record["key"],
+                                          filters=[timing["filter"] for timing in timings],
+                                          path=record.get("path"), channel=channel)
+
+    # Hand out the compact depth map instead of the filtered one, so that only the codes stay in memory
+    if "layout" in filtered_record:
+        filtered, _ = storage.read_depth(key, cache_dir)
+
+    # Return the filtered depth map with the timings and the ingestion statistics of a freshly decoded image
+    filtered_record["timings"] = timings
+    if "stats" in record:
+        filtered_record["stats"] = record["stats"]
+    return filtered, filtered_record
@@ -0,0 +1,248 @@
+# Import the necessary modules
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Import the geometry, ingest and storage modules both inside the add-on package and standalone
+try:
+    from . import geometry
+    from . import ingest
+    from . import storage
+except ImportError:
+    import geometry
+    import ingest
+    import storage
+
+# Define the pattern of numbered frame file names, such as depth_0001.png
+FRAME_PATTERN = re.compile(r"^(.*?)(\d+)(\.[^.]+)$")
+
+# Define a function to find the frames of an image sequence
+def find_frames(path):
+    """Find the numbered frames of the image sequence that a file belongs to.
+
+    Args:
+        path (str): The path of any frame of the sequence.
+
+    Returns:
+        list: The paths of the frames in numeric order, or just the path when its name has no frame number.
+    """
+
+    # Split the name into the prefix, the frame number and the extension
+    directory, name = os.path.split(os.path.abspath(path))
+    match = FRAME_PATTERN.match(name)
+    if match is None:
+        return [path]
+    prefix, _, extension = match.groups()
+
+    # Collect the files with the same prefix and extension, ordered by frame number
+    frames = []
+    for entry in os.listdir(directory):
+        other = FRAME_PATTERN.match(entry)
+        if other and other.group(1) == prefix and other.group(3).lower() == extension.lower():
+            frames.append((int(other.group(2)), os.path.join(directory, entry)))
+    return [frame_path for _, frame_path in sorted(frames)]
+
+# Define a function to compute the cache key of a sequence
+def sequence_key(paths, downsample=1, channel=0):
+    """Compute the cache key of a sequence from the cache keys of its frames.
+
+    Args:
+        paths (list): The paths of the frames.
+        downsample (int): The downsample factor of the cached frames.
+        channel (int): The channel that holds the depth values.
+
+    Returns:
+        str: A hexadecimal key that changes whenever any frame changes.
+    """
+
+    # Hash the keys of all frames together with the downsample factor
+    digest = hashlib.sha1(f"{downsample}|{channel}".encode("utf-8"))
+    for path in paths:
+        digest.update(storage.cache_key(path, channel).encode("utf-8"))
+    return digest.hexdigest()
+
+# Define a function to get the paths of the cache files of a sequence
+def cache_paths(key, cache_dir=None):
+    """Get the paths of the cache files of a sequence.
+
+    Args:
+        key (str): The sequence key.
+        cache_dir (str): The cache directory, or None for the default.
+
+    Returns:
+        tuple: The path of the .npy frame file and of the .json metadata file.
+    """
+
+    # Build both paths inside the cache directory
+    base = os.path.join(cache_dir or storage.default_cache_dir(), key)
+    return base + ".frames.npy", base + ".frames.json"
+
+# Define a function to build the frame cache of a sequence
+def build_cache(paths, downsample=1, channel=0, cache_dir=None, progress=None):
+    """Decode every frame of a sequence into one memory-mappable float16 file.
+
+    The frames are stored at the resolution of the vertex grid, so playback
+    only has to copy one array per frame into the mesh. An existing cache
+    for the same frames and downsample factor is reused.
+
+    Args:
+        paths (list): The paths of the frames, which must all have the same size.
+        downsample (int): The downsample factor of the vertex grid.
+        channel (int): The channel that holds the depth values.
+        cache_dir (str): The cache directory, or None for the default.
+        progress (callable): A function called with the number of finished and total frames.
+
+    Returns:
+        tuple: The sequence key and its metadata record.
+    """
+
+    # Reuse the cache when it has already been built
+    key = sequence_key(paths, downsample, channel)
+    data_path, meta_path = cache_paths(key, cache_dir)
+    if os.path.exists(data_path) and os.path.exists(meta_path):
+        storage.touch(meta_path)
+        with open(meta_path) as file:
+            return key, json.load(file)
+    os.makedirs(os.path.dirname(data_path), exist_ok=True)
+
+    # Write the frames one at a time into a memory-mapped file under a temporary name
+    frames = None
+    for index, path in enumerate(paths):
+        depth, _ = ingest.load_depth(path, channel)
+        depth = geometry.downsample(depth, downsample)
+        if frames is None:
+            frames = np.lib.format.open_memmap(data_path + ".tmp", mode="w+", dtype=np.float16,
+                                               shape=(len(paths),) + depth.shape)
+        elif depth.shape != frames.shape[1:]:
+            raise ValueError(f"Frame {path} has a different size than the first frame")
+        frames[index] = depth
+        if progress:
+            progress(index + 1, len(paths))
+
+    # Move the finished files in place
+    frames.flush()
+    del frames
+    record = {"key": key, "paths": [os.path.abspath(path) for path in paths], "downsample": downsample,
+              "channel": channel}
+    with open(meta_path + ".tmp", "w") as file:
+        json.dump(record, file)
+    os.replace(data_path + ".tmp", data_path)
+    os.replace(meta_path + ".tmp", meta_path)
+
+    # Make room for the frames by evicting the cached files used longest ago
+    storage.prune_cache(cache_dir, keep=(key,))
+
+    # Return the key and the record
+    return key, record
+
+# Define a function to open the frame cache of a sequence
+def open_frames(key, cache_dir=None):
+    """Memory-map the frame cache of a sequence.
+
+    Args:
+        key (str): The sequence key.
+        cache_dir (str): The cache directory, or None for the default.
+
+    Returns:
+        numpy.ndarray: The float16 frames of shape (frames, rows, columns), or None when the cache is missing.
+    """
+
+    # Map the frame file when it exists, marking it as used so that pruning the cache evicts it last
+    data_path, meta_path = cache_paths(key, cache_dir)
+    if not os.path.exists(data_path):
+        return None
+    storage.touch(meta_path)
+    return np.load(data_path, mmap_mode="r")
+
+# Define a player that streams frames with a bounded read-ahead
+class FramePlayer:
+    """Stream the frames of a sequence cache, prefetching the next ones on a background thread."""
+
+    # Define a function to initialize the player
+    def __init__(self, frames, ring_size=8):
+        """Initialize the player.
+
+        Args:
+            frames (numpy.ndarray): The memory-mapped frames returned by open_frames.
+            ring_size (int): The largest number of frames held in memory at once.
+        """
+
+        # Store the frames and the ring of pending and finished reads by frame index
+        self.frames = frames
+        self.ring_size = max(ring_size, 1)
+        self.ring = OrderedDict()
+        self.lock = threading.Lock()
+
+        # Read the frames on one background thread
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="depthify-frames")
+
+        # Keep the vertex coordinates that playback writes the frames into
+        self.coords = None
+
+    # Define a function to read a frame as float32 values
+    def read(self, index):
+        return np.asarray(self.frames[index], dtype=np.float32).ravel()
+
+    # Define a function to get a frame
+    def get(self, index):
+        """Get the depth values of a frame and prefetch the frames after it.
+
+        Args:
+            index (int): The index of the frame, clamped to the sequence.
+
+        Returns:
+            numpy.ndarray: The flat float32 depth values of the frame.
+        """
+
+        # Take the frame from the ring, or read it now when it was not prefetched
+        index = min(max(index, 0), len(self.frames) - 1)
+        with self.lock:
+            future = self.ring.pop(index, None)
+        values = future.result() if future is not None else self.read(index)
+
+        # Prefetch the following frames and return this one
+        self.prefetch(index + 1)
+        return values
+
+    # Define a function to prefetch frames
+    def prefetch(self, start):
+        """Read the frames from start on in the background, dropping any others from the ring.
+
+        Args:
+            start (int): The index of the first frame to prefetch.
+
+        Returns:
+            None.
+        """
+
+        # Keep only the frames that playback will reach next
+        wanted = range(start, min(start + self.ring_size, len(self.frames)))
+        with self.lock:
+            for index in [index for index in self.ring if index not in wanted]:
+                self.ring.pop(index).cancel()
+
+            # Submit the missing frames in playback order
+            for index in wanted:
+                if index not in self.ring:
+                    self.ring[index] = self.executor.submit(self.read, index)
+
+    # Define a function to stop the background thread
+    def close(self):
+        """Drop the prefetched frames and stop the background thread.
+
+        Returns:
+            None.
+        """
+
+        # Cancel the pending reads and let the running one finish on its own
+        with self.lock:
+            for future in self.ring.values():
+                future.cancel()
+            self.ring.clear()
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,423 @@
+# Import the necessary modules
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+
+# Import the compact and ingest modules both inside the add-on package and standalone
+try:
+    from . import compact
+    from . import ingest
+except ImportError:
+    import compact
+    import ingest
+
+# Define the environment variable that overrides the cache directory
+CACHE_DIR_VARIABLE = "DEPTHIFY_CACHE_DIR"
+
+# Define the environment variable that overrides the byte budget of the cache directory, 0 for no limit
+CACHE_BYTES_VARIABLE = "DEPTHIFY_CACHE_BYTES"
+
+# Define the default byte budget of the cache directory
+CACHE_BYTES = 4 * 2**30
+
+# Define the edge length in pixels of the blocks that are hashed to find edited regions
+BLOCK_SIZE = 64
+
+# Define a function to get the default cache directory
+def default_cache_dir():
+    """Get the default directory for depth map sidecar files.
+
+    Returns:
+        str: The value of DEPTHIFY_CACHE_DIR, or a depthify folder in the user cache directory.
+    """
+
+    # Prefer the directory given in the environment
+    if os.environ.get(CACHE_DIR_VARIABLE):
+        return os.environ[CACHE_DIR_VARIABLE]
+
+    # Otherwise use the XDG cache directory of the user
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "depthify")
+
+# Define a function to get the byte budget of the cache directory
+def cache_budget():
+    """Get the byte budget of the cache directory.
+
+    Returns:
+        int: The value of DEPTHIFY_CACHE_BYTES, or CACHE_BYTES when it is not set or invalid.
+    """
+
+    # Prefer the budget given in the environment
+    try:
+        return int(os.environ.get(CACHE_BYTES_VARIABLE, CACHE_BYTES))
+    except ValueError:
+        logging.warning(f"Ignoring invalid {CACHE_BYTES_VARIABLE}, using {CACHE_BYTES} bytes")
+        return CACHE_BYTES
+
+# Define a function to compute the cache key of an image file
+def cache_key(path, channel=0):
+    """Compute the cache key of an image file from its path, mtime and size.
+
+    Args:
+        path (str): The path of the image file.
+        channel (int): The channel that holds the depth values.
+
+    Returns:
+        str: A hexadecimal key that changes whenever the file changes.
+    """
+
+    # Get the modification time and size of the file
+    info = os.stat(path)
+
+    # Hash the absolute path together with the file metadata
+    text = f"{os.path.abspath(path)}|{info.st_mtime_ns}|{info.st_size}|{channel}"
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+# Define a function to compute the cache key of a depth map in a compact encoding
+def encoded_key(key, encoding="float32", compress=False):
+    """Derive the cache key of a depth map stored in a compact encoding from its float32 cache key.
+
+    Args:
+        key (str): The cache key of the float32 depth map.
+        encoding (str): One of compact.ENCODINGS.
+        compress (bool): Whether the bands of codes are compressed.
+
+    Returns:
+        str: The key itself for uncompressed float32 storage, otherwise a key that includes the encoding.
+    """
+
+    # Keep the key of plain float32 sidecars, so that existing caches stay valid
+    if encoding == "float32" and not compress:
+        return key
+    return hashlib.sha1(f"{key}|{encoding}|{compress}".encode("utf-8")).hexdigest()
+
+# Define a function to compute the content hash of a depth map
+def content_hash(depth):
+    """Compute the content hash of a depth map.
+
+    Args:
+        depth (numpy.ndarray): The depth map.
+
+    Returns:
+        str: A hexadecimal digest of the shape and values of the depth map.
+    """
+
+    # Hash the shape first so that reshaped data gets a different digest
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(repr(depth.shape).encode("ascii"))
+
+    # Hash the values as contiguous float32 bytes
+    digest.update(np.ascontiguousarray(depth, dtype=np.float32).data)
+    return digest.hexdigest()
+
+# Define a function to hash every block of a depth map
+def block_hashes(depth, block=BLOCK_SIZE):
+    """Hash every square block of a depth map, so that two versions can be compared block by block.
+
+    Each pixel is multiplied by a fixed random odd weight for its position
+    and the products are summed per block modulo 2**64, which changes
+    whenever any single pixel of the block changes. The depth map is read
+    one band of blocks at a time, so memory maps are never copied whole.
+
+    Args:
+        depth (numpy.ndarray): The depth map of shape (height, width).
+        block (int): The edge length of the blocks in pixels.
+
+    Returns:
+        numpy.ndarray: The uint64 hashes of shape (ceil(height / block), ceil(width / block)).
+    """
+
+    # Draw the same odd weights for every call
+    height, width = depth.shape
+    weights = np.random.default_rng(0).integers(0, 2**63, size=(block, width), dtype=np.uint64) * 2 + 1
+    cols = np.arange(0, width, block)
+    hashes = np.empty((len(range(0, height, block)), len(cols)), dtype=np.uint64)
+
+    # Weight the bits of every band of pixels and sum them per block, letting the products wrap around
+    for index, row in enumerate(range(0, height, block)):
+        band = np.ascontiguousarray(depth[row:row + block], dtype=np.float32).view(np.uint32).astype(np.uint64)
+        hashes[index] = np.add.reduceat((band * weights[:len(band)]).sum(axis=0, dtype=np.uint64), cols)
+
+    # Return the hashes
+    return hashes
+
+# Define a function to get the paths of the sidecar files of a cache key
+def sidecar_paths(key, cache_dir=None):
+    """Get the paths of the sidecar files of a cache key.
+
+    Args:
+        key (str): The cache key.
+        cache_dir (str): The cache directory, or None for the default.
+
+    Returns:
+        tuple: The path of the .npy data file and of the .json metadata file.
+    """
+
+    # Build both paths inside the cache directory
+    base = os.path.join(cache_dir or default_cache_dir(), key)
+    return base + ".npy", base + ".json"
+
+# Define a function to get the path of the block hash file of a cache key
+def blocks_path(key, cache_dir=None):
+    return os.path.join(cache_dir or default_cache_dir(), key) + ".blocks.npy"
+
+# Define a function to write a depth map to a sidecar file
+def store_depth(key, depth, cache_dir=None, encoding="float32", compress=False, **metadata):
+    """Write a depth map and its metadata to sidecar files.
+
+    A depth map in a compact encoding is hashed after encoding, so the
+    content hash describes the values that read_depth returns.
+
+    Args:
+        key (str): The cache key.
+        depth (numpy.ndarray): The depth map.
+        cache_dir (str): The cache directory, or None for the default.
+        encoding (str): One of compact.ENCODINGS.
+        compress (bool): Whether to compress every band of codes.
+        **metadata: Extra values to record in the metadata file.
+
+    Returns:
+        dict: The metadata record, including the key and the content hash.
+    """
+
+    # Create the cache directory if needed
+    data_path, meta_path = sidecar_paths(key, cache_dir)
+    os.makedirs(os.path.dirname(data_path), exist_ok=True)
+
+    # Encode the depth map when a compact encoding is chosen
+    if encoding != "float32" or compress:
+        depth = compact.compact_depth(depth, encoding, compress)
+
+    # Build the metadata record
+    record = dict(metadata, key=key, hash=content_hash(depth), shape=list(depth.shape))
+
+    # Write both files under temporary names and move them in place atomically, with the layout of compact codes
+    with open(data_path + ".tmp", "wb") as file:
+        if isinstance(depth, compact.CompactDepth):
+            record["layout"] = compact.write_compact(file, depth)
+        else:
+            np.save(file, np.ascontiguousarray(depth, dtype=np.float32))
+    with open(meta_path + ".tmp", "w") as file:
+        json.dump(record, file)
+    os.replace(data_path + ".tmp", data_path)
+    os.replace(meta_path + ".tmp", meta_path)
+
+    # Hash the blocks while the depth map is in memory, so that later edits can be compared cheaply
+    store_block_hashes(key, block_hashes(depth), cache_dir)
+
+    # Make room for the new files by evicting the depth maps used longest ago, such as older versions of the image
+    prune_cache(cache_dir, keep=(key,))
+
+    # Return the metadata record
+    return record
+
+# Define a function to read a depth map from its sidecar file
+def read_depth(key, cache_dir=None):
+    """Read a depth map from its sidecar file as a memory-mapped array.
+
+    Args:
+        key (str): The cache key.
+        cache_dir (str): The cache directory, or None for the default.
+
+    Returns:
+        tuple: The memory-mapped depth map, a compact.CompactDepth for compact encodings,
+            and its metadata record, or (None, None) when missing.
+    """
+
+    # Return nothing when either file is missing
+    data_path, meta_path = sidecar_paths(key, cache_dir)
+    if not os.path.exists(data_path) or not os.path.exists(meta_path):
+        return None, None
+
+    # Read the metadata and map the data file
+    try:
+        with open(meta_path) as file:
+            record = json.load(file)
+        if "layout" in record:
+            depth = compact.open_compact(data_path, record["layout"], record["shape"])
+        else:
+            depth = np.load(data_path, mmap_mode="r")
+    except (OSError, ValueError) as e:
+        # Treat unreadable sidecar files as missing
+        logging.warning(f"Ignoring unreadable depth map cache {data_path}: {e}")
+        return None, None
+
+    # Mark the depth map as used, so that pruning the cache evicts it last
+    touch(meta_path)
+
+    # Return the depth map and its metadata record
+    return depth, record
+
+# Define a function to mark a cache file as used
+def touch(path):
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+# Define a function to evict the files used longest ago from the cache directory
+def prune_cache(cache_dir=None, max_bytes=None, keep=()):
+    """Evict the cached files used longest ago until the cache directory fits its byte budget.
+
+    The files of a key are evicted together. Every edit of an image, filter
+    change or encoding leaves the files of a new key behind, so without this
+    the cache would only grow. A key is last used when any of its files was
+    last written or touched.
+
+    Args:
+        cache_dir (str): The cache directory, or None for the default.
+        max_bytes (int): The byte budget, or None for cache_budget(). 0 means no limit.
+        keep (tuple): The keys that are never evicted, such as the one just stored.
+
+    Returns:
+        int: The number of bytes freed.
+    """
+
+    # Leave the cache alone without a budget
+    max_bytes = cache_budget() if max_bytes is None else max_bytes
+    if max_bytes <= 0:
+        return 0
+
+    # Group the files of the cache directory by key, skipping files being written and subdirectories
+    directory = cache_dir or default_cache_dir()
+    entries = {}
+    try:
+        with os.scandir(directory) as scan:
+            for entry in scan:
+                if entry.name.endswith(".tmp") or not entry.is_file():
+                    continue
+                try:
+                    info = entry.stat()
+                except OSError:
+                    continue
+                key = entry.name.split(".", 1)[0]
+                files, size, used = entries.get(key, ([], 0, 0))
+                entries[key] = (files + [entry.path], size + info.st_size, max(used, info.st_mtime_ns))
+    except OSError:
+        return 0
+
+    # Evict the keys used longest ago until the rest fits, skipping files that another process still holds open
+    total = sum(size for _, size, _ in entries.values())
+    freed = 0
+    for key, (files, size, _) in sorted(entries.items(), key=lambda item: item[1][2]):
+        if total - freed <= max_bytes:
+            break
+        if key in keep:
+            continue
+        for path in files:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logging.debug(f"Could not evict cache file {path}: {e}")
+        freed += size
+        logging.info(f"Evicted cached depth map {key} of {size} bytes")
+
+    # Return the number of bytes freed
+    return freed
+
+# Define a function to write the block hashes of a depth map
+def store_block_hashes(key, hashes, cache_dir=None):
+    """Write the block hashes of a depth map next to its sidecar files.
+
+    Args:
+        key (str): The cache key.
+        hashes (numpy.ndarray): The hashes returned by block_hashes.
+        cache_dir (str): The cache directory, or None for the default.
+
+    Returns:
+        None.
+    """
+
+    # Write the file under a temporary name and move it in place atomically
+    path = blocks_path(key, cache_dir)
+    with open(path + ".tmp", "wb") as file:
+        np.save(file, hashes)
+    os.replace(path + ".tmp", path)
+
+# Define a function to read the block hashes of a cached depth map
+def read_block_hashes(key, cache_dir=None):
+    """Read the block hashes of a cached depth map, computing them for sidecars written without them.
+
+    Args:
+        key (str): The cache key.
+        cache_dir (str): The cache directory, or None for the default.
+
+    Returns:
+        numpy.ndarray: The block hashes, or None when the depth map is not cached.
+    """
+
+    # Read the stored hashes when they exist
+    path = blocks_path(key, cache_dir)
+    try:
+        return np.load(path)
+    except (OSError, ValueError):
+        pass
+
+    # Otherwise hash the cached depth map and store the hashes for next time
+    depth, _ = read_depth(key, cache_dir)
+    if depth is None:
+        return None
+    hashes = block_hashes(depth)
+    store_block_hashes(key, hashes, cache_dir)
+    return hashes
+
+# Define a function to find the blocks that differ between two cached depth maps
+def dirty_blocks(old_key, new_key, cache_dir=None):
+    """Find the blocks that differ between two cached versions of a depth map.
+
+    Args:
+        old_key (str): The cache key of the earlier version.
+        new_key (str): The cache key of the current version.
+        cache_dir (str): The cache directory, or None for the default.
+
+    Returns:
+        numpy.ndarray: The (block row, block column) of every changed block,
+            or None when the versions cannot be compared.
+    """
+
+    # Compare the hashes of both versions, which must have the same shape
+    old, new = read_block_hashes(old_key, cache_dir), read_block_hashes(new_key, cache_dir)
+    if old is None or new is None or old.shape != new.shape:
+        return None
+    return np.argwhere(old != new)
+
+# Define a function to load the depth map of an image file through the sidecar cache
+def load_depth(path, channel=0, cache_dir=None, encoding="float32", compress=False, trace=False):
+    """Load the depth map of an image file through the sidecar cache.
+
+    The image is only decoded when no sidecar file exists for its current
+    path, mtime and size; otherwise the cached depth map is memory-mapped.
+
+    Args:
+        path (str): The path of the image file.
+        channel (int): The channel that holds the depth values.
+        cache_dir (str): The cache directory, or None for the default.
+        encoding (str): One of compact.ENCODINGS, in which the depth map is cached and returned.
+        compress (bool): Whether to compress every band of codes.
+        trace (bool): Whether to record the peak of traced allocations while decoding the image.
+
+    Returns:
+        tuple: The depth map and its metadata record with the key and content hash.
+    """
+
+    # Look up the sidecar file of the current version of the image in the chosen encoding
+    key = encoded_key(cache_key(path, channel), encoding, compress)
+    depth, record = read_depth(key, cache_dir)
+
+    # Return the cached depth map when there is one
+    if depth is not None:
+        return depth, record
+
+    # Otherwise decode the image and store its depth map for next time
+    depth, stats = ingest.load_depth(path, channel, trace)
+    record = store_depth(key, depth, cache_dir, encoding, compress, path=os.path.abspath(path), channel=channel)
+
+    # Hand out the compact depth map instead of the decoded one, so that only the codes stay in memory
+    if "layout" in record:
+        depth, _ = read_depth(key, cache_dir)
+
+    # Return the decoded depth map with the ingestion statistics
+    return depth, dict(record, stats=stats)
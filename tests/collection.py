@@ -0,0 +1,22 @@
+"""Collect the add-on folder as a plain directory, so pytest never imports its Blender entry point."""
+
+# Import the necessary modules
+import pytest
+
+# Define a function to collect the add-on folder without importing its __init__.py
+@pytest.hookimpl(tryfirst=True)
+def pytest_collect_directory(path, parent):
+    """Collect the root folder as a plain directory instead of a package.
+
+    Args:
+        path (pathlib.Path): The directory being collected.
+        parent (pytest.Collector): The parent collector.
+
+    Returns:
+        pytest.Dir: The directory collector for the root folder, or None for any other directory.
+    """
+
+    # Leave every other directory to the default collectors
+    if path == parent.config.rootpath:
+        return pytest.Dir.from_parent(parent, path=path)
+    return None
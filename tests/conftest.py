@@ -0,0 +1,19 @@
+# Import the necessary modules
+import numpy as np
+import pytest
+
+# Define a fixture with a depth map that has smooth slopes, a step edge and fine noise
+@pytest.fixture
+def depth():
+    rows, cols = np.mgrid[0:37, 0:53].astype(np.float32)
+    depth = 0.5 + 0.2 * np.sin(rows / 6) * np.cos(cols / 9)
+    depth[:, 30:] += 0.25
+    depth += np.random.default_rng(0).normal(0, 0.002, depth.shape).astype(np.float32)
+    return depth.astype(np.float32)
+
+# Define a fixture that keeps the sidecar files of a test in its own directory
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    path = str(tmp_path / "cache")
+    monkeypatch.setenv("DEPTHIFY_CACHE_DIR", path)
+    return path
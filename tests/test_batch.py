@@ -0,0 +1,25 @@
+# Import the necessary modules
+import numpy as np
+
+import batch
+
+# Define a function to test that the exit status reports failed files
+def test_direct_exit_status(depth, cache_dir, tmp_path):
+    inputs, output = tmp_path / "inputs", tmp_path / "meshes"
+    inputs.mkdir()
+    np.save(inputs / "a.npy", depth)
+    assert batch.main(["--input", str(inputs), "--output", str(output), "--format", "ply", "--direct"]) == 0
+
+    # Add a file that cannot be decoded, which fails on the next run while the first one is skipped
+    (inputs / "b.npy").write_bytes(b"not an array")
+    assert batch.main(["--input", str(inputs), "--output", str(output), "--format", "ply", "--direct"]) == 1
+    assert (output / "a.ply").exists() and not (output / "b.ply").exists()
+
+# Define a function to test that files without a record count as failures, as the files of a crashed worker do
+def test_count_failures(tmp_path):
+    batch.write_manifest(str(tmp_path), {"input": "a.png", "output": "a.ply", "status": "ok", "error": None,
+                                         "mtime": 0.0, "seconds": 0.0})
+    batch.write_manifest(str(tmp_path), {"input": "b.png", "output": "b.ply", "status": "failed", "error": "bad",
+                                         "mtime": 0.0, "seconds": 0.0})
+    assert batch.count_failures(["a.png"], str(tmp_path)) == 0
+    assert batch.count_failures(["a.png", "b.png", "c.png"], str(tmp_path)) == 2
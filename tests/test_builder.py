@@ -0,0 +1,102 @@
+# Import the necessary modules
+import time
+
+import numpy as np
+import pytest
+
+import builder
+import compact
+import geometry
+
+# Define a function to test that the grid arrays match the serial grid with normals and UVs for every loop
+@pytest.mark.parametrize("downsample", [1, 2])
+def test_grid_arrays(depth, downsample):
+    arrays = builder.build_surface_arrays(depth, 2.0, downsample, workers=2)
+    reduced = geometry.downsample(depth, downsample)
+    vertices, faces = geometry.build_grid(reduced.shape[1], reduced.shape[0], reduced, 2.0, downsample)
+    np.testing.assert_array_equal(arrays["vertices"], vertices)
+    np.testing.assert_array_equal(arrays["faces"], faces)
+    assert arrays["normals"].shape == vertices.shape and arrays["uvs"].shape == (faces.size, 2)
+    assert arrays["face_sizes"] is None and arrays["lods"] == []
+
+# Define a function to test the adaptive arrays and their levels of detail
+def test_adaptive_arrays(depth):
+    arrays = builder.build_surface_arrays(depth, 10.0, geometry_mode='ADAPTIVE', error_tolerance=0.05, lod_levels=2)
+    assert arrays["stats"]["max_error"] <= 0.05
+    assert arrays["uvs"].shape == (arrays["face_sizes"].sum(), 2)
+    assert len(arrays["lods"]) == 2
+    assert all(len(lod["vertices"]) <= len(arrays["vertices"]) for lod in arrays["lods"])
+
+# Define a function to test the plane of the displacement-only mode
+def test_displacement_arrays(depth):
+    arrays = builder.build_surface_arrays(depth, geometry_mode='DISPLACEMENT', downsample=2)
+    height, width = depth.shape
+    assert arrays["dicing_levels"] == geometry.dicing_levels(width, height, downsample=2)
+    assert np.ptp(arrays["vertices"][:, 2]) == 0
+
+# Define a function to test that many images are built in order with their failures
+def test_iter_surface_arrays(depth, cache_dir, tmp_path):
+    paths = []
+    for index in range(5):
+        paths.append(str(tmp_path / f"image_{index}.npy"))
+        np.save(paths[-1], depth + index)
+    paths.insert(2, str(tmp_path / "missing.npy"))
+    results = list(builder.iter_surface_arrays(paths, settings={"downsample": 3}, max_resident=2, workers=2))
+    assert [index for index, *_ in results] == list(range(6))
+    assert results[2][3] is None and results[2][4] is not None
+    for index, path, record, arrays, error in results[:2] + results[3:]:
+        assert error is None and record["path"] == path
+        expected = builder.build_surface_arrays(np.load(path), downsample=3)
+        np.testing.assert_array_equal(arrays["vertices"], expected["vertices"])
+
+# Define a function to test that every geometry mode builds from every encoding of the depth map
+@pytest.mark.parametrize("geometry_mode", ['GRID', 'ADAPTIVE', 'DISPLACEMENT'])
+@pytest.mark.parametrize("encoding, compress", [("float32", False), ("float16", False), ("uint16", False),
+                                                ("uint16", True)])
+@pytest.mark.parametrize("downsample, lod_levels", [(1, 0), (1, 2), (2, 1)])
+def test_compact_encodings(depth, geometry_mode, encoding, compress, downsample, lod_levels):
+    encoded = compact.compact_depth(depth, encoding, compress, band_rows=8)
+    arrays = builder.build_surface_arrays(encoded, 10.0, downsample, geometry_mode, 0.05, lod_levels=lod_levels)
+    expected = builder.build_surface_arrays(np.asarray(encoded), 10.0, downsample, geometry_mode, 0.05,
+                                            lod_levels=lod_levels)
+    np.testing.assert_array_equal(arrays["vertices"], expected["vertices"])
+    np.testing.assert_array_equal(arrays["faces"], expected["faces"])
+    assert len(arrays["lods"]) == (lod_levels if geometry_mode != 'DISPLACEMENT' else 0)
+
+# Define a function to test that duplicate depth maps are built once and handed to their first image
+@pytest.mark.parametrize("workers", [1, 4])
+def test_iter_surface_arrays_skips_duplicates(depth, cache_dir, tmp_path, monkeypatch, workers):
+    paths = []
+    for index, offset in enumerate([0, 1, 0, 0, 1, 2]):
+        paths.append(str(tmp_path / f"image_{index}.npy"))
+        np.save(paths[-1], depth + offset)
+
+    # Count the builds, and slow the first image down so that its duplicates finish loading first
+    builds = []
+    build_surface_arrays, load_depth = builder.build_surface_arrays, builder.preprocess.load_depth
+    def counted_build(*args, **kwargs):
+        builds.append(1)
+        return build_surface_arrays(*args, **kwargs)
+    def slow_load(path, *args):
+        time.sleep(0.2 if path == paths[0] else 0.0)
+        return load_depth(path, *args)
+    monkeypatch.setattr(builder, "build_surface_arrays", counted_build)
+    monkeypatch.setattr(builder.preprocess, "load_depth", slow_load)
+    results = list(builder.iter_surface_arrays(paths, max_resident=4, workers=workers, skip_duplicates=True))
+
+    # Check that every depth map is built once and handed to the first of its images
+    assert [arrays is not None for _, _, _, arrays, _ in results] == [True, True, False, False, False, True]
+    assert len(builds) == 3 and all(error is None for *_, error in results)
+    assert results[3][2]["hash"] == results[0][2]["hash"] and results[4][2]["hash"] == results[1][2]["hash"]
+    np.testing.assert_array_equal(results[0][3]["vertices"], builder.build_surface_arrays(depth)["vertices"])
+
+# Define a function to test that a failed build fails the first image and leaves its duplicates without arrays
+def test_iter_surface_arrays_failed_duplicate(depth, cache_dir, tmp_path, monkeypatch):
+    paths = []
+    for index in range(3):
+        paths.append(str(tmp_path / f"image_{index}.npy"))
+        np.save(paths[-1], depth)
+    monkeypatch.setattr(builder, "build_surface_arrays", lambda *args, **kwargs: 1 / 0)
+    results = list(builder.iter_surface_arrays(paths, workers=2, skip_duplicates=True))
+    assert isinstance(results[0][4], ZeroDivisionError)
+    assert [(arrays, error) for _, _, _, arrays, error in results[1:]] == [(None, None), (None, None)]
@@ -0,0 +1,44 @@
+# Import the necessary modules
+import cache
+
+# Define a function to test that the surface key follows the geometry parameters only
+def test_surface_key():
+    key = cache.surface_key("abc", 2, 'CATMULL_CLARK', 10.0, 1, 'GRID')
+    assert key == cache.surface_key("abc", 2, 'CATMULL_CLARK', 10.0000000001, 1, 'GRID')
+    assert key != cache.surface_key("abc", 3, 'CATMULL_CLARK', 10.0, 1, 'GRID')
+    assert key != cache.surface_key("abc", 2, 'CATMULL_CLARK', 10.0, 1, 'ADAPTIVE')
+    assert key != cache.surface_key("abd", 2, 'CATMULL_CLARK', 10.0, 1, 'GRID')
+
+# Define a function to test the eviction by entry count in least recently used order
+def test_lru_evicts_by_entries():
+    evicted = []
+    lru = cache.LRUCache(max_entries=2, on_evict=lambda key, value: evicted.append(key))
+    lru.put("a", 1)
+    lru.put("b", 2)
+    assert lru.get("a") == 1
+    lru.put("c", 3)
+    assert evicted == ["b"] and "a" in lru and "c" in lru
+    assert lru.get("b") is None
+    assert lru.stats() == {"entries": 2, "bytes": 0, "hits": 1, "misses": 1, "evictions": 1}
+
+# Define a function to test the eviction by bytes, which always keeps the newest entry
+def test_lru_evicts_by_bytes():
+    evicted = []
+    lru = cache.LRUCache(max_bytes=100, on_evict=lambda key, value: evicted.append(key))
+    lru.put("a", 1, 60)
+    lru.put("b", 2, 30)
+    lru.put("c", 3, 500)
+    assert evicted == ["a", "b"] and len(lru) == 1 and lru.total_bytes == 500
+
+    # Replace and discard entries without calling the eviction callback
+    lru.put("c", 4, 10)
+    assert lru.discard("c") == 4 and lru.total_bytes == 0 and evicted == ["a", "b"]
+
+# Define a function to test that clearing evicts every entry
+def test_lru_clear():
+    evicted = []
+    lru = cache.LRUCache(on_evict=lambda key, value: evicted.append(value))
+    lru.put("a", 1, 10)
+    lru.put("b", 2, 10)
+    lru.clear()
+    assert evicted == [1, 2] and len(lru) == 0 and lru.total_bytes == 0
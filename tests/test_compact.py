@@ -0,0 +1,75 @@
+# Import the necessary modules
+import numpy as np
+import pytest
+
+import compact
+
+# Define a function to test that every encoding decodes to float32 within its precision
+@pytest.mark.parametrize("encoding", compact.ENCODINGS)
+@pytest.mark.parametrize("compress", [False, True])
+def test_round_trip(depth, encoding, compress):
+    encoded = compact.compact_depth(depth, encoding, compress, band_rows=8)
+    decoded = np.asarray(encoded)
+    assert decoded.dtype == np.float32 and decoded.shape == depth.shape
+    if encoding == "float32":
+        np.testing.assert_array_equal(decoded, depth)
+    elif encoding == "float16":
+        np.testing.assert_array_equal(decoded, depth.astype(np.float16).astype(np.float32))
+    else:
+        assert np.abs(decoded - depth).max() <= encoded.scale / 2 + 1e-6
+
+# Define a function to test that slices decode the same values as the whole depth map
+@pytest.mark.parametrize("compress", [False, True])
+def test_slices(depth, compress):
+    encoded = compact.compact_depth(depth, "uint16", compress, band_rows=8)
+    decoded = np.asarray(encoded)
+    for key in [5, -1, slice(3, 20), slice(None, None, 3), (slice(7, 9), slice(2, 40, 5)), (4, 10),
+                np.array([0, 30, 12]), slice(20, 3)]:
+        np.testing.assert_array_equal(encoded[key], decoded[key])
+    with pytest.raises(IndexError):
+        encoded[len(depth)]
+
+# Define a function to test that compressed bands take less memory than the codes
+def test_encoded_bytes():
+    flat = np.full((64, 64), 0.5, dtype=np.float32)
+    assert compact.compact_depth(flat, "uint16").encoded_bytes == flat.nbytes // 2
+    assert compact.compact_depth(flat, "uint16", compress=True).encoded_bytes < flat.nbytes // 10
+
+# Define a function to test that values that are not finite decode as holes
+@pytest.mark.parametrize("encoding", ["float16", "uint16"])
+def test_holes_round_trip(depth, encoding):
+    holey = depth.copy()
+    holey[3, 4] = np.nan
+    holey[20, 7] = np.inf
+    holey[0, 0] = depth.min() - 1
+    decoded = np.asarray(compact.compact_depth(holey, encoding))
+    np.testing.assert_array_equal(np.isfinite(decoded), np.isfinite(holey))
+    assert decoded[0, 0] == pytest.approx(holey[0, 0], abs=1e-3)
+    if encoding == "uint16":
+        assert np.isnan(decoded[20, 7])
+        assert compact.encode(holey, encoding, *compact.quantization(holey)).max() == compact.NAN_CODE
+
+# Define a function to test that the quantized range ignores values that are not finite
+def test_quantization():
+    depth = np.array([[np.nan, 1.0], [3.0, np.inf]], dtype=np.float32)
+    scale, offset = compact.quantization(depth)
+    assert offset == 1.0 and scale == pytest.approx(2.0 / compact.MAX_CODE)
+    assert compact.quantization(np.full((2, 2), np.nan, np.float32)) == (1.0, 0.0)
+    assert compact.quantization(np.ones((2, 2), np.float32)) == (1.0, 1.0)
+
+# Define a function to test that a written depth map maps back from its file
+@pytest.mark.parametrize("encoding, compress", [("float16", False), ("uint16", True)])
+def test_write_and_open(depth, tmp_path, encoding, compress):
+    encoded = compact.compact_depth(depth, encoding, compress, band_rows=8)
+    path = str(tmp_path / "depth.npy")
+    with open(path, "wb") as file:
+        layout = compact.write_compact(file, encoded)
+    opened = compact.open_compact(path, layout, depth.shape)
+    np.testing.assert_array_equal(np.asarray(opened), np.asarray(encoded))
+    np.testing.assert_array_equal(opened[10:12], np.asarray(encoded)[10:12])
+
+# Define a function to test the accuracy report against float32
+def test_accuracy_report(depth):
+    report = {row["encoding"]: row for row in compact.accuracy_report(depth)}
+    assert report["float32"]["max_error"] == 0.0
+    assert 0 < report["uint16"]["max_error"] < 1e-4
@@ -0,0 +1,106 @@
+# Import the necessary modules
+import io
+import json
+import struct
+
+import numpy as np
+import pytest
+
+import export
+import geometry
+
+# Define a function to write a depth map to bytes with one of the writers
+def written(writer, depth, downsample=1, band_rows=export.BAND_ROWS):
+    file = io.BytesIO()
+    counts = writer(file, depth, downsample, geometry.DEPTH_SCALE, band_rows)
+    return file.getvalue(), counts
+
+# Define a function to test that the bands add up to the full grid
+@pytest.mark.parametrize("downsample", [1, 2])
+def test_bands_match_grid(depth, downsample):
+    reduced = geometry.downsample(depth, downsample)
+    expected_vertices, expected_faces = geometry.build_grid(reduced.shape[1], reduced.shape[0], reduced,
+                                                            spacing=downsample)
+    bands = list(export.iter_bands(depth, downsample, band_rows=5))
+    np.testing.assert_array_equal(np.concatenate([vertices for _, vertices, _ in bands]), expected_vertices)
+    np.testing.assert_array_equal(np.concatenate([faces for _, _, faces in bands]), expected_faces)
+
+# Define a function to test that every writer gives the same file whatever the band size
+@pytest.mark.parametrize("writer", [export.write_ply, export.write_stl, export.write_obj, export.write_glb])
+def test_band_size_does_not_change_file(depth, writer):
+    assert written(writer, depth, band_rows=4) == written(writer, depth, band_rows=1000)
+
+# Define a function to test the vertices and faces of the PLY file
+def test_ply_contents(depth):
+    data, (vertex_count, face_count) = written(export.write_ply, depth)
+    height, width = depth.shape
+    assert (vertex_count, face_count) == (width * height, (width - 1) * (height - 1))
+    body = data[data.index(b"end_header\n") + len(b"end_header\n"):]
+    vertices = np.frombuffer(body[:vertex_count * 12], dtype="<f4").reshape(-1, 3)
+    faces = np.frombuffer(body[vertex_count * 12:], dtype=[("count", "u1"), ("indices", "<i4", 4)])
+    expected_vertices, expected_faces = geometry.build_grid(width, height, depth)
+    np.testing.assert_array_equal(vertices, expected_vertices)
+    np.testing.assert_array_equal(faces["indices"], expected_faces)
+    assert (faces["count"] == 4).all()
+
+# Define a function to test the triangle count and layout of the STL and glTF files
+def test_stl_and_glb_sizes(depth):
+    height, width = depth.shape
+    triangles = 2 * (width - 1) * (height - 1)
+    data, counts = written(export.write_stl, depth)
+    assert counts == (width * height, triangles)
+    assert struct.unpack("<I", data[80:84])[0] == triangles and len(data) == 84 + 50 * triangles
+
+    # Check the header and the accessors of the glTF file
+    data, counts = written(export.write_glb, depth)
+    magic, version, length = struct.unpack("<III", data[:12])
+    assert (magic, version, length) == (0x46546C67, 2, len(data))
+    text_length = struct.unpack("<I", data[12:16])[0]
+    document = json.loads(data[20:20 + text_length])
+    assert document["accessors"][1]["count"] == 3 * triangles
+
+# Define a function to test that every quad becomes two triangles with the same winding
+def test_triangulate():
+    np.testing.assert_array_equal(export.triangulate(np.array([[0, 1, 2, 3]])), [[0, 1, 2], [0, 2, 3]])
+
+# Define a function to test the export by file extension
+def test_export_depth(depth, tmp_path):
+    path = str(tmp_path / "surface.obj")
+    assert export.export_depth(path, depth, downsample=4) == (10 * 14, 9 * 13)
+    assert open(path, "rb").read().count(b"\nf ") == 9 * 13
+    with pytest.raises(ValueError):
+        export.export_depth(str(tmp_path / "surface.fbx"), depth)
+
+# Define a function to read the JSON chunk and the binary chunk of a glTF file
+def read_glb(data):
+    text_length = struct.unpack("<I", data[12:16])[0]
+    document = json.loads(data[20:20 + text_length], parse_constant=lambda name: pytest.fail(f"{name} in glTF"))
+    return document, data[20 + text_length + 8:]
+
+# Define a function to test that holes give finite bounds and leave out the triangles that touch them
+def test_glb_holes(depth):
+    holey = depth.copy()
+    holey[10, 20] = np.nan
+    holey[0, :] = np.inf
+    data, (vertex_count, triangle_count) = written(export.write_glb, holey)
+    document, binary = read_glb(data)
+    positions = np.frombuffer(binary[:vertex_count * 12], dtype="<f4").reshape(-1, 3)
+    indices = np.frombuffer(binary[vertex_count * 12:], dtype="<u4").reshape(-1, 3)
+    assert np.isfinite(positions).all()
+    np.testing.assert_allclose(document["accessors"][0]["min"], positions.min(axis=0), rtol=1e-6)
+    np.testing.assert_allclose(document["accessors"][0]["max"], positions.max(axis=0), rtol=1e-6)
+
+    # Check that only the triangles touching a hole are left out, whatever the band size
+    height, width = depth.shape
+    assert triangle_count == len(indices) == 2 * (width - 1) * (height - 2) - 6
+    assert not np.isin(indices, [10 * width + 20] + list(range(width))).any()
+    assert written(export.write_glb, holey, band_rows=3) == (data, (vertex_count, triangle_count))
+
+# Define a function to test that a grid one vertex wide or tall is written as points without an empty buffer view
+@pytest.mark.parametrize("shape", [(1, 7), (5, 1), (1, 1)])
+def test_glb_points(shape):
+    data, counts = written(export.write_glb, np.full(shape, 0.5, dtype=np.float32))
+    document, binary = read_glb(data)
+    assert counts == (shape[0] * shape[1], 0) and len(binary) == 12 * counts[0]
+    assert document["meshes"][0]["primitives"] == [{"attributes": {"POSITION": 0}, "mode": 0}]
+    assert len(document["accessors"]) == 1 and all(view["byteLength"] > 0 for view in document["bufferViews"])
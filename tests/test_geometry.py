@@ -0,0 +1,116 @@
+# Import the necessary modules
+import numpy as np
+import pytest
+
+import geometry
+
+# Define a function to build the grid with the per-pixel loop that the array builders replaced
+def loop_grid(width, height, depth_map):
+    vertices, faces = [], []
+    for row in range(height):
+        for col in range(width):
+            vertices.append((col - width / 2, row - height / 2, depth_map[row * width + col] * 10))
+            if row > 0 and col > 0:
+                faces.append([(row - 1) * width + (col - 1), (row - 1) * width + col,
+                              row * width + col, row * width + (col - 1)])
+    return np.array(vertices, dtype=np.float32), np.array(faces, dtype=np.int32).reshape(-1, 4)
+
+# Define a function to test that the grid matches the per-pixel loop
+@pytest.mark.parametrize("width, height", [(1, 1), (1, 5), (7, 1), (8, 5), (53, 37)])
+def test_grid_matches_loop(width, height):
+    depth_map = np.random.default_rng(1).random(width * height).astype(np.float32)
+    vertices, faces = geometry.build_grid(width, height, depth_map)
+    expected_vertices, expected_faces = loop_grid(width, height, depth_map)
+    np.testing.assert_allclose(vertices, expected_vertices, rtol=1e-6)
+    np.testing.assert_array_equal(faces, expected_faces)
+    assert vertices.dtype == np.float32 and faces.dtype == np.int32
+    assert vertices.flags.c_contiguous and faces.flags.c_contiguous
+
+# Define a function to test that downsampling averages every block, including partial ones
+def test_downsample_averages_partial_blocks():
+    depth = np.arange(35, dtype=np.float32).reshape(5, 7)
+    reduced = geometry.downsample(depth, 3)
+    assert reduced.shape == (2, 3)
+    assert reduced[0, 0] == pytest.approx(depth[:3, :3].mean())
+    assert reduced[1, 2] == pytest.approx(depth[3:, 6:].mean())
+    assert geometry.downsample(depth, 1) is not None and np.array_equal(geometry.downsample(depth, 1), depth)
+
+# Define a function to test the normals of a tilted plane
+def test_grid_normals_of_plane():
+    rows, cols = np.mgrid[0:6, 0:9].astype(np.float32)
+    normals = geometry.grid_normals(0.5 * cols + 0.25 * rows, spacing=1.0)
+    expected = np.array([-0.5, -0.25, 1.0]) / np.linalg.norm([-0.5, -0.25, 1.0])
+    np.testing.assert_allclose(normals.reshape(-1, 3), np.broadcast_to(expected, (54, 3)), atol=1e-6)
+
+# Define a function to test that the UVs put every vertex on the middle of its pixels
+def test_surface_attributes_uvs(depth):
+    height, width = depth.shape
+    vertices, faces = geometry.build_grid(width, height, depth)
+    normals, uvs = geometry.surface_attributes(vertices, faces, depth * 10, depth.shape)
+    assert normals.shape == vertices.shape and uvs.shape == (faces.size, 2)
+    np.testing.assert_allclose(uvs[0], [0.5 / width, 0.5 / height], rtol=1e-6)
+    np.testing.assert_allclose(np.linalg.norm(normals, axis=1), 1.0, rtol=1e-5)
+
+# Define a function to test that every level of the pyramid halves the one before
+def test_depth_pyramid(depth):
+    pyramid = geometry.depth_pyramid(depth, 3)
+    assert [level.shape for level in pyramid] == [(19, 27), (10, 14), (5, 7)]
+    np.testing.assert_allclose(pyramid[0], geometry.downsample(depth, 2))
+
+# Define a function to interpolate an adaptive mesh back onto every pixel
+def rasterize_cells(cells, depth):
+    surface = np.empty_like(depth)
+    for r0, r1, c0, c1 in cells:
+        corners = depth[np.ix_([r0, r1], [c0, c1])]
+        v = np.linspace(0, 1, r1 - r0 + 1)[:, None]
+        u = np.linspace(0, 1, c1 - c0 + 1)[None, :]
+        top = corners[0, 0] + (corners[0, 1] - corners[0, 0]) * u
+        bottom = corners[1, 0] + (corners[1, 1] - corners[1, 0]) * u
+        surface[r0:r1 + 1, c0:c1 + 1] = top + (bottom - top) * v
+    return surface
+
+# Define a function to test that the quadtree cells tile the depth map within the tolerance
+@pytest.mark.parametrize("tolerance", [0.001, 0.01, 0.05])
+def test_quadtree_error_within_tolerance(depth, tolerance):
+    cells, max_error = geometry.quadtree_cells(depth, tolerance)
+    assert max_error <= tolerance
+    assert np.abs(rasterize_cells(cells, depth) - depth).max() <= tolerance + 1e-6
+
+    # Check that the cells cover every quad of the grid exactly once
+    covered = np.zeros((depth.shape[0] - 1, depth.shape[1] - 1), dtype=np.int32)
+    for r0, r1, c0, c1 in cells:
+        covered[r0:r1, c0:c1] += 1
+    assert (covered == 1).all()
+
+# Define a function to test the adaptive mesh against the full grid
+def test_build_adaptive(depth):
+    height, width = depth.shape
+    vertices, faces, sizes, stats = geometry.build_adaptive(width, height, depth, 0.1)
+    assert stats["max_error"] <= 0.1
+    assert len(vertices) < width * height and len(sizes) < (width - 1) * (height - 1)
+    assert sizes.sum() == len(faces) and (sizes >= 4).all()
+    assert faces.max() < len(vertices)
+    assert stats["triangles"] == int((sizes - 2).sum())
+
+# Define a function to test that a flat depth map collapses to a single face
+def test_build_adaptive_flat():
+    vertices, faces, sizes, stats = geometry.build_adaptive(20, 10, np.full((10, 20), 0.3, np.float32), 0.01)
+    assert len(vertices) == 4 and list(sizes) == [4]
+    assert stats["max_error"] == 0.0
+
+# Define a function to test the plane of the displacement-only mode
+def test_build_plane():
+    vertices, faces, uvs = geometry.build_plane(640, 480)
+    segments_x, segments_y = geometry.plane_segments(640, 480)
+    assert len(vertices) == (segments_x + 1) * (segments_y + 1) and len(faces) == segments_x * segments_y
+    assert np.ptp(vertices[:, 2]) == 0
+    assert geometry.dicing_levels(640, 480) >= geometry.dicing_levels(640, 480, downsample=4)
+
+# Define a function to test that the triangulated adaptive mesh stays within its triangle budget
+@pytest.mark.parametrize("max_triangles", [2, 3, 10, 50, 200, 1000])
+def test_build_adaptive_triangle_budget(depth, max_triangles):
+    height, width = depth.shape
+    vertices, faces, sizes, stats = geometry.build_adaptive(width, height, depth, 0.001, max_triangles)
+    assert sizes.sum() - 2 * len(sizes) <= max_triangles
+    assert stats["triangles"] <= max_triangles
+    assert stats["triangles"] > max_triangles // 2 or max_triangles < 10
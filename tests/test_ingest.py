@@ -0,0 +1,32 @@
+# Import the necessary modules
+import threading
+import tracemalloc
+
+import numpy as np
+
+import ingest
+
+# Define a function to test that allocations are only traced when asked for
+def test_load_depth_trace(depth, tmp_path):
+    path = str(tmp_path / "depth.npy")
+    np.save(path, depth)
+    loaded, stats = ingest.load_depth(path)
+    np.testing.assert_array_equal(loaded, depth)
+    assert stats["decoder"] == "numpy" and stats["peak_bytes"] is None and not tracemalloc.is_tracing()
+    _, stats = ingest.load_depth(path, trace=True)
+    assert stats["peak_bytes"] > 0 and not tracemalloc.is_tracing()
+
+# Define a function to test that worker threads never start or stop tracing
+def test_load_depth_trace_in_thread(depth, tmp_path):
+    path = str(tmp_path / "depth.npy")
+    np.save(path, depth)
+    results = []
+    thread = threading.Thread(target=lambda: results.append(ingest.load_depth(path, trace=True)))
+    tracemalloc.start()
+    try:
+        thread.start()
+        thread.join()
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+    assert results[0][1]["peak_bytes"] is None
@@ -0,0 +1,36 @@
+# Import the necessary modules
+import planner
+
+# Define the geometry settings of a grid build at full resolution
+SETTINGS = {"downsample": 1, "geometry_mode": 'GRID'}
+
+# Define a function to test the estimate of a grid with subdivision levels
+def test_estimate_grid():
+    estimate = planner.estimate_build((101, 201), subdivisions=2)
+    assert estimate["vertices"] == 101 * 201 and estimate["faces"] == 100 * 200
+    assert estimate["evaluated_faces"] == 100 * 200 * 16
+    assert planner.estimate_build((101, 201), downsample=2)["vertices"] == 51 * 101
+
+# Define a function to test that a budget caps the subdivision levels before the resolution
+def test_plan_caps_subdivisions_first():
+    max_faces = planner.estimate_build((512, 512), subdivisions=1)["evaluated_faces"]
+    plan = planner.plan_build((512, 512), SETTINGS, 3, max_faces=max_faces)
+    assert plan["fits"] and plan["reduced"]
+    assert plan["subdivisions"] == 1 and plan["settings"]["downsample"] == 1 and plan["max_subdivisions"] == 1
+
+# Define a function to test that the resolution drops when the base mesh alone is over budget
+def test_plan_raises_downsample():
+    plan = planner.plan_build((512, 512), SETTINGS, 2, max_bytes=16 * 2**20)
+    assert plan["fits"] and plan["subdivisions"] == 0 and plan["settings"]["downsample"] > 1
+    assert planner.within_budget(plan["estimate"], max_bytes=16 * 2**20)
+    assert "Reduced" in plan["message"]
+
+    # Keep the resolution of meshes that are already built
+    fixed = planner.plan_build((512, 512), SETTINGS, 2, max_bytes=16 * 2**20, fixed_downsample=True)
+    assert not fixed["fits"] and fixed["settings"]["downsample"] == 1 and "Over budget" in fixed["message"]
+
+# Define a function to test that a plan without budgets changes nothing
+def test_plan_without_budget():
+    plan = planner.plan_build((64, 64), SETTINGS, 2)
+    assert plan["fits"] and not plan["reduced"] and plan["subdivisions"] == 2
+    assert plan["max_subdivisions"] == planner.MAX_SUBDIVISIONS and plan["message"].startswith("Estimated")
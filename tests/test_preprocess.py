@@ -0,0 +1,97 @@
+# Import the necessary modules
+import numpy as np
+import pytest
+
+import preprocess
+import storage
+
+# Define a function to test that holes are filled from their surroundings and valid values are kept
+def test_fill_holes(depth):
+    holey = depth.copy()
+    holey[10:14, 20:25] = np.nan
+    holey[30, 5] = 0.0
+    holey[0, 0] = np.inf
+    filled = preprocess.fill_holes(holey)
+    assert np.isfinite(filled).all() and (filled != 0).all()
+    valid = np.isfinite(holey) & (holey != 0)
+    np.testing.assert_array_equal(filled[valid], holey[valid])
+    assert abs(filled[12, 22] - depth[12, 22]) < 0.05
+
+    # Keep zeros as values when asked to, and flatten a map that has nothing to fill from
+    assert preprocess.fill_holes(holey, fill_zeros=False)[30, 5] == 0.0
+    assert (preprocess.fill_holes(np.full((3, 4), np.nan)) == 0).all()
+
+# Define a function to test that the median filter removes spikes without moving a step
+def test_median_filter():
+    step = np.zeros((20, 30), dtype=np.float32)
+    step[:, 15:] = 1.0
+    spiky = step.copy()
+    spiky[5, 5] = 10.0
+    spiky[12, 20] = -10.0
+    np.testing.assert_array_equal(preprocess.median_filter(spiky, 1), step)
+    np.testing.assert_array_equal(preprocess.median_filter(step, 2), step)
+
+# Define a function to test that the bilateral filter smooths noise but keeps edges
+def test_bilateral_filter(depth):
+    rng = np.random.default_rng(3)
+    step = np.zeros((20, 30), dtype=np.float32)
+    step[:, 15:] = 1.0
+    noisy = step + rng.normal(0, 0.01, step.shape).astype(np.float32)
+    smoothed = preprocess.bilateral_filter(noisy, radius=2, sigma_range=0.05)
+    assert np.abs(smoothed - step).std() < np.abs(noisy - step).std() / 2
+    assert np.abs(smoothed - step).max() < 0.05
+    np.testing.assert_allclose(preprocess.bilateral_filter(np.full((5, 6), 0.3, np.float32)), 0.3, rtol=1e-6)
+
+# Define a function to test the range, gamma and inverse depth conversions
+def test_conversions():
+    depth = np.array([[0.0, 1.0], [3.0, 4.0]], dtype=np.float32)
+    np.testing.assert_allclose(preprocess.normalize_range(depth), [[0, 0.25], [0.75, 1]])
+    assert (preprocess.normalize_range(np.ones((2, 2))) == 0).all()
+    np.testing.assert_allclose(preprocess.gamma_correct(np.array([-1.0, 0.25]), 0.5), [0, 0.5])
+    np.testing.assert_allclose(preprocess.inverse_depth(np.array([[1.0, 2.0, 4.0]])), [[1, 1 / 3, 0]], atol=1e-6)
+
+# Define a function to test the order of the filters and the key that follows them
+def test_filter_chain_and_key():
+    settings = {"fill_holes": True, "denoise": 'MEDIAN', "normalize": True, "conversion": 'GAMMA', "gamma": 2.0}
+    assert [name for name, _, _ in preprocess.filter_chain(settings)] == ["fill_holes", "median", "normalize",
+                                                                          "gamma"]
+    assert preprocess.filter_chain({}) == [] and preprocess.filter_chain({"conversion": 'GAMMA'}) == []
+    key = preprocess.preprocess_key("source", settings)
+    assert key == preprocess.preprocess_key("source", dict(settings, bilateral_radius=5, encoding="uint16"))
+    assert key != preprocess.preprocess_key("source", dict(settings, gamma=2.2))
+    assert key != preprocess.preprocess_key("other", settings)
+
+# Define a function to test that the filtered depth map is cached next to its source
+@pytest.mark.parametrize("encoding", ["float32", "uint16"])
+def test_load_depth(depth, cache_dir, tmp_path, encoding):
+    path = str(tmp_path / "depth.npy")
+    np.save(path, depth)
+    settings = {"denoise": 'MEDIAN', "normalize": True, "encoding": encoding}
+    filtered, record = preprocess.load_depth(path, settings)
+    assert [timing["filter"] for timing in record["timings"]] == ["median", "normalize"]
+    cached, cached_record = preprocess.load_depth(path, settings)
+    assert "timings" not in cached_record and cached_record["hash"] == record["hash"]
+    np.testing.assert_array_equal(np.asarray(cached), np.asarray(filtered))
+    expected, _ = preprocess.preprocess(depth, settings)
+    np.testing.assert_allclose(np.asarray(filtered), expected, atol=2 / 65535)
+
+    # Filter the float32 source, and return the unfiltered depth map in the chosen encoding when no filter runs
+    assert record["source"] == storage.cache_key(path)
+    source, source_record = preprocess.load_depth(path, {"encoding": encoding})
+    assert source_record["key"] == storage.encoded_key(record["source"], encoding)
+
+# Define a function to test that the holes of the source reach the filters in every encoding
+@pytest.mark.parametrize("encoding, compress", [("float16", False), ("uint16", False), ("uint16", True)])
+def test_load_depth_fills_holes(depth, cache_dir, tmp_path, encoding, compress):
+    path = str(tmp_path / "depth.npy")
+    holey = depth.copy()
+    holey[10:14, 20:25] = np.nan
+    np.save(path, holey)
+    filtered, _ = preprocess.load_depth(path, {"fill_holes": True, "encoding": encoding, "compress": compress})
+    expected = preprocess.fill_holes(holey)
+    np.testing.assert_allclose(np.asarray(filtered), expected, atol=1e-3)
+    assert abs(np.asarray(filtered)[12, 22] - depth[12, 22]) < 0.05
+
+    # Keep the holes of an unfiltered depth map as NaN
+    source, _ = preprocess.load_depth(path, {"encoding": encoding, "compress": compress})
+    np.testing.assert_array_equal(np.isnan(np.asarray(source)), np.isnan(holey))
@@ -0,0 +1,47 @@
+# Import the necessary modules
+import numpy as np
+import pytest
+
+import sequence
+
+# Define a fixture with a sequence of numbered depth frames
+@pytest.fixture
+def frames(tmp_path):
+    paths = []
+    for number in (1, 2, 10):
+        paths.append(str(tmp_path / f"depth_{number}.npy"))
+        np.save(paths[-1], np.full((9, 12), number / 10, dtype=np.float32))
+    np.save(tmp_path / "other_3.npy", np.zeros((9, 12), dtype=np.float32))
+    return paths
+
+# Define a function to test that the frames are found in numeric order
+def test_find_frames(frames, tmp_path):
+    assert sequence.find_frames(frames[1]) == frames
+    assert sequence.find_frames(str(tmp_path / "single.npy")) == [str(tmp_path / "single.npy")]
+
+# Define a function to test that the frame cache holds every frame at the grid resolution
+def test_build_cache(frames, cache_dir):
+    calls = []
+    key, record = sequence.build_cache(frames, downsample=2, progress=lambda done, total: calls.append(done))
+    stored = sequence.open_frames(key)
+    assert stored.shape == (3, 5, 6) and stored.dtype == np.float16 and calls == [1, 2, 3]
+    np.testing.assert_allclose(stored[:, 0, 0], [0.1, 0.2, 1.0], rtol=1e-3)
+    assert sequence.build_cache(frames, downsample=2) == (key, record)
+    assert sequence.sequence_key(frames, 1) != key and sequence.open_frames("missing") is None
+
+# Define a function to test that frames of different sizes are refused
+def test_build_cache_size_mismatch(frames, cache_dir):
+    np.save(frames[-1], np.zeros((4, 4), dtype=np.float32))
+    with pytest.raises(ValueError):
+        sequence.build_cache(frames)
+
+# Define a function to test that the player hands out frames and prefetches a bounded ring
+def test_frame_player(frames, cache_dir):
+    key, _ = sequence.build_cache(frames)
+    player = sequence.FramePlayer(sequence.open_frames(key), ring_size=1)
+    try:
+        assert player.get(0)[0] == pytest.approx(0.1, rel=1e-3)
+        assert list(player.ring) == [1]
+        assert player.get(5)[0] == pytest.approx(1.0, rel=1e-3) and len(player.get(-3)) == 9 * 12
+    finally:
+        player.close()
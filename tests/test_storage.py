@@ -0,0 +1,101 @@
+# Import the necessary modules
+import os
+
+import numpy as np
+import pytest
+
+import compact
+import storage
+
+# Define a function to test that a stored depth map reads back memory-mapped with its record
+def test_store_and_read(depth, cache_dir):
+    record = storage.store_depth("key", depth, cache_dir, path="image.png")
+    loaded, loaded_record = storage.read_depth("key", cache_dir)
+    assert isinstance(loaded, np.memmap)
+    np.testing.assert_array_equal(loaded, depth)
+    assert loaded_record == record and record["hash"] == storage.content_hash(depth)
+    assert record["path"] == "image.png" and record["shape"] == list(depth.shape)
+    assert storage.read_depth("missing", cache_dir) == (None, None)
+
+# Define a function to test that a compact depth map is stored as codes and hashed after encoding
+@pytest.mark.parametrize("encoding, compress", [("float16", False), ("uint16", False), ("uint16", True)])
+def test_store_compact(depth, cache_dir, encoding, compress):
+    record = storage.store_depth("key", depth, cache_dir, encoding, compress)
+    loaded, _ = storage.read_depth("key", cache_dir)
+    expected = np.asarray(compact.compact_depth(depth, encoding, compress))
+    assert isinstance(loaded, compact.CompactDepth) and "layout" in record
+    np.testing.assert_array_equal(np.asarray(loaded), expected)
+    assert record["hash"] == storage.content_hash(expected)
+
+# Define a function to test that unreadable sidecar files count as missing
+def test_read_corrupt(depth, cache_dir):
+    storage.store_depth("key", depth, cache_dir)
+    with open(storage.sidecar_paths("key", cache_dir)[0], "wb") as file:
+        file.write(b"not an array")
+    assert storage.read_depth("key", cache_dir) == (None, None)
+
+# Define a function to test that an image is decoded once and memory-mapped afterwards
+@pytest.mark.parametrize("encoding", compact.ENCODINGS)
+def test_load_depth(depth, cache_dir, tmp_path, encoding):
+    path = str(tmp_path / "depth.npy")
+    np.save(path, depth)
+    first, record = storage.load_depth(path, cache_dir=cache_dir, encoding=encoding)
+    second, cached = storage.load_depth(path, cache_dir=cache_dir, encoding=encoding)
+    assert "stats" in record and "stats" not in cached and cached["hash"] == record["hash"]
+    np.testing.assert_array_equal(np.asarray(first), np.asarray(second))
+    assert cached["key"] == storage.encoded_key(storage.cache_key(path), encoding)
+
+    # Check that a changed file gets a new key
+    np.save(path, depth + 1)
+    os.utime(path, ns=(0, 0))
+    assert storage.load_depth(path, cache_dir=cache_dir, encoding=encoding)[1]["key"] != cached["key"]
+
+# Define a function to test that the block hashes find the edited blocks
+def test_dirty_blocks(cache_dir):
+    depth = np.random.default_rng(2).random((150, 200)).astype(np.float32)
+    edited = depth.copy()
+    edited[5, 70] += 0.1
+    edited[149, 0] = np.nan
+    storage.store_depth("old", depth, cache_dir)
+    storage.store_depth("new", edited, cache_dir)
+    assert storage.block_hashes(depth).shape == (3, 4)
+    assert storage.dirty_blocks("old", "new", cache_dir).tolist() == [[0, 1], [2, 0]]
+    assert storage.dirty_blocks("old", "old", cache_dir).size == 0
+    assert storage.dirty_blocks("old", "missing", cache_dir) is None
+
+    # Check that missing hash files are rebuilt from the cached depth map
+    os.remove(storage.blocks_path("new", cache_dir))
+    assert storage.dirty_blocks("old", "new", cache_dir).tolist() == [[0, 1], [2, 0]]
+
+# Define a function to test that pruning evicts the keys used longest ago until the cache fits its budget
+def test_prune_cache(depth, cache_dir):
+    for age, key in enumerate(["recent", "read", "kept"]):
+        storage.store_depth(key, depth, cache_dir)
+        for name in os.listdir(cache_dir):
+            if name.startswith(key):
+                os.utime(os.path.join(cache_dir, name), ns=(0, (10 - age) * 10**9))
+    sizes = {}
+    for name in os.listdir(cache_dir):
+        key = name.split(".")[0]
+        sizes[key] = sizes.get(key, 0) + os.path.getsize(os.path.join(cache_dir, name))
+
+    # Read one key to mark it as used, then leave room for two keys, sparing the oldest one
+    storage.read_depth("read", cache_dir)
+    assert storage.prune_cache(cache_dir, sizes["read"] + sizes["kept"], keep=("kept",)) == sizes["recent"]
+    assert storage.read_depth("recent", cache_dir) == (None, None)
+    assert not os.path.exists(storage.blocks_path("recent", cache_dir))
+    assert storage.read_depth("read", cache_dir)[0] is not None and storage.read_depth("kept", cache_dir)[0] is not None
+
+    # Check that no budget and kept keys evict nothing
+    assert storage.prune_cache(cache_dir, 0) == 0 and storage.prune_cache(cache_dir, 1, keep=("read", "kept")) == 0
+
+# Define a function to test that loading new versions of an image keeps the cache within the budget of the environment
+def test_load_depth_prunes(depth, cache_dir, tmp_path, monkeypatch):
+    monkeypatch.setenv(storage.CACHE_BYTES_VARIABLE, str(depth.nbytes * 3))
+    path = str(tmp_path / "depth.npy")
+    for version in range(5):
+        np.save(path, depth + version)
+        os.utime(path, ns=(version, version))
+        storage.load_depth(path, cache_dir=cache_dir)
+    assert len([name for name in os.listdir(cache_dir) if name.endswith(".json")]) == 2
+    assert storage.load_depth(path, cache_dir=cache_dir)[1]["hash"] == storage.content_hash(depth + 4)
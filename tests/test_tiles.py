@@ -0,0 +1,105 @@
+# Import the necessary modules
+import numpy as np
+import pytest
+
+import geometry
+import tiles
+
+# Define a function to build the grid of a depth map in one piece
+def serial_grid(depth, downsample):
+    reduced = geometry.downsample(depth, downsample)
+    height, width = reduced.shape
+    return geometry.build_grid(width, height, reduced, spacing=downsample)
+
+# Define a function to test that the parallel build matches the serial one
+@pytest.mark.parametrize("downsample", [1, 2, 3])
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_parallel_matches_serial(depth, downsample, executor):
+    expected_vertices, expected_faces = serial_grid(depth, downsample)
+    vertices, faces = tiles.build_grid_parallel(depth, downsample, workers=3, band_rows=4, executor=executor)
+    np.testing.assert_array_equal(vertices, expected_vertices)
+    np.testing.assert_array_equal(faces, expected_faces)
+
+# Define a function to test that the process pool maps a depth map from its file
+def test_parallel_processes_from_file(depth, tmp_path):
+    np.save(tmp_path / "depth.npy", depth)
+    mapped = np.load(tmp_path / "depth.npy", mmap_mode="r")
+    vertices, faces = tiles.build_grid_parallel(mapped, 2, workers=2, band_rows=5, executor="process")
+    expected_vertices, expected_faces = serial_grid(depth, 2)
+    np.testing.assert_array_equal(vertices, expected_vertices)
+    np.testing.assert_array_equal(faces, expected_faces)
+
+# Define a function to test that the progress callback sees every band and can cancel the build
+def test_parallel_progress_and_cancel(depth):
+    calls = []
+    tiles.build_grid_parallel(depth, band_rows=8, workers=2, progress=lambda done, total: calls.append((done, total)))
+    assert calls[-1] == (5, 5) and len(calls) == 5
+
+    # Raise from the callback to cancel the remaining bands
+    def cancel(done, total):
+        raise RuntimeError("cancelled")
+    with pytest.raises(RuntimeError):
+        tiles.build_grid_parallel(depth, band_rows=2, workers=1, progress=cancel)
+
+# Define a function to test that the tiles share their borders and cover the grid
+def test_tile_bounds():
+    bounds = tiles.tile_bounds(10, 7, 4)
+    assert bounds == [(r0, r0 + 3, c0, c0 + 3) for r0 in (0, 3, 6) for c0 in (0, 3)]
+    covered = np.zeros((10, 7), dtype=bool)
+    for r0, r1, c0, c1 in bounds:
+        covered[r0:r1 + 1, c0:c1 + 1] = True
+        assert r1 - r0 < 4 and c1 - c0 < 4
+    assert covered.all()
+
+# Define a function to test that the tiled build places every tile where the full grid has it
+@pytest.mark.parametrize("downsample, max_resident", [(1, 1), (2, 3)])
+def test_tiles_match_serial(depth, downsample, max_resident):
+    expected_vertices, _ = serial_grid(depth, downsample)
+    grid_height, grid_width = tiles.grid_shape(depth.shape, downsample)
+    grid = expected_vertices.reshape(grid_height, grid_width, 3)
+
+    # Compute the normals and the UVs of every vertex of the full grid
+    heights = geometry.downsample(depth, downsample) * geometry.DEPTH_SCALE
+    normals, uvs = geometry.surface_attributes(expected_vertices, np.arange(len(expected_vertices)), heights,
+                                               depth.shape, downsample)
+    indices = np.arange(grid_height * grid_width).reshape(grid_height, grid_width)
+
+    # Check that every tile has the vertices, normals and UVs of the full grid, including its borders
+    bounds = tiles.tile_bounds(grid_height, grid_width, 8)
+    quads = 0
+    for index, (r0, r1, c0, c1), vertices, faces, tile_normals, tile_uvs in tiles.iter_tiles(
+            depth, bounds, downsample, max_resident=max_resident, workers=2):
+        tile_indices = indices[r0:r1 + 1, c0:c1 + 1].ravel()
+        np.testing.assert_array_equal(vertices, grid[r0:r1 + 1, c0:c1 + 1].reshape(-1, 3))
+        np.testing.assert_array_equal(faces, geometry.grid_faces(c1 - c0 + 1, r1 - r0 + 1))
+        np.testing.assert_allclose(tile_normals, normals[tile_indices], atol=1e-6)
+        np.testing.assert_array_equal(tile_uvs, uvs[tile_indices[faces.ravel()]])
+        quads += len(faces)
+    assert quads == (grid_height - 1) * (grid_width - 1)
+
+# Define a function to test that patching the changed blocks gives the same vertices as a rebuild
+@pytest.mark.parametrize("downsample", [1, 3])
+def test_patch_grid_depth(depth, downsample):
+    vertices, _ = serial_grid(depth, downsample)
+    edited = depth.copy()
+    edited[10:20, 40:45] += 0.3
+    blocks = np.argwhere(np.add.reduceat(np.add.reduceat(edited != depth, np.arange(0, 37, 16), axis=0),
+                                         np.arange(0, 53, 16), axis=1))
+    tiles.patch_grid_depth(vertices, edited, blocks, 16, downsample)
+    np.testing.assert_allclose(vertices, serial_grid(edited, downsample)[0], rtol=1e-6)
+
+# Define a function to test that the normals around the changed blocks match a rebuild and cover every change
+@pytest.mark.parametrize("downsample", [1, 3])
+def test_iter_block_normals(depth, downsample):
+    edited = depth.copy()
+    edited[10:20, 40:45] += 0.3
+    edited[36, 0] = 0.9
+    blocks = np.argwhere(np.add.reduceat(np.add.reduceat(edited != depth, np.arange(0, 37, 16), axis=0),
+                                         np.arange(0, 53, 16), axis=1))
+    heights = geometry.downsample(edited, downsample) * geometry.DEPTH_SCALE
+    after = geometry.grid_normals(heights, downsample)
+    patched = geometry.grid_normals(geometry.downsample(depth, downsample) * geometry.DEPTH_SCALE, downsample)
+    for (r0, r1, c0, c1), normals in tiles.iter_block_normals(heights, blocks, 16, downsample):
+        np.testing.assert_allclose(normals, after[r0:r1 + 1, c0:c1 + 1], atol=1e-6)
+        patched[r0:r1 + 1, c0:c1 + 1] = normals
+    np.testing.assert_allclose(patched, after, atol=1e-6)
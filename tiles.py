@@ -0,0 +1,379 @@
+# Import the necessary modules
+import logging
+import math
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+# Import the geometry module both inside the add-on package and standalone
+try:
+    from . import geometry
+except ImportError:
+    import geometry
+
+# Define the number of neighbouring vertex rows and columns read around a tile, which the normals of its border need
+TILE_MARGIN = 1
+
+# Define a function to get the shape of the vertex grid of a depth map
+def grid_shape(shape, downsample=1):
+    """Get the shape of the vertex grid built from a depth map.
+
+    Args:
+        shape (tuple): The height and width of the depth map.
+        downsample (int): The downsample factor of the depth map.
+
+    Returns:
+        tuple: The number of vertex rows and columns.
+    """
+
+    # Round up so that partial blocks at the edges get their own vertex
+    return math.ceil(shape[0] / downsample), math.ceil(shape[1] / downsample)
+
+# Define a function to split a vertex grid into tiles
+def tile_bounds(height, width, tile_size):
+    """Split a vertex grid into tiles that share their border rows and columns.
+
+    Args:
+        height (int): The number of vertex rows.
+        width (int): The number of vertex columns.
+        tile_size (int): The largest number of vertex rows and columns of a tile.
+
+    Returns:
+        list: The (r0, r1, c0, c1) inclusive vertex ranges of the tiles in row-major order.
+    """
+
+    # Advance by one less than the tile size so that neighbouring tiles share a border
+    step = max(tile_size - 1, 1)
+    rows = [(r0, min(r0 + step, height - 1)) for r0 in range(0, max(height - 1, 1), step)]
+    cols = [(c0, min(c0 + step, width - 1)) for c0 in range(0, max(width - 1, 1), step)]
+
+    # Combine the row and column ranges into tiles
+    return [(r0, r1, c0, c1) for r0, r1 in rows for c0, c1 in cols]
+
+# Define a function to read the depth values of a tile
+def read_tile(depth, bounds, downsample=1, overlap=0):
+    """Read the depth values of a tile and a margin of neighbouring pixels.
+
+    Only the rows and columns of the tile are read, so memory-mapped depth
+    maps are never paged in as a whole.
+
+    Args:
+        depth (numpy.ndarray): The full resolution depth map, typically memory-mapped.
+        bounds (tuple): The (r0, r1, c0, c1) inclusive vertex ranges of the tile.
+        downsample (int): The downsample factor of the depth map.
+        overlap (int): The number of neighbouring vertex rows and columns to read around the tile.
+
+    Returns:
+        tuple: The float32 depth values on the vertex grid and the (top, left) size of the margin.
+    """
+
+    # Grow the tile by the overlap, clamped to the grid
+    r0, r1, c0, c1 = bounds
+    grid_height, grid_width = grid_shape(depth.shape, downsample)
+    top, bottom = max(r0 - overlap, 0), min(r1 + overlap, grid_height - 1)
+    left, right = max(c0 - overlap, 0), min(c1 + overlap, grid_width - 1)
+
+    # Copy the full resolution pixels of the blocks that form the tile
+    window = np.array(depth[top * downsample:(bottom + 1) * downsample,
+                            left * downsample:(right + 1) * downsample], dtype=np.float32)
+
+    # Average the blocks, which line up with the blocks of the full grid
+    return geometry.downsample(window, downsample), (r0 - top, c0 - left)
+
+# Define a function to build the mesh arrays of a tile
+def build_tile(window, margin, bounds, grid, depth_scale=geometry.DEPTH_SCALE, spacing=1.0, image_shape=None):
+    """Build the vertices and faces of a tile in the coordinates of the full surface.
+
+    The normals are computed over the whole window, so a window read with
+    TILE_MARGIN gives the border vertices the normals of the full grid and
+    neighbouring tiles shade without seams.
+
+    Args:
+        window (numpy.ndarray): The depth values returned by read_tile.
+        margin (tuple): The (top, left) size of the margin returned by read_tile.
+        bounds (tuple): The (r0, r1, c0, c1) inclusive vertex ranges of the tile.
+        grid (tuple): The number of vertex rows and columns of the full surface.
+        depth_scale (float): The factor applied to the depth values.
+        spacing (float): The distance between neighbouring vertices.
+        image_shape (tuple): The height and width of the full resolution depth map,
+            or None to skip the normals and UVs.
+
+    Returns:
+        tuple: The vertex array and the face array of the tile, with tile-local indices, and the vertex normals
+            and per-loop UVs, which are None without an image shape.
+    """
+
+    # Crop the margin from the depth values
+    r0, r1, c0, c1 = bounds
+    top, left = margin
+    core = window[top:top + r1 - r0 + 1, left:left + c1 - c0 + 1]
+    height, width = core.shape
+
+    # Place the tile vertices where the full grid would have them, joined by tile-local faces
+    vertices = geometry.grid_vertices(width, height, core, depth_scale, spacing,
+                                      offset=(r0, c0), center=(grid[0] / 2, grid[1] / 2))
+    faces = geometry.grid_faces(width, height)
+
+    # Compute the normals and UVs from the heights of the whole window, placed where the window lies in the grid
+    if image_shape is None:
+        return vertices, faces, None, None
+    normals, uvs = geometry.surface_attributes(vertices, faces, window * depth_scale, image_shape, spacing,
+                                               offset=(r0 - top, c0 - left), grid=grid)
+    return vertices, faces, normals, uvs
+
+# Define a function to get the number of workers to use
+def worker_count(workers=0):
+    """Get the number of workers to use.
+
+    Args:
+        workers (int): The requested number of workers, or 0 for one per CPU core.
+
+    Returns:
+        int: The number of workers, at least one.
+    """
+
+    # Use one worker per CPU core unless a number is given
+    return max(workers or os.cpu_count() or 1, 1)
+
+# Define a function to build tiles in parallel with a bounded read-ahead
+def iter_tiles(depth, tiles, downsample=1, depth_scale=geometry.DEPTH_SCALE, max_resident=2, workers=1):
+    """Build the mesh arrays of tiles in order, never holding more than max_resident tiles.
+
+    Tiles are read and built on a pool of worker threads while the caller
+    consumes the previous ones, for example by uploading them to Blender.
+    Every tile is read with a margin of TILE_MARGIN for its normals.
+
+    Args:
+        depth (numpy.ndarray): The full resolution depth map, typically memory-mapped.
+        tiles (list): The (r0, r1, c0, c1) inclusive vertex ranges of the tiles to build.
+        downsample (int): The downsample factor of the depth map.
+        depth_scale (float): The factor applied to the depth values.
+        max_resident (int): The largest number of built tiles held in memory at once.
+        workers (int): The number of worker threads, or 0 for one per CPU core.
+
+    Yields:
+        tuple: The index of the tile, its bounds, its vertex array, its face array, its normals and its UVs.
+    """
+
+    # Get the shape of the full vertex grid
+    grid = grid_shape(depth.shape, downsample)
+
+    # Define a function to build a single tile
+    def build(index):
+        window, margin = read_tile(depth, tiles[index], downsample, TILE_MARGIN)
+        return build_tile(window, margin, tiles[index], grid, depth_scale, downsample, depth.shape)
+
+    # Build the tiles in the calling thread when no read-ahead is allowed
+    if max_resident <= 1:
+        for index, bounds in enumerate(tiles):
+            yield (index, bounds) + build(index)
+        return
+
+    # Keep at most max_resident tiles submitted or held by the caller
+    with ThreadPoolExecutor(max_workers=min(worker_count(workers), max_resident)) as pool:
+        pending = deque()
+        for index in range(min(max_resident, len(tiles))):
+            pending.append(pool.submit(build, index))
+
+        # Hand the tiles to the caller in order, submitting the next one once the caller is done with each
+        for index, bounds in enumerate(tiles):
+            arrays = pending.popleft().result()
+            yield (index, bounds) + arrays
+            del arrays
+            if index + max_resident < len(tiles):
+                pending.append(pool.submit(build, index + max_resident))
+
+# Define a function to build a band of grid rows
+def build_band(depth, band, downsample=1, depth_scale=geometry.DEPTH_SCALE, vertices=None, faces=None):
+    """Build the vertices and faces of a band of rows of the full surface grid.
+
+    Args:
+        depth (numpy.ndarray or str): The full resolution depth map, or the path of a .npy file holding it.
+        band (tuple): The first and one past the last vertex row of the band.
+        downsample (int): The downsample factor of the depth map.
+        depth_scale (float): The factor applied to the depth values.
+        vertices (numpy.ndarray): The vertex array of the full grid to fill, or None to return new arrays.
+        faces (numpy.ndarray): The face array of the full grid to fill, or None to return new arrays.
+
+    Returns:
+        tuple: The vertex and face arrays of the band, which are views into the given arrays if any.
+    """
+
+    # Map the depth map when a path is given, as in worker processes
+    if isinstance(depth, str):
+        depth = np.load(depth, mmap_mode="r")
+
+    # Read the rows of the band
+    a, b = band
+    grid_height, grid_width = grid_shape(depth.shape, downsample)
+    window, margin = read_tile(depth, (a, b - 1, 0, grid_width - 1), downsample)
+
+    # Compute the vertices of the band into their place in the full grid
+    face_rows = min(b, grid_height - 1) - a
+    if vertices is not None:
+        vertices = vertices[a * grid_width:b * grid_width]
+        faces = faces[a * (grid_width - 1):(a + face_rows) * (grid_width - 1)]
+    vertices = geometry.grid_vertices(grid_width, b - a, window, depth_scale, downsample, offset=(a, 0),
+                                      center=(grid_height / 2, grid_width / 2), out=vertices)
+
+    # Compute the faces joining each row of the band to the next row
+    faces = geometry.grid_faces(grid_width, face_rows + 1, row_offset=a, out=faces)
+
+    # Return the arrays of the band
+    return vertices, faces
+
+# Define a function to build the full surface grid on a pool of workers
+def build_grid_parallel(depth, downsample=1, depth_scale=geometry.DEPTH_SCALE, workers=0, band_rows=256,
+                        executor="thread", progress=None):
+    """Build the vertices and faces of the full surface grid on a pool of workers.
+
+    The grid is split into bands of rows. With threads every band is written
+    straight into the preallocated output arrays; with processes the bands
+    are returned and copied in, which needs the depth map to be a
+    memory-mapped .npy file that the workers can open themselves.
+
+    Args:
+        depth (numpy.ndarray): The full resolution depth map of shape (height, width).
+        downsample (int): The downsample factor of the depth map.
+        depth_scale (float): The factor applied to the depth values.
+        workers (int): The number of workers, or 0 for one per CPU core.
+        band_rows (int): The number of vertex rows in each band.
+        executor (str): 'thread' for a thread pool or 'process' for a process pool.
+        progress (callable): A function called with the number of finished and total bands,
+            which may raise to cancel the remaining bands.
+
+    Returns:
+        tuple: The vertex array and the face array, identical to geometry.build_grid.
+    """
+
+    # Allocate the output arrays of the full grid
+    grid_height, grid_width = grid_shape(depth.shape, downsample)
+    vertices = np.empty((grid_height * grid_width, 3), dtype=np.float32)
+    faces = np.empty((max(grid_height - 1, 0) * max(grid_width - 1, 0), 4), dtype=np.int32)
+
+    # Split the grid into bands of rows
+    bands = [(a, min(a + band_rows, grid_height)) for a in range(0, grid_height, band_rows)]
+    workers = worker_count(workers)
+
+    # Use processes only when the workers can map the depth map from its file
+    path = getattr(depth, "filename", None)
+    if executor == "process" and (path is None or np.load(path, mmap_mode="r").shape != depth.shape):
+        logging.warning("Depth map is not a memory-mapped .npy file, building with threads instead of processes")
+        executor = "thread"
+
+    # Build the bands on the pool, reporting each one as it finishes
+    if executor == "process":
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(build_band, str(path), band, downsample, depth_scale): band for band in bands}
+            for done, future in enumerate(as_completed(futures), 1):
+                a, b = futures[future]
+                band_vertices, band_faces = future.result()
+                vertices[a * grid_width:b * grid_width] = band_vertices
+                faces[a * (grid_width - 1):a * (grid_width - 1) + len(band_faces)] = band_faces
+                if progress:
+                    progress(done, len(bands))
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(build_band, depth, band, downsample, depth_scale, vertices, faces)
+                       for band in bands]
+            try:
+                for done, future in enumerate(as_completed(futures), 1):
+                    future.result()
+                    if progress:
+                        progress(done, len(bands))
+            except BaseException:
+                # Drop the bands that have not started when a band fails or the progress callback cancels
+                for future in futures:
+                    future.cancel()
+                raise
+
+    # Return the full arrays
+    return vertices, faces
+
+# Define a function to get the vertex ranges of changed blocks of a depth map
+def block_vertices(blocks, block, downsample, grid):
+    """Get the grid vertices whose downsampled blocks overlap changed blocks of the depth map.
+
+    Args:
+        blocks (numpy.ndarray): The (block row, block column) of every changed block.
+        block (int): The edge length of the blocks in pixels.
+        downsample (int): The downsample factor of the grid.
+        grid (tuple): The number of vertex rows and columns of the grid.
+
+    Returns:
+        list: The (r0, r1, c0, c1) inclusive vertex ranges of the blocks.
+    """
+
+    # Round the first vertex down and the last one up, so that partly covered vertices are included
+    ranges = []
+    for block_row, block_col in blocks:
+        r0, c0 = block_row * block // downsample, block_col * block // downsample
+        r1 = min(-(-(block_row + 1) * block // downsample), grid[0]) - 1
+        c1 = min(-(-(block_col + 1) * block // downsample), grid[1]) - 1
+        ranges.append((int(r0), int(r1), int(c0), int(c1)))
+    return ranges
+
+# Define a function to recompute the depth of the grid vertices in changed blocks
+def patch_grid_depth(vertices, depth, blocks, block, downsample=1, depth_scale=geometry.DEPTH_SCALE):
+    """Recompute the z coordinates of the grid vertices that fall in changed blocks of the depth map.
+
+    Only the pixels of the changed blocks are read, so the cost follows the
+    size of the edit rather than the size of the depth map.
+
+    Args:
+        vertices (numpy.ndarray): The vertex array of the full grid of shape (rows * columns, 3), updated in place.
+        depth (numpy.ndarray): The new full resolution depth map, typically memory-mapped.
+        blocks (numpy.ndarray): The (block row, block column) of every changed block.
+        block (int): The edge length of the blocks in pixels.
+        downsample (int): The downsample factor of the grid.
+        depth_scale (float): The factor applied to the depth values.
+
+    Returns:
+        int: The number of vertices that were recomputed.
+    """
+
+    # View the vertices as a grid
+    grid_height, grid_width = grid_shape(depth.shape, downsample)
+    grid = vertices.reshape(grid_height, grid_width, 3)
+    updated = 0
+
+    # Recompute every vertex whose downsampled block overlaps a changed block
+    for r0, r1, c0, c1 in block_vertices(blocks, block, downsample, (grid_height, grid_width)):
+        window, _ = read_tile(depth, (r0, r1, c0, c1), downsample)
+        np.multiply(window, depth_scale, out=grid[r0:r1 + 1, c0:c1 + 1, 2])
+        updated += window.size
+
+    # Return the number of recomputed vertices
+    return updated
+
+# Define a function to recompute the normals around changed blocks
+def iter_block_normals(heights, blocks, block, downsample=1):
+    """Recompute the normals of the grid vertices in changed blocks and of the vertices bordering them.
+
+    The normals of a vertex depend on its neighbours, so every block grows
+    by one vertex, and only a window one vertex larger again is read, which
+    keeps the cost with the size of the edit. The normals equal those that
+    geometry.grid_normals gives for the whole grid.
+
+    Args:
+        heights (numpy.ndarray): The surface heights of the full grid of shape (rows, columns), already patched.
+        blocks (numpy.ndarray): The (block row, block column) of every changed block.
+        block (int): The edge length of the blocks in pixels.
+        downsample (int): The downsample factor of the grid, which is also the spacing of its vertices.
+
+    Yields:
+        tuple: The (r0, r1, c0, c1) inclusive vertex range and its float32 normals of shape (rows, columns, 3).
+    """
+
+    # Grow every block by the vertices whose normals it changes, and read one more vertex around them
+    rows, cols = heights.shape
+    for r0, r1, c0, c1 in block_vertices(blocks, block, downsample, heights.shape):
+        r0, r1, c0, c1 = max(r0 - 1, 0), min(r1 + 1, rows - 1), max(c0 - 1, 0), min(c1 + 1, cols - 1)
+        top, left = max(r0 - 1, 0), max(c0 - 1, 0)
+        window = heights[top:min(r1 + 2, rows), left:min(c1 + 2, cols)]
+
+        # Cut the range out of the normals of the window, whose own borders are either grid borders or margin
+        normals = geometry.grid_normals(window, downsample)
+        yield (r0, r1, c0, c1), normals[r0 - top:r1 - top + 1, c0 - left:c1 - left + 1]
@@ -0,0 +1,205 @@
+# Import the necessary modules
+import bpy
+import logging
+
+# Import the materials module for patching surfaces, leaving the depthify module and NumPy to the first callback that needs them
+from . import materials
+
+# Define how long to wait after the last change of a geometry setting before rebuilding, in seconds
+REBUILD_DELAY = 0.4
+
+# Define a function to get the mesh objects of the current surface
+def surface_objects(props):
+    """Get the mesh objects of the current surface, including the tiles of a tiled surface.
+
+    Args:
+        props (DepthifyProperties): The scene properties.
+
+    Returns:
+        list: The surface object and its tile objects that have meshes.
+    """
+
+    # Collect the surface and its children, skipping the empty parent of tiles
+    surface = props.surface
+    if surface is None:
+        return []
+    return [obj for obj in (surface,) + tuple(surface.children) if obj.type == 'MESH']
+
+# Define a function to update the subdivision modifiers of the surface
+def update_subdivision(props, context):
+    """Set the levels and type of the subdivision modifiers of the current surface.
+
+    Args:
+        props (DepthifyProperties): The scene properties.
+        context (bpy.types.Context): The current context.
+
+    Returns:
+        None.
+    """
+
+    # Patch the modifiers in place, leaving the dicing of displacement-only planes alone
+    for obj in surface_objects(props):
+        if "depthify_dicing_levels" in obj:
+            continue
+
+        # Keep to the highest level that fit the memory and face budgets when the surface was built
+        levels = min(props.subdivisions, obj.get("depthify_max_subdivisions", props.subdivisions))
+        for modifier in obj.modifiers:
+            if modifier.type == 'SUBSURF':
+                modifier.subdivision_type = props.subdivision_type
+                modifier.levels = levels
+                modifier.render_levels = levels
+
+# Define a function to update the scale of the surface
+def update_scale(props, context):
+    """Set the scale of the current surface object.
+
+    Args:
+        props (DepthifyProperties): The scene properties.
+        context (bpy.types.Context): The current context.
+
+    Returns:
+        None.
+    """
+
+    # Scale the surface, or the parent of the tiles, which scales them together
+    if props.surface is not None:
+        props.surface.scale = props.scale
+
+# Define a function to update the displacement of the surface
+def update_displacement(props, context):
+    """Set the displacement scale and method of the material of the current surface.
+
+    Args:
+        props (DepthifyProperties): The scene properties.
+        context (bpy.types.Context): The current context.
+
+    Returns:
+        None.
+    """
+
+    # Get the strength, which covers the whole relief of displacement-only planes
+    displacement_only = props.geometry_mode == 'DISPLACEMENT'
+    strength = props.depth_scale * props.displacement_strength if displacement_only else props.displacement_strength
+
+    # Import the depthify module lazily, since the add-on does not load it before the first build
+    from . import depthify
+
+    # Patch a material that only this surface uses, otherwise switch to the shared material for the new settings
+    for obj in surface_objects(props):
+        material = obj.active_material
+        if material is None or "depthify_key" not in material:
+            continue
+        method = 'DISPLACEMENT' if displacement_only or props.displacement_type == 'TRUE' else props.displacement_type
+        if material.users == 1 and material["depthify_key"].rsplit("|", 4)[2] == method:
+            materials.set_displacement_strength(material, strength)
+        elif displacement_only:
+            depthify.apply_displacement(obj, strength, method, midlevel=0.0, interpolation='Linear')
+        else:
+            depthify.apply_displacement(obj, strength, method)
+
+# Define a function to update the level of detail distance of the surface
+def update_lod_distance(props, context):
+    """Set the level of detail switching distance of the current surface.
+
+    Args:
+        props (DepthifyProperties): The scene properties.
+        context (bpy.types.Context): The current context.
+
+    Returns:
+        None.
+    """
+
+    # Store the distance where the level of detail timer reads it
+    for obj in surface_objects(props):
+        if "depthify_lods" in obj:
+            obj["depthify_lod_distance"] = props.lod_distance
+
+# Define a function to schedule a rebuild after a geometry setting changed
+def schedule_rebuild(props, context):
+    """Rebuild the current surface once the geometry settings stop changing.
+
+    Every change restarts the delay, so dragging a slider queues a single
+    rebuild when the drag ends.
+
+    Args:
+        props (DepthifyProperties): The scene properties.
+        context (bpy.types.Context): The current context.
+
+    Returns:
+        None.
+    """
+
+    # Only rebuild an existing surface, and only when enabled
+    if props.surface is None or not props.auto_rebuild:
+        return
+
+    # Restart the delay of a pending rebuild
+    if bpy.app.timers.is_registered(rebuild_surface):
+        bpy.app.timers.unregister(rebuild_surface)
+    bpy.app.timers.register(rebuild_surface, first_interval=REBUILD_DELAY)
+
+# Define a function to update the depth multiplier
+def update_depth_scale(props, context):
+    """Apply a change of the depth multiplier, which only the material uses on displacement-only planes.
+
+    Args:
+        props (DepthifyProperties): The scene properties.
+        context (bpy.types.Context): The current context.
+
+    Returns:
+        None.
+    """
+
+    # Patch the material of displacement-only planes and rebuild other surfaces
+    if props.geometry_mode == 'DISPLACEMENT' and props.surface is not None and "depthify_dicing_levels" in props.surface:
+        update_displacement(props, context)
+    else:
+        schedule_rebuild(props, context)
+
+# Define a function to remove a surface object with its tiles and meshes
+def remove_surface(obj):
+    """Remove a surface object together with its tile objects and their unused meshes, including levels of detail.
+
+    Args:
+        obj (bpy.types.Object): The surface object or the parent of the tiles.
+
+    Returns:
+        None.
+    """
+
+    # Import the depthify module lazily, since the add-on does not load it before the first build
+    from . import depthify
+
+    # Remove the tiles first, then the object itself with the meshes of its levels of detail
+    for child in list(obj.children) + [obj]:
+        depthify.remove_object(child)
+
+# Define a function to rebuild the current surface
+def rebuild_surface():
+    """Rebuild the current surface with the current settings and replace the old one.
+
+    Returns:
+        float: The delay before trying again while another build runs, or None when done.
+    """
+
+    # Wait for a running build from the panel to finish
+    props = bpy.context.scene.depthify_properties
+    if props.progress_stage:
+        return REBUILD_DELAY
+
+    # Build the new surface with the blocking path of the operator
+    old = props.surface
+    if old is None:
+        return None
+    try:
+        result = bpy.ops.object.depthify_create_surface()
+    except RuntimeError as e:
+        # Log an error message to the console
+        logging.error(f"Failed to rebuild surface object: {e}")
+        return None
+
+    # Replace the old surface, keeping its place in the selection
+    if 'FINISHED' in result and props.surface != old:
+        remove_surface(old)
+    return None